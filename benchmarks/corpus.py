@@ -0,0 +1,105 @@
+import json
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import piexif
+from PIL import Image
+from pillow_heif import register_heif_opener
+
+register_heif_opener()
+
+
+@dataclass
+class CorpusPhoto:
+    file_id: str
+    file_name: str
+    mime_type: str
+    path: str
+
+
+def _exif(index: int, rng: random.Random) -> bytes:
+    """EXIF block of a phone photo: camera, date taken and GPS position around Helsinki."""
+    taken = datetime(2024, 5, 12, 10, 30) + timedelta(minutes=7 * index)
+
+    def dms(value: float) -> tuple[tuple[int, int], tuple[int, int], tuple[int, int]]:
+        degrees = int(value)
+        minutes = int((value - degrees) * 60)
+        seconds = round(((value - degrees) * 60 - minutes) * 60 * 100)
+        return ((degrees, 1), (minutes, 1), (seconds, 100))
+
+    return piexif.dump(
+        {
+            "0th": {piexif.ImageIFD.Make: b"Herbabot", piexif.ImageIFD.Model: b"Bench Camera"},
+            "Exif": {piexif.ExifIFD.DateTimeOriginal: taken.strftime("%Y:%m:%d %H:%M:%S").encode()},
+            "GPS": {
+                piexif.GPSIFD.GPSLatitudeRef: b"N",
+                piexif.GPSIFD.GPSLatitude: dms(60.17 + rng.uniform(-0.05, 0.05)),
+                piexif.GPSIFD.GPSLongitudeRef: b"E",
+                piexif.GPSIFD.GPSLongitude: dms(24.94 + rng.uniform(-0.05, 0.05)),
+            },
+        }
+    )
+
+
+def _pixels(width: int, height: int, rng: np.random.Generator) -> Image.Image:
+    """Leafy green gradient with noise, so photos compress like real ones and never share a hash."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack(
+        [
+            40 + 60 * (x / width),
+            110 + 90 * np.sin(y / height * np.pi),
+            30 + 50 * (y / height),
+        ],
+        axis=-1,
+    )
+    noise = rng.normal(0, 18, (height, width, 3))
+    return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def generate_corpus(
+    directory: Path,
+    count: int,
+    size: tuple[int, int] = (2016, 1512),
+    heic_ratio: float = 0.5,
+    seed: int = 0,
+) -> list[CorpusPhoto]:
+    """
+    Generate ``count`` photos with EXIF metadata, a ``heic_ratio`` share of them as HEIC, the rest as JPEG.
+
+    The photos and a ``corpus.json`` manifest are written to ``directory``. An existing
+    corpus generated with the same parameters is reused.
+    """
+    manifest = directory / "corpus.json"
+    parameters = {"count": count, "size": list(size), "heic_ratio": heic_ratio, "seed": seed}
+    if manifest.exists():
+        data = json.loads(manifest.read_text())
+        if data["parameters"] == parameters:
+            return [CorpusPhoto(**photo) for photo in data["photos"]]
+
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    pixels_rng = np.random.default_rng(seed)
+    heic_count = round(count * heic_ratio)
+
+    photos: list[CorpusPhoto] = []
+    for index in range(count):
+        image = _pixels(size[0], size[1], pixels_rng)
+        exif = _exif(index, rng)
+        if index < heic_count:
+            photo = CorpusPhoto(f"photo{index:04d}", f"IMG_{index:04d}.HEIC", "image/heic", "")
+            path = directory / f"{photo.file_id}.heic"
+            image.save(path, format="HEIF", exif=exif, quality=80)
+        else:
+            photo = CorpusPhoto(f"photo{index:04d}", f"IMG_{index:04d}.JPG", "image/jpeg", "")
+            path = directory / f"{photo.file_id}.jpg"
+            image.save(path, format="JPEG", exif=exif, quality=90)
+        photo.path = str(path)
+        photos.append(photo)
+
+    # Interleave formats as a real upload stream would
+    rng.shuffle(photos)
+    manifest.write_text(json.dumps({"parameters": parameters, "photos": [asdict(photo) for photo in photos]}))
+    return photos
@@ -0,0 +1,157 @@
+"""
+Run one benchmark level in a fresh process.
+
+Herbabot reads its configuration from the environment at import time, so ``benchmarks.run``
+starts this module once per concurrency level with the environment pointing at the fake
+services. It feeds the corpus to ``handle_file`` as synthetic Telegram updates, waits for
+the job workers to drain the queue and prints the raw measurements as JSON on stdout.
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+from herbabot.config import CONCURRENT_UPDATES, JOB_QUEUE_PATH, JOB_WORKERS, TELEGRAM_BOT_TOKEN
+from herbabot.executor import shutdown_executor
+from herbabot.handlers import register_handlers
+from herbabot.http_clients import close_http_clients, http_client_stats
+from herbabot.job_queue import PENDING, RUNNING, WAITING, get_job_queue
+from herbabot.metrics import CACHE_REQUESTS, JOB_STEP_DURATION, STAGE_DURATION, Histogram
+from herbabot.pipeline import start_job_workers, stop_job_workers
+
+
+class SampleRecorder:
+    """Keeps every observation of the given histograms, whose buckets are too coarse for percentiles."""
+
+    def __init__(self, *histograms: Histogram) -> None:
+        self.samples: dict[str, dict[str, list[float]]] = {}
+        for histogram in histograms:
+            self._record(histogram)
+
+    def _record(self, histogram: Histogram) -> None:
+        samples: dict[str, list[float]] = defaultdict(list)
+        self.samples[histogram.name] = samples
+        observe = histogram.observe
+
+        def record(value: float, **labels: str) -> None:
+            samples[",".join(labels.values())].append(value)
+            observe(value, **labels)
+
+        setattr(histogram, "observe", record)
+
+
+def synthetic_update(index: int, photo: dict[str, Any], users: int) -> dict[str, Any]:
+    """Telegram update of a user sending a corpus photo as a file."""
+    user_id = 1000 + (index % users if users else index)
+    return {
+        "update_id": index + 1,
+        "message": {
+            "message_id": index + 1,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Bench {user_id}"},
+            "document": {
+                "file_id": photo["file_id"],
+                "file_unique_id": photo["file_id"],
+                "file_name": photo["file_name"],
+                "mime_type": photo["mime_type"],
+                "file_size": Path(photo["path"]).stat().st_size,
+            },
+        },
+    }
+
+
+async def run_level(
+    photos: list[dict[str, Any]],
+    users: int,
+    base_url: str,
+    base_file_url: str,
+    timeout: float,
+) -> dict[str, Any]:
+    recorder = SampleRecorder(STAGE_DURATION, JOB_STEP_DURATION)
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .base_url(base_url)
+        .base_file_url(base_file_url)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .build()
+    )
+    register_handlers(app)
+    await app.initialize()
+    start_job_workers(app.bot)
+
+    handler_latency: list[float] = []
+    updates = asyncio.Semaphore(max(CONCURRENT_UPDATES, 1))
+
+    async def send(index: int, photo: dict[str, Any]) -> None:
+        update = Update.de_json(synthetic_update(index, photo, users), app.bot)
+        async with updates:
+            sent = time.perf_counter()
+            await app.process_update(update)
+            handler_latency.append(time.perf_counter() - sent)
+
+    queue = get_job_queue()
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(send(index, photo) for index, photo in enumerate(photos)))
+        while time.perf_counter() - started < timeout:
+            depth = queue.depth()
+            if not any(depth.get(status) for status in (PENDING, RUNNING, WAITING)):
+                break
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        await stop_job_workers()
+        await app.shutdown()
+        connections = http_client_stats()
+        shutdown_executor()
+        close_http_clients()
+
+    with sqlite3.connect(JOB_QUEUE_PATH) as conn:
+        jobs = conn.execute(
+            "SELECT status, updated_at - created_at FROM jobs WHERE created_at >= ?", (started_at,)
+        ).fetchall()
+
+    return {
+        "concurrency": JOB_WORKERS,
+        "jobs": len(photos),
+        "done": sum(1 for status, _ in jobs if status == "done"),
+        "failed": sum(1 for status, _ in jobs if status == "failed"),
+        "elapsed": elapsed,
+        "job_latency": [latency for status, latency in jobs if status == "done"],
+        "handler_latency": handler_latency,
+        "stages": recorder.samples[STAGE_DURATION.name],
+        "steps": recorder.samples[JOB_STEP_DURATION.name],
+        "cache": {",".join(labels.values()): value for _, labels, value in CACHE_REQUESTS.samples()},
+        "connections": connections,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.driver")
+    parser.add_argument("--corpus", type=Path, required=True, help="corpus.json manifest of the photos")
+    parser.add_argument("--jobs", type=int, required=True)
+    parser.add_argument("--users", type=int, default=0)
+    parser.add_argument("--telegram-base-url", required=True)
+    parser.add_argument("--telegram-file-url", required=True)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    photos = json.loads(args.corpus.read_text())["photos"]
+    photos = [photos[index % len(photos)] for index in range(args.jobs)]
+    result = asyncio.run(run_level(photos, args.users, args.telegram_base_url, args.telegram_file_url, args.timeout))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
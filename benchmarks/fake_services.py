@@ -0,0 +1,343 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qsl
+
+# Species returned by the fake Pl@ntNet, cycled through when the number of species is limited
+SPECIES = [
+    ("Bellis perennis", "Daisy", "Asteraceae"),
+    ("Taraxacum officinale", "Dandelion", "Asteraceae"),
+    ("Trifolium repens", "White clover", "Fabaceae"),
+    ("Plantago lanceolata", "Ribwort plantain", "Plantaginaceae"),
+    ("Ranunculus acris", "Meadow buttercup", "Ranunculaceae"),
+    ("Achillea millefolium", "Yarrow", "Asteraceae"),
+    ("Hedera helix", "Common ivy", "Araliaceae"),
+    ("Urtica dioica", "Stinging nettle", "Urticaceae"),
+]
+
+DESCRIPTION = (
+    "A hardy perennial of lawns, meadows and roadsides, flowering from early spring to late autumn. "
+    "Its leaves form a low rosette and its flowers attract a wide range of pollinating insects."
+)
+
+
+class FakeService:
+    """
+    Local HTTP server standing in for an upstream service, answering after an injected latency.
+
+    Each request waits ``latency`` seconds, plus or minus ``jitter`` (a fraction of the
+    latency), before being answered by ``handle``. Requests are served concurrently.
+    """
+
+    name = "service"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.2) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"fake-{self.name}", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeService":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def delay(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        return max(0.0, self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str, path: str, body: bytes) -> None:
+        raise NotImplementedError
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                self._serve("GET")
+
+            def do_POST(self) -> None:
+                self._serve("POST")
+
+            def _serve(self, method: str) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with service._lock:
+                    service.requests += 1
+                time.sleep(service.delay())
+                service.handle(self, method, self.path.split("?", 1)[0], body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def send_json(request: BaseHTTPRequestHandler, data: Any, status: int = 200) -> None:
+    body = json.dumps(data).encode()
+    request.send_response(status)
+    request.send_header("Content-Type", "application/json")
+    request.send_header("Content-Length", str(len(body)))
+    request.end_headers()
+    request.wfile.write(body)
+
+
+class FakeTelegram(FakeService):
+    """
+    Bot API stand-in: serves the corpus photos as downloadable files and accepts messages.
+
+    ``files`` maps file ids to the local photos that ``getFile`` and the file download
+    return. Sent and edited messages are only counted.
+    """
+
+    name = "telegram"
+
+    def __init__(self, files: dict[str, Path], latency: float = 0.0, jitter: float = 0.2) -> None:
+        super().__init__(latency, jitter)
+        self.files = files
+        self.sent = 0
+        self.edited = 0
+        self._message_ids = count(1_000_000)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/bot"
+
+    @property
+    def base_file_url(self) -> str:
+        return f"{self.url}/file/bot"
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str, path: str, body: bytes) -> None:
+        if path.startswith("/file/bot"):
+            file_id = path.rsplit("/", 1)[-1]
+            if file_id not in self.files:
+                send_json(request, {"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+                return
+            data = self.files[file_id].read_bytes()
+            request.send_response(200)
+            request.send_header("Content-Length", str(len(data)))
+            request.end_headers()
+            request.wfile.write(data)
+            return
+
+        api_method = path.rsplit("/", 1)[-1]
+        params = _decode_params(request.headers.get("Content-Type", ""), body)
+        if api_method == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "Herbabot", "username": "herbabot_bench_bot"}
+        elif api_method == "getFile":
+            file_id = str(params.get("file_id"))
+            path_ = self.files.get(file_id)
+            result = {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": path_.stat().st_size if path_ else 0,
+                "file_path": file_id,
+            }
+        elif api_method in ("sendMessage", "editMessageText"):
+            with self._lock:
+                if api_method == "sendMessage":
+                    self.sent += 1
+                else:
+                    self.edited += 1
+            result = {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": params.get("chat_id"), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        send_json(request, {"ok": True, "result": result})
+
+
+class FakePlantNet(FakeService):
+    """
+    Pl@ntNet identify endpoint stand-in.
+
+    Answers with ``species`` distinct species in turn, so descriptions of repeated species
+    come from the cache, or with a new species for every request when ``species`` is 0.
+    """
+
+    name = "plantnet"
+
+    def __init__(self, species: int = 0, latency: float = 0.0, jitter: float = 0.2) -> None:
+        super().__init__(latency, jitter)
+        self.species = species
+        self._counter = count()
+
+    @property
+    def identify_url(self) -> str:
+        return f"{self.url}/v2/identify/all"
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str, path: str, body: bytes) -> None:
+        n = next(self._counter)
+        key = n % self.species if self.species else n
+        latin_name, common_name, family = SPECIES[key % len(SPECIES)]
+        if key >= len(SPECIES):
+            latin_name = f"{latin_name} var. bench{key}"
+
+        send_json(
+            request,
+            {
+                "results": [
+                    {
+                        "score": 0.91,
+                        "species": {
+                            "scientificNameWithoutAuthor": latin_name,
+                            "commonNames": [common_name],
+                            "family": {"scientificNameWithoutAuthor": family},
+                        },
+                        "gbif": {"id": "1"},
+                    }
+                ]
+            },
+        )
+
+
+class FakeOpenAI(FakeService):
+    """
+    OpenAI chat completions stand-in, streaming the description when asked to.
+
+    With streaming, the injected latency is the time to the first token and the remaining
+    tokens follow every ``token_interval`` seconds.
+    """
+
+    name = "openai"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.2, token_interval: float = 0.0) -> None:
+        super().__init__(latency, jitter)
+        self.token_interval = token_interval
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str, path: str, body: bytes) -> None:
+        payload = json.loads(body or b"{}")
+        if not payload.get("stream"):
+            send_json(
+                request,
+                {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model", "gpt-4o-mini"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": DESCRIPTION},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                },
+            )
+            return
+
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Connection", "close")
+        request.end_headers()
+        words = DESCRIPTION.split(" ")
+        for i, word in enumerate(words):
+            if i and self.token_interval > 0:
+                time.sleep(self.token_interval)
+            event = _completion_chunk(word if i == 0 else f" {word}")
+            request.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            request.wfile.flush()
+        request.wfile.write(f"data: {json.dumps(_completion_chunk(None, 'stop'))}\n\n".encode())
+        request.wfile.write(b"data: [DONE]\n\n")
+        request.close_connection = True
+
+
+class FakeGitHub(FakeService):
+    """GitHub pulls API stand-in, opening a numbered pull request for every call."""
+
+    name = "github"
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.2) -> None:
+        super().__init__(latency, jitter)
+        self.pulls = 0
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str, path: str, body: bytes) -> None:
+        if method != "POST" or not path.endswith("/pulls"):
+            send_json(request, {"message": "Not Found"}, 404)
+            return
+        with self._lock:
+            self.pulls += 1
+            number = self.pulls
+        repo = path.removeprefix("/repos/").removesuffix("/pulls")
+        send_json(request, {"number": number, "html_url": f"https://github.com/{repo}/pull/{number}"}, 201)
+
+
+def create_portfolio_repo(path: Path, base_branch: str = "main") -> Path:
+    """Create a bare repository with the layout of the portfolio, standing in for it on GitHub."""
+    _git("init", "--bare", f"--initial-branch={base_branch}", str(path))
+
+    seed = path.with_name(f"{path.stem}-seed")
+    _git("clone", str(path), str(seed))
+    plants = seed / "src" / "data" / "plants"
+    plants.mkdir(parents=True)
+    (plants / "bellis-perennis.md").write_text("---\nlatin_name: Bellis perennis\n---\n")
+    (seed / "public" / "plants").mkdir(parents=True)
+    (seed / "public" / "plants" / ".gitkeep").write_text("")
+    _git("add", ".", cwd=seed)
+    _git(
+        "-c",
+        "user.name=Herbabot Benchmark",
+        "-c",
+        "user.email=benchmark@example.com",
+        "commit",
+        "-m",
+        "Initial commit",
+        cwd=seed,
+    )
+    _git("push", "origin", f"HEAD:{base_branch}", cwd=seed)
+    return path
+
+
+def _git(*args: str, cwd: Path | None = None) -> None:
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+
+
+def _completion_chunk(content: str | None, finish_reason: str | None = None) -> dict[str, Any]:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}],
+    }
+
+
+def _decode_params(content_type: str, body: bytes) -> dict[str, Any]:
+    """Decode the parameters of a Bot API call, sent as JSON or as form fields holding JSON values."""
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+
+    params: dict[str, Any] = {}
+    for name, value in parse_qsl(body.decode()):
+        try:
+            params[name] = json.loads(value)
+        except ValueError:
+            params[name] = value
+    return params
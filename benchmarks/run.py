@@ -0,0 +1,301 @@
+"""
+Offline throughput benchmark of the photo-to-PR pipeline.
+
+Starts local stand-ins for Telegram, Pl@ntNet, OpenAI and the GitHub pulls API, plus a bare
+git repository standing in for the portfolio, then sends a corpus of generated JPEG and HEIC
+photos through ``handle_file`` at each concurrency level and reports the jobs per second and
+the p50/p95 latency of every stage.
+
+    uv run python -m benchmarks.run --jobs 40 --concurrency 1,4,16 --plantnet-latency 0.8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_services import (
+    FakeGitHub,
+    FakeOpenAI,
+    FakePlantNet,
+    FakeService,
+    FakeTelegram,
+    create_portfolio_repo,
+)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class Latencies:
+    """Upstream latencies injected by the fake services, in seconds."""
+
+    telegram: float = 0.02
+    plantnet: float = 0.5
+    openai: float = 1.0
+    openai_token_interval: float = 0.01
+    github: float = 0.3
+    jitter: float = 0.2
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    jobs: int
+    done: int
+    failed: int
+    elapsed: float
+    job_latency: list[float]
+    handler_latency: list[float]
+    stages: dict[str, list[float]]
+    steps: dict[str, list[float]]
+    cache: dict[str, float] = field(default_factory=dict)
+    connections: dict[str, dict[str, int]] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Linearly interpolated ``q`` percentile (0-100) of ``values``."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def level_environment(
+    level_dir: Path,
+    concurrency: int,
+    origin: Path,
+    plantnet: FakePlantNet,
+    openai: FakeOpenAI,
+    github: FakeGitHub,
+    streaming: bool,
+) -> dict[str, str]:
+    """Environment configuring the bot for one level: fake upstreams and fresh queue, caches and mirror."""
+    cpu_bound = min(concurrency, os.cpu_count() or 1)
+    return {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+        "LOGGING_LEVEL": os.environ.get("LOGGING_LEVEL", "WARNING"),
+        "TELEGRAM_BOT_TOKEN": "123456:benchmark",
+        "ALLOWED_USER_IDS": "",
+        "PLANTNET_API_KEY": "benchmark",
+        "PLANTNET_API_URL": plantnet.identify_url,
+        "PLANTNET_CACHE_PATH": str(level_dir / "cache" / "plantnet.sqlite3"),
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": openai.base_url,
+        "DESCRIPTION_CACHE_PATH": str(level_dir / "cache" / "descriptions.sqlite3"),
+        "DESCRIPTION_STREAMING": str(streaming).lower(),
+        "GITHUB_TOKEN": "benchmark",
+        "GITHUB_REPO_URL": str(origin),
+        "GITHUB_REPO_OWNER": "benchmark",
+        "GITHUB_REPO_NAME": "portfolio",
+        "GITHUB_API_URL": github.url,
+        "GITHUB_COMMIT_BACKEND": "mirror",
+        "REPO_MIRROR_PATH": str(level_dir / "cache" / "portfolio.git"),
+        "SPECIES_INDEX_PATH": str(level_dir / "cache" / "species.sqlite3"),
+        # The generated photos share their gradient, they would all be taken for burst shots
+        "PHOTO_HASH_INDEX_PATH": "",
+        "PR_BATCH_WINDOW_SECONDS": "0",
+        # The fake services have no quotas, the benchmark measures the pipeline rather than the budgets
+        "PLANTNET_DAILY_QUOTA": "0",
+        "OPENAI_REQUESTS_PER_MINUTE": "0",
+        "OPENAI_TOKENS_PER_MINUTE": "0",
+        "GITHUB_REQUESTS_PER_HOUR": "0",
+        "GITHUB_PUSHES_PER_MINUTE": "0",
+        "UPDATE_MODE": "polling",
+        "METRICS_PORT": "0",
+        "CONCURRENT_UPDATES": str(concurrency),
+        "WORKER_THREADS": str(max(16, 4 * concurrency)),
+        "INGEST_CONCURRENCY": str(concurrency),
+        "IDENTIFY_CONCURRENCY": str(concurrency),
+        "DESCRIBE_CONCURRENCY": str(concurrency),
+        "RENDER_CONCURRENCY": str(concurrency),
+        "PR_CONCURRENCY": str(concurrency),
+        "ENCODE_CONCURRENCY": str(cpu_bound),
+        "LOOKUP_CONCURRENCY": str(concurrency),
+        "PROCESS_WORKERS": str(cpu_bound),
+        "WORKSPACE_ROOT": "",
+        "JOB_QUEUE_PATH": str(level_dir / "cache" / "jobs.sqlite3"),
+        "JOB_WORKSPACE_ROOT": str(level_dir / "cache" / "jobs"),
+        "JOB_WORKERS": str(concurrency),
+        "JOB_RETRY_DELAY_SECONDS": "0.5",
+        "JOB_RETRY_MAX_DELAY_SECONDS": "2",
+        "GIT_AUTHOR_NAME": "Herbabot Benchmark",
+        "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+        "GIT_COMMITTER_NAME": "Herbabot Benchmark",
+        "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+    }
+
+
+def run_benchmark(
+    workdir: Path,
+    jobs: int,
+    levels: list[int],
+    latencies: Latencies = Latencies(),
+    image_size: tuple[int, int] = (2016, 1512),
+    heic_ratio: float = 0.5,
+    users: int = 0,
+    species: int = 0,
+    streaming: bool = True,
+    timeout: float = 600,
+) -> list[LevelResult]:
+    """
+    Run the benchmark at each concurrency level and return the raw measurements.
+
+    Every level runs in a fresh process with its own queue, caches and repository mirror,
+    against the same fake services and portfolio repository.
+    """
+    photos = generate_corpus(workdir / "corpus", jobs, image_size, heic_ratio)
+    origin = workdir / "portfolio.git"
+    if not origin.exists():
+        create_portfolio_repo(origin)
+
+    telegram = FakeTelegram(
+        {photo.file_id: Path(photo.path) for photo in photos}, latencies.telegram, latencies.jitter
+    )
+    plantnet = FakePlantNet(species, latencies.plantnet, latencies.jitter)
+    openai = FakeOpenAI(latencies.openai, latencies.jitter, latencies.openai_token_interval)
+    github = FakeGitHub(latencies.github, latencies.jitter)
+    services: list[FakeService] = [telegram, plantnet, openai, github]
+    for service in services:
+        service.start()
+
+    results: list[LevelResult] = []
+    try:
+        for concurrency in levels:
+            level_dir = Path(tempfile.mkdtemp(prefix=f"level-{concurrency}-", dir=workdir))
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.driver",
+                    "--corpus",
+                    str(workdir / "corpus" / "corpus.json"),
+                    "--jobs",
+                    str(jobs),
+                    "--users",
+                    str(users),
+                    "--telegram-base-url",
+                    telegram.base_url,
+                    "--telegram-file-url",
+                    telegram.base_file_url,
+                    "--timeout",
+                    str(timeout),
+                ],
+                cwd=level_dir,
+                env=level_environment(level_dir, concurrency, origin, plantnet, openai, github, streaming),
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            if process.returncode != 0:
+                raise RuntimeError(f"Benchmark level {concurrency} failed with exit code {process.returncode}")
+            results.append(LevelResult(**json.loads(process.stdout.strip().splitlines()[-1])))
+    finally:
+        for service in services:
+            service.stop()
+
+    return results
+
+
+def format_report(results: list[LevelResult]) -> str:
+    lines: list[str] = []
+    for result in results:
+        lines.append(
+            f"Concurrency {result.concurrency}: {result.jobs} jobs ({result.done} done, {result.failed} failed) "
+            f"in {result.elapsed:.2f}s, {result.throughput:.2f} jobs/s"
+        )
+        lines.append(f"  {'stage':<32}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}")
+        rows = [
+            ("job (enqueued to pushed)", result.job_latency),
+            ("handler (update to enqueued)", result.handler_latency),
+            *sorted((f"step {name}", values) for name, values in result.steps.items()),
+            *sorted(result.stages.items()),
+        ]
+        for name, values in rows:
+            lines.append(
+                f"  {name:<32}{len(values):>6}"
+                f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+            )
+        if result.cache:
+            lines.append("  cache: " + ", ".join(f"{key}={value:g}" for key, value in sorted(result.cache.items())))
+        lines.append("")
+
+    lines.append(f"{'concurrency':>11}{'jobs/s':>10}{'job p50 s':>12}{'job p95 s':>12}")
+    for result in results:
+        lines.append(
+            f"{result.concurrency:>11}{result.throughput:>10.2f}"
+            f"{percentile(result.job_latency, 50):>12.2f}{percentile(result.job_latency, 95):>12.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    defaults = Latencies()
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the photo-to-PR pipeline against local fake services.",
+    )
+    parser.add_argument("--jobs", type=int, default=40, help="photos sent at each level (default: 40)")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels (default: 1,4,16)")
+    parser.add_argument("--image-size", default="2016x1512", help="WIDTHxHEIGHT of the photos (default: 2016x1512)")
+    parser.add_argument("--heic-ratio", type=float, default=0.5, help="share of HEIC photos (default: 0.5)")
+    parser.add_argument("--users", type=int, default=0, help="distinct senders, 0 for one per photo (default: 0)")
+    parser.add_argument(
+        "--species", type=int, default=0, help="distinct species returned, 0 for one per photo (default: 0)"
+    )
+    parser.add_argument("--no-streaming", action="store_true", help="disable streamed descriptions")
+    parser.add_argument("--telegram-latency", type=float, default=defaults.telegram)
+    parser.add_argument("--plantnet-latency", type=float, default=defaults.plantnet)
+    parser.add_argument("--openai-latency", type=float, default=defaults.openai, help="time to the first token")
+    parser.add_argument("--openai-token-interval", type=float, default=defaults.openai_token_interval)
+    parser.add_argument("--github-latency", type=float, default=defaults.github)
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="latency jitter, as a fraction")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for each level to drain")
+    parser.add_argument("--workdir", type=Path, help="reuse this directory for the corpus and repository")
+    parser.add_argument("--output", type=Path, help="also write the raw measurements to this JSON file")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    latencies = Latencies(
+        args.telegram_latency,
+        args.plantnet_latency,
+        args.openai_latency,
+        args.openai_token_interval,
+        args.github_latency,
+        args.jitter,
+    )
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="herbabot-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmark(
+        workdir.resolve(),
+        args.jobs,
+        [int(level) for level in args.concurrency.split(",")],
+        latencies,
+        (width, height),
+        args.heic_ratio,
+        args.users,
+        args.species,
+        not args.no_streaming,
+        args.timeout,
+    )
+    print(format_report(results))
+    if args.output:
+        args.output.write_text(json.dumps([{**vars(result)} for result in results], indent=2))
+
+
+if __name__ == "__main__":
+    main()
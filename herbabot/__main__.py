@@ -0,0 +1,111 @@
+"""
+Command line entry point of the package.
+
+    python -m herbabot bot                   # Run the Telegram bot, same as python -m herbabot.main
+    python -m herbabot import ~/Photos/2024  # Turn a directory of photos into plant entries
+    python -m herbabot gazetteer cities1000.txt --admin1 admin1CodesASCII.txt --countries countryInfo.txt
+                                             # Build the offline reverse geocoding index
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from herbabot.config import GAZETTEER_PATH, PR_BATCH_MAX_ENTRIES, get_logging_level
+
+
+def run_import(directory: Path, manifest: Path | None, concurrency: int, batch_size: int, publish: bool) -> None:
+    from herbabot.bulk_import import BulkImport
+    from herbabot.executor import shutdown_executor
+    from herbabot.http_clients import close_http_clients
+
+    bulk_import = BulkImport(directory, manifest, concurrency)
+
+    def progress(record: dict) -> None:
+        plant = (record.get("plant") or {}).get("latin_name", "")
+        detail = record.get("error") or record.get("entry") or record.get("duplicate_of") or ""
+        print(f"{record['status']:>9}  {record['file']}  {plant}  {detail}")
+
+    async def run() -> None:
+        summary = await bulk_import.run(progress)
+        print(
+            f"\n🌿 {summary.photos} photos: {summary.rendered} new entries, {summary.appended} observations appended, "
+            f"{summary.skipped} skipped, {summary.failed} failed, {summary.already_done} already imported"
+        )
+        if publish:
+            for pr_url in await bulk_import.publish(batch_size):
+                print(f"🔗 {pr_url}")
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_executor()
+        close_http_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m herbabot", description="Herbarium bot.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("bot", help="run the Telegram bot")
+
+    import_parser = commands.add_parser(
+        "import",
+        help="turn a directory of photos into plant entries",
+        description="Identify, describe and render every photo of a directory, then open pull requests. "
+        "Interrupted imports resume where they stopped.",
+    )
+    import_parser.add_argument("directory", type=Path, help="directory of JPEG, PNG or HEIC photos, read recursively")
+    import_parser.add_argument(
+        "--manifest", type=Path, help="progress manifest (default: .herbabot-import.jsonl in the directory)"
+    )
+    import_parser.add_argument(
+        "--concurrency", type=int, default=16, help="photos processed at the same time (default: 16)"
+    )
+    import_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=PR_BATCH_MAX_ENTRIES,
+        help="entries per pull request (default: PR_BATCH_MAX_ENTRIES)",
+    )
+    import_parser.add_argument(
+        "--no-publish", action="store_true", help="only render the entries, the next run publishes them"
+    )
+
+    gazetteer_parser = commands.add_parser(
+        "gazetteer",
+        help="build the offline reverse geocoding index",
+        description="Index the populated places of a GeoNames dump, e.g. cities1000.txt from "
+        "https://download.geonames.org/export/dump/, so entries get their locality, region and country.",
+    )
+    gazetteer_parser.add_argument("dump", type=Path, help="GeoNames dump of places")
+    gazetteer_parser.add_argument("--admin1", type=Path, help="admin1CodesASCII.txt, naming the regions")
+    gazetteer_parser.add_argument("--countries", type=Path, help="countryInfo.txt, naming the countries")
+    gazetteer_parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path(GAZETTEER_PATH) if GAZETTEER_PATH else None,
+        help="index directory (default: GAZETTEER_PATH)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=get_logging_level())
+    if args.command == "bot":
+        from herbabot.main import main as run_bot
+
+        run_bot()
+    elif args.command == "gazetteer":
+        from herbabot.geocoding import build_gazetteer
+
+        if args.output is None:
+            parser.error("--output is required when GAZETTEER_PATH is empty")
+        count = build_gazetteer(args.dump, args.output, args.admin1, args.countries)
+        print(f"🗺️ {count} places indexed in {args.output}")
+    else:
+        if not args.directory.is_dir():
+            parser.error(f"{args.directory} is not a directory")
+        run_import(args.directory, args.manifest, args.concurrency, args.batch_size, not args.no_publish)
+
+
+if __name__ == "__main__":
+    main()
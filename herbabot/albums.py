@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from telegram import Message
+
+from herbabot.config import MEDIA_GROUP_WINDOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AlbumPhoto:
+    """A downloaded photo of an album and the organ it shows, if the user tagged it."""
+
+    path: Path
+    organ: str | None
+    message: Message
+
+
+AlbumCallback = Callable[[list[AlbumPhoto]], Awaitable[None]]
+
+
+@dataclass
+class _Album:
+    on_complete: AlbumCallback
+    photos: list[AlbumPhoto] = field(default_factory=list)
+    downloading: int = 0
+    timer: asyncio.Task[None] | None = None
+
+
+class AlbumCollector:
+    """
+    Groups the photos of a Telegram album, which arrive as separate messages sharing a ``media_group_id``.
+
+    Every photo of an album is passed to ``add`` with the coroutine downloading it. Once all
+    started downloads are done and no new photo arrived for ``window_seconds``, the album's
+    ``on_complete`` callback is awaited with its photos, in the order they were sent.
+    """
+
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._albums: dict[str, _Album] = {}
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._albums)
+
+    async def add(self, key: str, download: Awaitable[AlbumPhoto | None], on_complete: AlbumCallback) -> None:
+        """
+        Add a photo to the album ``key``, started by the first photo with its ``on_complete``.
+
+        ``download`` resolves to the photo, or None when it could not be downloaded; the rest
+        of the album is still processed then.
+        """
+        album = self._albums.get(key)
+        if album is None:
+            album = _Album(on_complete)
+            self._albums[key] = album
+        album.downloading += 1
+        if album.timer is not None:
+            album.timer.cancel()
+            album.timer = None
+
+        try:
+            photo = await download
+        finally:
+            album.downloading -= 1
+
+        if photo is not None:
+            album.photos.append(photo)
+        if album.downloading == 0 and self._albums.get(key) is album:
+            album.timer = asyncio.create_task(self._complete_after_window(key, album))
+
+    async def flush(self) -> None:
+        """Complete every album now, without waiting for their window (used on shutdown)."""
+        for key, album in list(self._albums.items()):
+            if album.timer is not None:
+                album.timer.cancel()
+            await self._complete(key, album)
+
+    async def _complete_after_window(self, key: str, album: _Album) -> None:
+        await asyncio.sleep(self.window_seconds)
+        album.timer = None
+        await self._complete(key, album)
+
+    async def _complete(self, key: str, album: _Album) -> None:
+        if self._albums.get(key) is not album:
+            return
+        del self._albums[key]
+        if not album.photos:
+            return
+
+        photos = sorted(album.photos, key=lambda photo: photo.message.message_id)
+        logger.info(f"Album {key} complete with {len(photos)} photos")
+        try:
+            await album.on_complete(photos)
+        except Exception as e:
+            logger.error(f"Failed to process album {key}: {e}")
+
+
+_collector: AlbumCollector | None = None
+
+
+def get_album_collector() -> AlbumCollector | None:
+    """Return the shared album collector, or None when grouping is disabled (``MEDIA_GROUP_WINDOW_SECONDS=0``)."""
+    global _collector
+    if MEDIA_GROUP_WINDOW_SECONDS <= 0:
+        return None
+    if _collector is None:
+        _collector = AlbumCollector(MEDIA_GROUP_WINDOW_SECONDS)
+    return _collector
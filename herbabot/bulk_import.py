@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import logging
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from herbabot.config import (
+    ARCHIVE_EXIF_POLICY,
+    ARCHIVE_FORMATS,
+    ARCHIVE_MAX_EDGE,
+    ARCHIVE_QUALITY,
+    ARCHIVE_WIDTHS,
+    DUPLICATE_ENTRY_POLICY,
+    DUPLICATE_PHOTO_MAX_DISTANCE,
+    JOB_WORKSPACE_ROOT,
+)
+from herbabot.executor import run_blocking, run_cpu
+from herbabot.geocoding import locate_many
+from herbabot.github_pr import create_plant_pr, find_existing_entries, read_repository_file
+from herbabot.handlers_utils import prepare_date, prepare_gps_data
+from herbabot.image_ingest import ingest_image
+from herbabot.image_output import render_image_variants
+from herbabot.photo_hashes import get_photo_hash_index
+from herbabot.plant_description import generate_plant_description
+from herbabot.plant_entry import (
+    ENTRIES_DIR,
+    append_plant_entry,
+    create_plant_entry,
+    get_plant_entry_info,
+    plan_plant_entry,
+)
+from herbabot.plant_id import identify_ingested_specimen
+from herbabot.species_index import species_key
+from herbabot.workspace import JobWorkspace, job_workspace, open_job_workspace, remove_workspace
+
+logger = logging.getLogger(__name__)
+
+PHOTO_SUFFIXES = {".jpg", ".jpeg", ".png", ".heic", ".heif"}
+
+MANIFEST_NAME = ".herbabot-import.jsonl"
+
+# Manifest statuses of the photos that are not processed again on the next run
+RENDERED = "rendered"
+APPENDED = "appended"
+PUBLISHED = "published"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# Photos identified before their entries are rendered, the places of a batch are looked up at once
+LOCATE_BATCH_SIZE = 1000
+
+
+class ImportManifest:
+    """
+    Append-only JSON Lines record of the photos processed by a bulk import.
+
+    Every status change of a photo appends a line, so an interrupted import loses at most
+    the photos in flight; the last line of each photo wins when the manifest is loaded.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.records: dict[str, dict[str, Any]] = {}
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Line cut short by an interrupted write
+                    continue
+                self.records[record["file"]] = record
+
+    def get(self, file: str) -> dict[str, Any] | None:
+        return self.records.get(file)
+
+    def record(self, file: str, **fields: Any) -> dict[str, Any]:
+        """Store the new state of ``file``, keeping the fields of its previous state that are not overridden."""
+        record = {**self.records.get(file, {}), **fields, "file": file}
+        self.records[file] = record
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        return record
+
+
+@dataclass
+class _Claim:
+    """An entry path taken by a photo of this import, so other photos of the species see it."""
+
+    owner: str
+    species: str
+    published: bool
+
+
+@dataclass
+class _Identified:
+    """A photo identified by ``BulkImport._identify``, waiting for the place of its entry."""
+
+    file: str
+    workspace: JobWorkspace
+    archival_path: Path
+    exif_metadata: Dict[str, Any]
+    result: Dict[str, Any]
+    state: Dict[str, Any]
+
+
+@dataclass
+class ImportSummary:
+    photos: int = 0
+    rendered: int = 0
+    appended: int = 0
+    skipped: int = 0
+    failed: int = 0
+    already_done: int = 0
+
+
+def find_photos(directory: Path) -> list[Path]:
+    """Return the JPEG, PNG and HEIC photos under ``directory``, recursively, skipping hidden directories."""
+    return sorted(
+        path
+        for path in directory.rglob("*")
+        if path.is_file()
+        and path.suffix.lower() in PHOTO_SUFFIXES
+        and not any(part.startswith(".") for part in path.relative_to(directory).parts)
+    )
+
+
+class BulkImport:
+    """
+    Turns a directory of photos into plant entries through the same stages as the bot, without Telegram.
+
+    Photos are processed ``concurrency`` at a time. Each stage keeps its own limit from
+    ``STAGE_LIMITS``, so the upstream APIs see no more concurrent requests than with the bot,
+    and the image decoding and encoding run in the process pool. Photos of the same species
+    are planned one after the other, so that ``DUPLICATE_ENTRY_POLICY`` also applies to the
+    entries created earlier in the import.
+
+    Progress is recorded in an ``ImportManifest``: a new run skips the photos already
+    processed and retries the failed ones, along with the photos whose observations were
+    appended to their entries. Rendered entries are kept in persistent workspaces under
+    ``JOB_WORKSPACE_ROOT`` until ``publish`` opens their pull requests.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        manifest_path: Path | None = None,
+        concurrency: int = 16,
+        policy: str = DUPLICATE_ENTRY_POLICY,
+    ) -> None:
+        self.directory = directory
+        self.manifest = ImportManifest(manifest_path or directory / MANIFEST_NAME)
+        self.concurrency = concurrency
+        self.policy = policy
+        self._species_locks: dict[str, asyncio.Lock] = {}
+        self._claims: dict[str, _Claim] = {}
+        for file, record in self.manifest.records.items():
+            if record.get("status") in (RENDERED, PUBLISHED) and record.get("entry"):
+                self._claims[record["entry"]] = _Claim(file, record["species"], record["status"] == PUBLISHED)
+
+    def workspace(self, file: str) -> JobWorkspace:
+        """Persistent workspace of a photo, named after its path."""
+        digest = hashlib.sha1(str((self.directory / file).resolve()).encode()).hexdigest()[:12]
+        return open_job_workspace(f"import-{digest}", Path(JOB_WORKSPACE_ROOT))
+
+    async def run(self, on_progress: Callable[[dict[str, Any]], None] | None = None) -> ImportSummary:
+        """
+        Process every photo of the directory not processed yet.
+
+        ``on_progress`` is called with the manifest record of each photo once it is processed.
+        """
+        photos = find_photos(self.directory)
+        summary = ImportSummary(photos=len(photos))
+        slots = asyncio.Semaphore(max(1, self.concurrency))
+
+        done: dict[str, tuple[Path, int, int]] = {}
+        pending: list[tuple[Path, str, int, int]] = []
+        for path in photos:
+            file = path.relative_to(self.directory).as_posix()
+            stat = path.stat()
+            record = self.manifest.get(file)
+            if (
+                record is not None
+                and record.get("status") != FAILED
+                and (record.get("size"), record.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns)
+            ):
+                done[file] = (path, stat.st_size, stat.st_mtime_ns)
+            else:
+                pending.append((path, file, stat.st_size, stat.st_mtime_ns))
+
+        # Observations appended to the entry of a photo processed again would be lost with its workspace
+        rebuilt = {file for _, file, *_ in pending}
+        for file, (path, size, mtime_ns) in done.items():
+            record = self.manifest.records[file]
+            if record["status"] == APPENDED and record.get("into") in rebuilt:
+                pending.append((path, file, size, mtime_ns))
+        summary.already_done = len(photos) - len(pending)
+
+        def progress(record: dict[str, Any]) -> None:
+            status = record["status"]
+            setattr(summary, status, getattr(summary, status) + 1)
+            if on_progress:
+                on_progress(record)
+
+        async def identify(path: Path, file: str, size: int, mtime_ns: int) -> _Identified | None:
+            async with slots:
+                identified = await self._identify(path, file, size, mtime_ns)
+            if isinstance(identified, dict):
+                progress(identified)
+                return None
+            return identified
+
+        async def render(identified: _Identified, place: Dict[str, str] | None) -> None:
+            async with slots:
+                progress(await self._render(identified, place))
+
+        # Identified photos wait for the others of their batch, so that the whole batch is geocoded in one lookup
+        for start in range(0, len(pending), LOCATE_BATCH_SIZE):
+            identified = [
+                photo
+                for photo in await asyncio.gather(
+                    *(identify(*photo) for photo in pending[start : start + LOCATE_BATCH_SIZE])
+                )
+                if photo is not None
+            ]
+            places = await run_blocking(
+                "render", locate_many, [prepare_gps_data(photo.exif_metadata) for photo in identified]
+            )
+            await asyncio.gather(*(render(photo, place) for photo, place in zip(identified, places)))
+        return summary
+
+    async def _identify(self, path: Path, file: str, size: int, mtime_ns: int) -> _Identified | dict[str, Any]:
+        """Ingest and identify a photo, or return its manifest record when it is skipped or failed."""
+        # Start again from scratch, a previous attempt may have left files behind
+        self._release(file)
+        self.manifest.records.pop(file, None)
+        remove_workspace(self.workspace(file))
+        workspace = self.workspace(file)
+        state: Dict[str, Any] = {"size": size, "mtime_ns": mtime_ns}
+
+        index = get_photo_hash_index()
+        try:
+            image = await run_cpu("ingest", ingest_image, path, archival_dir=workspace.root)
+            if index is not None:
+                duplicate = await run_blocking(
+                    "photo_index", index.claim, [image.perceptual_hash], f"import:{file}", DUPLICATE_PHOTO_MAX_DISTANCE
+                )
+                if duplicate is not None:
+                    # A burst shot, or a photo already sent to the bot
+                    remove_workspace(workspace)
+                    return self.manifest.record(
+                        file, **state, status=SKIPPED, duplicate_of=duplicate.job_id.removeprefix("import:")
+                    )
+            result = await run_blocking("identify", identify_ingested_specimen, [image], [None])
+            if index is not None:
+                await run_blocking("photo_index", index.identify, f"import:{file}", result["latin_name"])
+        except Exception as e:
+            logger.error(f"Failed to identify {file}: {e}")
+            if index is not None:
+                await run_blocking("photo_index", index.forget, f"import:{file}")
+            remove_workspace(workspace)
+            return self.manifest.record(file, **state, status=FAILED, error=str(e))
+
+        state.update(species=species_key(result["latin_name"]), plant=result)
+        return _Identified(file, workspace, image.archival_path, image.exif_metadata, result, state)
+
+    async def _render(self, identified: _Identified, place: Dict[str, str] | None) -> dict[str, Any]:
+        """Plan and render the entry of an identified photo, and return its manifest record."""
+        file, workspace, state = identified.file, identified.workspace, identified.state
+        result, exif_metadata = identified.result, identified.exif_metadata
+        try:
+            async with self._species_locks.setdefault(state["species"], asyncio.Lock()):
+                entry = await self._plan(file, result, exif_metadata)
+                if entry["action"] == "skip":
+                    remove_workspace(workspace)
+                    return self.manifest.record(file, **state, status=SKIPPED, entry=entry["existing"])
+                if entry["action"] == "append":
+                    return await self._append(file, workspace, entry, exif_metadata, state)
+
+                description, image_variants = await asyncio.gather(
+                    run_blocking("describe", generate_plant_description, result),
+                    run_cpu(
+                        "encode",
+                        render_image_variants,
+                        identified.archival_path,
+                        workspace.entries_dir,
+                        entry["stem"],
+                        ARCHIVE_MAX_EDGE,
+                        ARCHIVE_WIDTHS,
+                        ARCHIVE_FORMATS,
+                        ARCHIVE_QUALITY,
+                        ARCHIVE_EXIF_POLICY == "keep",
+                    ),
+                )
+                entry_path = await run_blocking(
+                    "render",
+                    create_plant_entry,
+                    result,
+                    identified.archival_path,
+                    workspace.entries_dir,
+                    prepare_gps_data(exif_metadata),
+                    prepare_date(exif_metadata.get("date_taken")),
+                    description,
+                    image_variants,
+                    entry["stem"],
+                    place=place,
+                )
+                if not entry_path:
+                    raise RuntimeError("Failed to create plant entry")
+        except Exception as e:
+            logger.error(f"Failed to import {file}: {e}")
+            self._release(file)
+            remove_workspace(workspace)
+            return self.manifest.record(file, **state, status=FAILED, error=str(e))
+
+        return self.manifest.record(file, **state, status=RENDERED, entry=f"{ENTRIES_DIR}/{entry_path.name}")
+
+    async def _plan(self, file: str, result: Dict[str, Any], exif_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        species = species_key(result["latin_name"])
+        stem = get_plant_entry_info(result)["stem"]
+        try:
+            existing = [
+                entry.path
+                for entry in await run_blocking("species_index", find_existing_entries, result["latin_name"], stem)
+            ]
+        except Exception as e:
+            logger.warning(f"Failed to look up existing entries for {file}: {e}")
+            existing = []
+        existing += [path for path, claim in self._claims.items() if claim.species == species]
+
+        def plan(policy: str) -> Dict[str, Any]:
+            return plan_plant_entry(
+                result,
+                existing,
+                policy,
+                prepare_date(exif_metadata.get("date_taken")),
+                prepare_gps_data(exif_metadata) is not None,
+            )
+
+        entry = plan(self.policy)
+        claim = self._claims.get(entry["existing"] or "")
+        # Entries of this import are never overwritten, nor appended to once their pull request is open
+        if claim and (entry["action"] == "overwrite" or (entry["action"] == "append" and claim.published)):
+            entry = plan("variant")
+        if entry["action"] in ("create", "overwrite", "variant"):
+            self._claims[f"{ENTRIES_DIR}/{entry['stem']}.md"] = _Claim(file, species, False)
+        return entry
+
+    async def _append(
+        self,
+        file: str,
+        workspace: JobWorkspace,
+        entry: Dict[str, Any],
+        exif_metadata: Dict[str, Any],
+        state: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        date = prepare_date(exif_metadata.get("date_taken"))
+        gps_data = prepare_gps_data(exif_metadata)
+        remove_workspace(workspace)
+
+        claim = self._claims.get(entry["existing"])
+        if claim is not None:
+            # Another photo of this import already holds the entry, add the observation to its copy
+            entry_file = self.workspace(claim.owner).entries_dir / Path(entry["existing"]).name
+            entry_text = await run_blocking("render", entry_file.read_text, encoding="utf-8")
+            appended = await run_blocking("render", append_plant_entry, entry_text, entry_file, date, gps_data)
+            if not appended:
+                return self.manifest.record(file, **state, status=SKIPPED, entry=entry["existing"])
+            return self.manifest.record(file, **state, status=APPENDED, entry=entry["existing"], into=claim.owner)
+
+        workspace = self.workspace(file)
+        entry_text = await run_blocking("species_index", read_repository_file, entry["existing"])
+        entry_file = workspace.entries_dir / Path(entry["existing"]).name
+        appended = await run_blocking("render", append_plant_entry, entry_text, entry_file, date, gps_data)
+        if not appended:
+            remove_workspace(workspace)
+            return self.manifest.record(file, **state, status=SKIPPED, entry=entry["existing"])
+        self._claims[entry["existing"]] = _Claim(file, state["species"], False)
+        return self.manifest.record(file, **state, status=RENDERED, entry=entry["existing"])
+
+    def _release(self, file: str) -> None:
+        for path, claim in list(self._claims.items()):
+            if claim.owner == file and not claim.published:
+                del self._claims[path]
+
+    async def publish(self, batch_size: int) -> list[str]:
+        """
+        Open pull requests for the rendered entries, ``batch_size`` entries per pull request.
+
+        Entries of a pull request that failed stay rendered and are published by the next run.
+
+        Returns:
+            URLs of the opened pull requests
+        """
+        pending = sorted(file for file, record in self.manifest.records.items() if record["status"] == RENDERED)
+        pr_urls: list[str] = []
+        for start in range(0, len(pending), max(1, batch_size)):
+            files = pending[start : start + max(1, batch_size)]
+            with job_workspace("import") as batch:
+                await run_blocking(
+                    "render", _copy_entries, [self.workspace(file).entries_dir for file in files], batch.entries_dir
+                )
+                plant_infos = [self.manifest.records[file]["plant"] for file in files]
+                logger.info(f"Publishing {len(files)} imported entries")
+                pr_url = await run_blocking("pr", create_plant_pr, batch, plant_infos)
+
+            if not pr_url:
+                logger.error(f"Failed to publish {len(files)} imported entries, they will be retried on the next run")
+                continue
+
+            pr_urls.append(pr_url)
+            published = set(files)
+            for file, record in list(self.manifest.records.items()):
+                if file in published or (record["status"] == APPENDED and record.get("into") in published):
+                    self.manifest.record(file, status=PUBLISHED, pr_url=pr_url)
+                    if record.get("entry") in self._claims:
+                        self._claims[record["entry"]].published = True
+            for file in files:
+                remove_workspace(self.workspace(file))
+
+        return pr_urls
+
+
+def _copy_entries(source_dirs: list[Path], batch_dir: Path) -> None:
+    for source_dir in source_dirs:
+        for path in source_dir.iterdir():
+            if path.is_file():
+                shutil.copy2(path, batch_dir / path.name)
@@ -0,0 +1,197 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable
+
+from herbabot.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    """
+    Persistent JSON key/value cache backed by SQLite.
+
+    Entries expire ``ttl_seconds`` after they were stored, and the least recently used
+    entries are evicted once a namespace holds more than ``max_entries``. Several caches
+    can share one database file through distinct namespaces.
+    """
+
+    def __init__(self, path: Path, namespace: str, ttl_seconds: float, max_entries: int) -> None:
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value for ``key``, or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value, evicting expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created_at < ?",
+                (self.namespace, now - self.ttl_seconds),
+            )
+            self._conn.execute(
+                """
+                DELETE FROM cache WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_entries),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()
+        return row[0]
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the current number of entries."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    In-memory LRU cache in front of an optional ``SQLiteCache``.
+
+    ``get_or_compute`` also de-duplicates in-flight computations: when several threads ask
+    for the same missing key at once, only the first one computes it and the others wait
+    for its result. Lookups are recorded in the cache metrics under ``name``.
+    """
+
+    def __init__(self, disk: SQLiteCache | None, max_memory_entries: int, name: str = "cache") -> None:
+        self.disk = disk
+        self.name = name
+        self.max_memory_entries = max_memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._in_flight: dict[str, Future[Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value for ``key`` from memory, then disk, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        value = self.disk.get(key) if self.disk is not None else None
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._remember(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any | None]) -> Any | None:
+        """
+        Return the cached value for ``key``, computing and storing it on a miss.
+
+        None results are returned to every waiting caller but never cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            record_cache_lookup(self.name, True)
+            return value
+
+        with self._lock:
+            if key in self._memory:
+                self.hits += 1
+                record_cache_lookup(self.name, True)
+                return self._memory[key]
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            self.hits += 1
+            record_cache_lookup(self.name, True)
+            return future.result()
+
+        self.misses += 1
+        record_cache_lookup(self.name, False)
+        try:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and the number of entries held in memory."""
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+    def _remember(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
@@ -1,4 +1,5 @@
 import logging
+from typing import Literal
 
 from pydantic import ValidationError
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -8,13 +9,86 @@ class Config(BaseSettings):
     telegram_bot_token: str
     plantnet_api_key: str
     plantnet_api_url: str = "https://my-api.plantnet.org/v2/identify/all"
+    identification_max_edge: int = 1280
+    identification_jpeg_quality: int = 85
+    archival_jpeg_quality: int = 95
+    archive_max_edge: int = 2560
+    archive_widths: str = "640,1280"
+    archive_formats: str = "jpeg"
+    archive_quality: int = 85
+    archive_exif_policy: Literal["keep", "strip"] = "keep"
+    entry_templates: str = "plant_entry.md.j2"
+    template_cache_path: str = "cache/templates"
+    plantnet_cache_path: str = "cache/plantnet.sqlite3"
+    plantnet_cache_ttl_seconds: int = 30 * 24 * 3600
+    plantnet_cache_max_entries: int = 10000
     openai_api_key: str
+    description_cache_path: str = "cache/descriptions.sqlite3"
+    description_cache_ttl_seconds: int = 180 * 24 * 3600
+    description_cache_max_entries: int = 5000
+    description_cache_memory_entries: int = 256
+    description_streaming: bool = True
+    description_edit_interval_seconds: float = 1.5
+    openai_base_url: str = ""
     github_token: str
     github_repo_url: str
     github_repo_owner: str
     github_repo_name: str
+    github_base_branch: str = "main"
+    github_api_url: str = "https://api.github.com"
+    github_commit_backend: Literal["mirror", "api"] = "mirror"
+    http_connect_timeout_seconds: float = 5
+    http_read_timeout_seconds: float = 60
+    http_max_retries: int = 3
+    http_retry_backoff_seconds: float = 1
+    http_retry_max_delay_seconds: float = 60
+    http_pool_size: int = 10
+    rate_limit_max_wait_seconds: float = 30
+    plantnet_daily_quota: int = 500
+    openai_requests_per_minute: int = 500
+    openai_tokens_per_minute: int = 200000
+    github_requests_per_hour: int = 5000
+    github_pushes_per_minute: int = 20
+    repo_mirror_path: str = "cache/portfolio.git"
+    repo_mirror_max_age_seconds: float = 30
+    species_index_path: str = "cache/species.sqlite3"
+    duplicate_entry_policy: Literal["overwrite", "skip", "append", "variant"] = "variant"
+    photo_hash_index_path: str = "cache/photo_hashes.sqlite3"
+    duplicate_photo_max_distance: int = 10
+    gazetteer_path: str = "cache/gazetteer"
+    gazetteer_max_distance_km: float = 50.0
+    pr_batch_window_seconds: float = 0
+    pr_batch_max_entries: int = 20
+    media_group_window_seconds: float = 2
+    update_mode: Literal["polling", "webhook"] = "polling"
+    webhook_listen: str = "0.0.0.0"
+    webhook_port: int = 8443
+    webhook_path: str = "/telegram"
+    webhook_secret_token: str = ""
+    webhook_url: str = ""
+    webhook_max_body_bytes: int = 1024 * 1024
+    metrics_listen: str = "127.0.0.1"
+    metrics_port: int = 0
     allowed_user_ids: str = ""
     logging_level: str = "WARNING"
+    concurrent_updates: int = 16
+    worker_threads: int = 16
+    ingest_concurrency: int = 4
+    identify_concurrency: int = 4
+    describe_concurrency: int = 4
+    render_concurrency: int = 4
+    pr_concurrency: int = 2
+    encode_concurrency: int = 2
+    lookup_concurrency: int = 4
+    process_workers: int = 2
+    workspace_root: str = ""
+    job_queue_path: str = "cache/jobs.sqlite3"
+    job_workspace_root: str = "cache/jobs"
+    job_workers: int = 4
+    job_max_attempts: int = 5
+    job_retry_delay_seconds: float = 10
+    job_retry_max_delay_seconds: float = 600
+    job_lease_seconds: float = 60
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
@@ -24,12 +98,82 @@ config = Config()  # type: ignore
 TELEGRAM_BOT_TOKEN = config.telegram_bot_token
 PLANTNET_API_KEY = config.plantnet_api_key
 PLANTNET_API_URL = config.plantnet_api_url
+IDENTIFICATION_MAX_EDGE = config.identification_max_edge
+IDENTIFICATION_JPEG_QUALITY = config.identification_jpeg_quality
+ARCHIVAL_JPEG_QUALITY = config.archival_jpeg_quality
+ARCHIVE_MAX_EDGE = config.archive_max_edge
+ARCHIVE_QUALITY = config.archive_quality
+ARCHIVE_EXIF_POLICY = config.archive_exif_policy
+TEMPLATE_CACHE_PATH = config.template_cache_path
+PLANTNET_CACHE_PATH = config.plantnet_cache_path
+PLANTNET_CACHE_TTL_SECONDS = config.plantnet_cache_ttl_seconds
+PLANTNET_CACHE_MAX_ENTRIES = config.plantnet_cache_max_entries
 OPENAI_API_KEY = config.openai_api_key
+DESCRIPTION_CACHE_PATH = config.description_cache_path
+DESCRIPTION_CACHE_TTL_SECONDS = config.description_cache_ttl_seconds
+DESCRIPTION_CACHE_MAX_ENTRIES = config.description_cache_max_entries
+DESCRIPTION_CACHE_MEMORY_ENTRIES = config.description_cache_memory_entries
+DESCRIPTION_STREAMING = config.description_streaming
+DESCRIPTION_EDIT_INTERVAL_SECONDS = config.description_edit_interval_seconds
+OPENAI_BASE_URL = config.openai_base_url
 GITHUB_TOKEN = config.github_token
 GITHUB_REPO_URL = config.github_repo_url
 GITHUB_REPO_OWNER = config.github_repo_owner
 GITHUB_REPO_NAME = config.github_repo_name
+GITHUB_BASE_BRANCH = config.github_base_branch
+GITHUB_API_URL = config.github_api_url
+GITHUB_COMMIT_BACKEND = config.github_commit_backend
+HTTP_CONNECT_TIMEOUT_SECONDS = config.http_connect_timeout_seconds
+HTTP_READ_TIMEOUT_SECONDS = config.http_read_timeout_seconds
+HTTP_MAX_RETRIES = config.http_max_retries
+HTTP_RETRY_BACKOFF_SECONDS = config.http_retry_backoff_seconds
+HTTP_RETRY_MAX_DELAY_SECONDS = config.http_retry_max_delay_seconds
+HTTP_POOL_SIZE = config.http_pool_size
+RATE_LIMIT_MAX_WAIT_SECONDS = config.rate_limit_max_wait_seconds
+PLANTNET_DAILY_QUOTA = config.plantnet_daily_quota
+OPENAI_REQUESTS_PER_MINUTE = config.openai_requests_per_minute
+OPENAI_TOKENS_PER_MINUTE = config.openai_tokens_per_minute
+GITHUB_REQUESTS_PER_HOUR = config.github_requests_per_hour
+GITHUB_PUSHES_PER_MINUTE = config.github_pushes_per_minute
+REPO_MIRROR_PATH = config.repo_mirror_path
+REPO_MIRROR_MAX_AGE_SECONDS = config.repo_mirror_max_age_seconds
+SPECIES_INDEX_PATH = config.species_index_path
+DUPLICATE_ENTRY_POLICY = config.duplicate_entry_policy
+PHOTO_HASH_INDEX_PATH = config.photo_hash_index_path
+DUPLICATE_PHOTO_MAX_DISTANCE = config.duplicate_photo_max_distance
+GAZETTEER_PATH = config.gazetteer_path
+GAZETTEER_MAX_DISTANCE_KM = config.gazetteer_max_distance_km
+PR_BATCH_WINDOW_SECONDS = config.pr_batch_window_seconds
+PR_BATCH_MAX_ENTRIES = config.pr_batch_max_entries
+MEDIA_GROUP_WINDOW_SECONDS = config.media_group_window_seconds
+UPDATE_MODE = config.update_mode
+WEBHOOK_LISTEN = config.webhook_listen
+WEBHOOK_PORT = config.webhook_port
+WEBHOOK_PATH = config.webhook_path
+WEBHOOK_SECRET_TOKEN = config.webhook_secret_token
+WEBHOOK_URL = config.webhook_url
+WEBHOOK_MAX_BODY_BYTES = config.webhook_max_body_bytes
+METRICS_LISTEN = config.metrics_listen
+METRICS_PORT = config.metrics_port
 LOGGING_LEVEL = config.logging_level
+CONCURRENT_UPDATES = config.concurrent_updates
+WORKER_THREADS = config.worker_threads
+INGEST_CONCURRENCY = config.ingest_concurrency
+IDENTIFY_CONCURRENCY = config.identify_concurrency
+DESCRIBE_CONCURRENCY = config.describe_concurrency
+RENDER_CONCURRENCY = config.render_concurrency
+PR_CONCURRENCY = config.pr_concurrency
+ENCODE_CONCURRENCY = config.encode_concurrency
+LOOKUP_CONCURRENCY = config.lookup_concurrency
+PROCESS_WORKERS = config.process_workers
+WORKSPACE_ROOT = config.workspace_root
+JOB_QUEUE_PATH = config.job_queue_path
+JOB_WORKSPACE_ROOT = config.job_workspace_root
+JOB_WORKERS = config.job_workers
+JOB_MAX_ATTEMPTS = config.job_max_attempts
+JOB_RETRY_DELAY_SECONDS = config.job_retry_delay_seconds
+JOB_RETRY_MAX_DELAY_SECONDS = config.job_retry_max_delay_seconds
+JOB_LEASE_SECONDS = config.job_lease_seconds
 
 
 def get_logging_level() -> int:
@@ -60,3 +204,28 @@ def get_allowed_user_ids() -> list[int]:
 
 
 ALLOWED_USER_IDS = get_allowed_user_ids()
+
+
+def get_archive_widths() -> list[int]:
+    try:
+        return sorted({int(width.strip()) for width in config.archive_widths.split(",") if width.strip()})
+    except ValueError:
+        print(f"Warning: Invalid archive widths '{config.archive_widths}'. No responsive variants will be written.")
+        return []
+
+
+def get_archive_formats() -> list[str]:
+    # JPEG is always written, it is the image referenced by existing entries
+    formats = [fmt.strip().lower() for fmt in config.archive_formats.split(",") if fmt.strip()]
+    return ["jpeg"] + [fmt for fmt in dict.fromkeys(formats) if fmt != "jpeg"]
+
+
+def get_entry_templates() -> list[str]:
+    # The markdown entry is always rendered, the other templates write sidecar files next to it
+    templates = [name.strip() for name in config.entry_templates.split(",") if name.strip()]
+    return ["plant_entry.md.j2"] + [name for name in dict.fromkeys(templates) if name != "plant_entry.md.j2"]
+
+
+ARCHIVE_WIDTHS = get_archive_widths()
+ARCHIVE_FORMATS = get_archive_formats()
+ENTRY_TEMPLATES = get_entry_templates()
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, ParamSpec, TypeVar
+
+from herbabot.config import (
+    DESCRIBE_CONCURRENCY,
+    ENCODE_CONCURRENCY,
+    IDENTIFY_CONCURRENCY,
+    INGEST_CONCURRENCY,
+    LOOKUP_CONCURRENCY,
+    PR_CONCURRENCY,
+    PROCESS_WORKERS,
+    RENDER_CONCURRENCY,
+    WORKER_THREADS,
+)
+from herbabot.metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+STAGE_LIMITS: dict[str, int] = {
+    "ingest": INGEST_CONCURRENCY,
+    "identify": IDENTIFY_CONCURRENCY,
+    "describe": DESCRIBE_CONCURRENCY,
+    "render": RENDER_CONCURRENCY,
+    "encode": ENCODE_CONCURRENCY,
+    "pr": PR_CONCURRENCY,
+    # Lookups in the local indexes, kept apart from the stages whose slots and durations they would skew
+    "photo_index": LOOKUP_CONCURRENCY,
+    "species_index": LOOKUP_CONCURRENCY,
+    # Job queue updates, kept off the event loop as another process may hold the database lock;
+    # the queue serializes them on its connection anyway
+    "queue": 1,
+}
+
+_executor: ThreadPoolExecutor | None = None
+_process_executor: ProcessPoolExecutor | None = None
+_semaphores: dict[str, asyncio.Semaphore] = {}
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared worker pool used for blocking pipeline stages."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="herbabot-worker")
+        logger.info(f"Started worker pool with {WORKER_THREADS} threads")
+    return _executor
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool used for CPU-bound pipeline stages.
+
+    Workers are started from a fork server rather than forked from this process, whose
+    threads (worker pool, SQLite connections, HTTP sessions) may hold locks at fork time.
+    """
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(
+            max_workers=PROCESS_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+        logger.info(f"Started process pool with {PROCESS_WORKERS} workers")
+    return _process_executor
+
+
+def _get_semaphore(stage: str) -> asyncio.Semaphore:
+    if stage not in STAGE_LIMITS:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+
+    semaphore = _semaphores.get(stage)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, STAGE_LIMITS[stage]))
+        _semaphores[stage] = semaphore
+    return semaphore
+
+
+async def run_blocking(stage: str, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """
+    Run a blocking pipeline stage on the worker pool without stalling the event loop.
+
+    At most ``STAGE_LIMITS[stage]`` calls of the same stage run at once; extra calls wait
+    for a free slot, so a burst of uploads cannot exhaust the pool or the upstream APIs.
+
+    Args:
+        stage: Name of the pipeline stage (one of ``STAGE_LIMITS``)
+        func: Blocking callable to run
+        *args: Positional arguments for ``func``
+        **kwargs: Keyword arguments for ``func``
+
+    Returns:
+        The value returned by ``func``
+    """
+    return await _run_in(get_executor(), stage, func, *args, **kwargs)
+
+
+async def run_cpu(stage: str, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """
+    Run a CPU-bound pipeline stage in the process pool, bounded by the stage's concurrency limit.
+
+    ``func``, its arguments and its result must be picklable.
+    """
+    return await _run_in(get_process_executor(), stage, func, *args, **kwargs)
+
+
+async def _run_in(executor: Executor, stage: str, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    async with _get_semaphore(stage):
+        loop = asyncio.get_running_loop()
+        with time_stage(stage):
+            return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    """Stop the worker pools, waiting for running stages to finish."""
+    global _executor, _process_executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        logger.info("Worker pool stopped")
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=True)
+        _process_executor = None
+        logger.info("Process pool stopped")
+    _semaphores.clear()
@@ -1,25 +1,32 @@
 import logging
+import struct
 from datetime import datetime
-from pathlib import Path
+from io import BytesIO
 from typing import Any, Tuple
 
 import piexif
-from PIL import Image
+from PIL import Image, ImageOps
 from pillow_heif import register_heif_opener
 
 logger = logging.getLogger(__name__)
 register_heif_opener()
 
 
-def extract_exif_metadata(image_path: Path) -> dict[str, Any]:
-    if not image_path.exists():
-        logger.warning(f"Image file does not exist: {image_path}")
+def parse_exif_metadata(exif_bytes: bytes | None) -> dict[str, Any]:
+    """Extract the metadata from raw EXIF bytes, without decoding any pixel data."""
+    if not exif_bytes:
         return {}
 
-    exif = _get_exif_data(image_path)
-    if not exif:
+    try:
+        exif = piexif.load(exif_bytes)
+    except (ValueError, struct.error) as e:
+        logger.error(f"Error parsing EXIF data: {e}")
         return {}
 
+    return _exif_dict_to_metadata(exif)
+
+
+def _exif_dict_to_metadata(exif: dict[str, Any]) -> dict[str, Any]:
     date_taken = _get_date_taken(exif)
     gps_coords = _get_gps_coords(exif)
 
@@ -29,42 +36,36 @@ def extract_exif_metadata(image_path: Path) -> dict[str, Any]:
     }
 
 
-def convert_heic_to_jpeg(heic_path: Path) -> Path | None:
-    if not heic_path.exists():
-        logger.error(f"HEIC file does not exist: {heic_path}")
-        return None
-
-    try:
-        with Image.open(heic_path) as image:
-            # Convert to RGB mode if necessary (HEIC images might be in RGBA or other modes)
-            if image.mode in ("RGBA", "LA", "P"):
-                # Create a white background for transparent images
-                background = Image.new("RGB", image.size, (255, 255, 255))
-                if image.mode == "P":
-                    image = image.convert("RGBA")
-                background.paste(image, mask=image.split()[-1] if image.mode == "RGBA" else None)
-                image = background
-            elif image.mode != "RGB":
-                image = image.convert("RGB")
-
-            exif_data = image.info.get("exif")
-            out_path = heic_path.with_suffix(".jpg")
-            image.save(out_path, format="JPEG", exif=exif_data, optimize=True, quality=95)
-            logger.info(f"Successfully converted {heic_path} to {out_path}")
-            return out_path
-    except (OSError, ValueError, IOError) as e:
-        logger.error(f"Failed to convert HEIC {heic_path}: {e}")
-        return None
-
-
-def _get_exif_data(image_path: Path) -> dict[str, Any] | None:
-    try:
-        with Image.open(image_path) as img:
-            exif_dict = piexif.load(img.info.get("exif", b""))
-            return exif_dict
-    except (OSError, ValueError, IOError) as e:
-        logger.error(f"Error reading EXIF data from {image_path}: {e}")
-        return None
+def flatten_to_rgb(image: Image.Image) -> Image.Image:
+    """Convert an image to RGB mode (HEIC images might be in RGBA or other modes)."""
+    if image.mode in ("RGBA", "LA", "P"):
+        # Create a white background for transparent images
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        rgba = image.convert("RGBA") if image.mode == "P" else image
+        background.paste(rgba, mask=rgba.split()[-1] if rgba.mode in ("RGBA", "LA") else None)
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def encode_identification_image(image: Image.Image, max_edge: int, quality: int) -> bytes:
+    """
+    Encode the identification derivative of an already opened image.
+
+    When ``image`` is a JPEG that has not been loaded yet, it is switched to draft mode and
+    decoded at reduced scale, so it should not be used for full-size output afterwards.
+    """
+    original_size = image.size
+    image.draft("RGB", (max_edge, max_edge))
+    derivative = image.copy()
+    derivative.thumbnail((max_edge, max_edge), reducing_gap=3.0)
+    derivative = flatten_to_rgb(ImageOps.exif_transpose(derivative))
+
+    output = BytesIO()
+    derivative.save(output, format="JPEG", quality=quality)
+    logger.debug(f"Identification derivative: {original_size} -> {derivative.size}, {output.tell()} bytes")
+    return output.getvalue()
 
 
 def _get_date_taken(exif_data: dict[str, Any]) -> str | None:
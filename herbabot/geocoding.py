@@ -0,0 +1,331 @@
+import json
+import logging
+import math
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import numpy.typing as npt
+
+from herbabot.config import GAZETTEER_MAX_DISTANCE_KM, GAZETTEER_PATH
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Size of the grid cells the places are bucketed in, in degrees
+CELL_DEGREES = 1.0
+
+FORMAT_VERSION = 1
+
+
+@dataclass
+class Place:
+    """The populated place nearest to a point, with its first-level division and country."""
+
+    locality: str
+    region: str | None
+    country: str | None
+    distance_km: float
+
+
+def haversine_km(
+    lat1: npt.ArrayLike, lon1: npt.ArrayLike, lat2: npt.ArrayLike, lon2: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """Great-circle distances in kilometers between points given in degrees, element-wise."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def build_gazetteer(
+    dump_path: Path,
+    output_dir: Path,
+    admin1_path: Path | None = None,
+    country_info_path: Path | None = None,
+) -> int:
+    """
+    Build the gazetteer index from a GeoNames dump, e.g. ``cities1000.txt``.
+
+    Only populated places (feature class ``P``) are kept. Region and country names come from
+    the GeoNames ``admin1CodesASCII.txt`` and ``countryInfo.txt`` files when given, the raw
+    codes are used otherwise. The index is written to ``output_dir`` as NumPy arrays, which
+    ``Gazetteer`` memory-maps instead of loading.
+
+    Returns:
+        Number of indexed places
+    """
+    regions: dict[str, str] = {}
+    if admin1_path:
+        for line in admin1_path.read_text(encoding="utf-8").splitlines():
+            fields = line.split("\t")
+            if len(fields) >= 2:
+                regions[fields[0]] = fields[1]
+
+    countries: dict[str, str] = {}
+    if country_info_path:
+        for line in country_info_path.read_text(encoding="utf-8").splitlines():
+            fields = line.split("\t")
+            if not line.startswith("#") and len(fields) >= 5:
+                countries[fields[0]] = fields[4]
+
+    latitudes: list[float] = []
+    longitudes: list[float] = []
+    names: list[bytes] = []
+    region_ids: list[int] = []
+    country_ids: list[int] = []
+    region_names: dict[str, int] = {}
+    country_names: dict[str, int] = {}
+
+    with open(dump_path, encoding="utf-8") as dump:
+        for line in dump:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 11 or fields[6] != "P":
+                continue
+            country_code, admin1_code = fields[8], fields[10]
+            region = regions.get(f"{country_code}.{admin1_code}", admin1_code)
+            country = countries.get(country_code, country_code)
+
+            latitudes.append(float(fields[4]))
+            longitudes.append(float(fields[5]))
+            names.append(fields[1].encode("utf-8"))
+            region_ids.append(region_names.setdefault(region, len(region_names)) if region else -1)
+            country_ids.append(country_names.setdefault(country, len(country_names)) if country else -1)
+
+    latitude = np.array(latitudes, dtype=np.float32)
+    longitude = np.array(longitudes, dtype=np.float32)
+    rows, columns = _grid_shape()
+    cells = _cell_of(latitude, longitude, rows, columns)
+    order = np.argsort(cells, kind="stable")
+
+    name_lengths = np.array([len(names[i]) for i in order], dtype=np.int64)
+    name_offsets = np.concatenate([[0], np.cumsum(name_lengths)]).astype(np.int64)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    np.save(output_dir / "latitude.npy", latitude[order])
+    np.save(output_dir / "longitude.npy", longitude[order])
+    np.save(output_dir / "cell_starts.npy", np.searchsorted(cells[order], np.arange(rows * columns + 1)))
+    np.save(output_dir / "region.npy", np.array(region_ids, dtype=np.int32)[order])
+    np.save(output_dir / "country.npy", np.array(country_ids, dtype=np.int32)[order])
+    np.save(output_dir / "name_offsets.npy", name_offsets)
+    np.save(output_dir / "names.npy", np.frombuffer(b"".join(names[i] for i in order), dtype=np.uint8))
+    (output_dir / "gazetteer.json").write_text(
+        json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "cell_degrees": CELL_DEGREES,
+                "regions": list(region_names),
+                "countries": list(country_names),
+            }
+        )
+    )
+
+    logger.info(f"Gazetteer of {len(order)} places built in {output_dir}")
+    return len(order)
+
+
+class Gazetteer:
+    """
+    Offline reverse geocoder over a gazetteer index written by ``build_gazetteer``.
+
+    The places are bucketed in a grid of ``CELL_DEGREES`` cells stored in CSR form: the
+    places are sorted by cell and ``cell_starts`` holds where each cell starts. A lookup
+    only measures the places of the cells around each point, for all points at once, see
+    ``nearest``. The arrays are memory-mapped, so opening the index is instant and only the
+    pages of the visited cells are read.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        meta = json.loads((directory / "gazetteer.json").read_text())
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported gazetteer version {meta['version']} in {directory}")
+        self.directory = directory
+        self.regions: list[str] = meta["regions"]
+        self.countries: list[str] = meta["countries"]
+        self.rows, self.columns = _grid_shape(meta["cell_degrees"])
+        self.cell_degrees: float = meta["cell_degrees"]
+
+        def load(name: str) -> Any:
+            return np.load(directory / f"{name}.npy", mmap_mode="r")
+
+        self.latitude = load("latitude")
+        self.longitude = load("longitude")
+        self.cell_starts = load("cell_starts")
+        self.region = load("region")
+        self.country = load("country")
+        self.name_offsets = load("name_offsets")
+        self.names = load("names")
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def nearest(
+        self, latitudes: npt.ArrayLike, longitudes: npt.ArrayLike, max_distance_km: float = math.inf
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """
+        Find the nearest place of each point.
+
+        Points are first matched against the places of the 3x3 cells around them; the window
+        doubles for the points whose nearest place may lie outside of it, until it reaches
+        ``max_distance_km``. Beyond that distance, the nearest place found is not exact.
+
+        Returns:
+            Index of the nearest place of each point (-1 when none was found) and its distance
+            in kilometers
+        """
+        latitude = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))
+        longitude = np.atleast_1d(np.asarray(longitudes, dtype=np.float64))
+        best = np.full(len(latitude), -1, dtype=np.int64)
+        distance = np.full(len(latitude), np.inf)
+        if len(self) == 0:
+            return best, distance
+
+        pending = np.arange(len(latitude))
+        radius = 1
+        while len(pending):
+            if radius * self.cell_degrees >= 90:
+                # The window spans a pole, only measuring every place is exact
+                for point in pending:
+                    distances = haversine_km(latitude[point], longitude[point], self.latitude, self.longitude)
+                    best[point] = int(np.argmin(distances))
+                    distance[point] = float(distances[best[point]])
+                break
+
+            best[pending], distance[pending] = self._search(latitude[pending], longitude[pending], radius)
+            # Places outside the window are at least this far, in the narrowing longitude direction too
+            reach_degrees = (radius * self.cell_degrees) * np.cos(
+                np.radians(np.minimum(np.abs(latitude[pending]) + radius * self.cell_degrees, 90))
+            )
+            reach_km = np.radians(reach_degrees) * EARTH_RADIUS_KM
+            pending = pending[(distance[pending] > reach_km) & (reach_km < max_distance_km)]
+            radius *= 2
+
+        return best, distance
+
+    def _search(
+        self, latitude: npt.NDArray[np.float64], longitude: npt.NDArray[np.float64], radius: int
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]]:
+        """Nearest place of each point among the cells at most ``radius`` cells away, wrapping around the antimeridian."""
+        count = len(latitude)
+        best = np.full(count, -1, dtype=np.int64)
+        distance = np.full(count, np.inf)
+
+        offsets = np.arange(-radius, radius + 1)
+        row = np.clip(((latitude + 90) // self.cell_degrees).astype(np.int64), 0, self.rows - 1)
+        column = ((longitude + 180) // self.cell_degrees).astype(np.int64) % self.columns
+        neighbor_rows = row[:, None] + np.repeat(offsets, len(offsets))
+        neighbor_columns = (column[:, None] + np.tile(offsets, len(offsets))) % self.columns
+        valid = (neighbor_rows >= 0) & (neighbor_rows < self.rows)
+        cells = np.where(valid, neighbor_rows * self.columns + neighbor_columns, 0)
+        starts = np.where(valid, self.cell_starts[cells], 0).ravel()
+        counts = np.where(valid, self.cell_starts[cells + 1] - self.cell_starts[cells], 0).ravel()
+
+        total = int(counts.sum())
+        if not total:
+            return best, distance
+
+        # Flatten the candidate places of all the points, grouped by point
+        owner = np.repeat(np.repeat(np.arange(count), len(offsets) ** 2), counts)
+        candidate = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        distances = haversine_km(
+            latitude[owner], longitude[owner], self.latitude[candidate], self.longitude[candidate]
+        )
+
+        # Closest candidate of each point: sort by point, then distance, and keep the first
+        order = np.lexsort((distances, owner))
+        points, first = np.unique(owner[order], return_index=True)
+        best[points] = candidate[order[first]]
+        distance[points] = distances[order[first]]
+        return best, distance
+
+    def lookup(
+        self, latitudes: Iterable[float], longitudes: Iterable[float], max_distance_km: float = math.inf
+    ) -> list[Place | None]:
+        """Return the nearest place of each point, or None when none lies within ``max_distance_km``."""
+        best, distance = self.nearest(list(latitudes), list(longitudes), max_distance_km)
+        places: list[Place | None] = []
+        for index, km in zip(best.tolist(), distance.tolist()):
+            if index < 0 or km > max_distance_km:
+                places.append(None)
+                continue
+            region = int(self.region[index])
+            country = int(self.country[index])
+            places.append(
+                Place(
+                    locality=bytes(self.names[self.name_offsets[index] : self.name_offsets[index + 1]]).decode(
+                        "utf-8"
+                    ),
+                    region=self.regions[region] if region >= 0 else None,
+                    country=self.countries[country] if country >= 0 else None,
+                    distance_km=km,
+                )
+            )
+        return places
+
+
+def _grid_shape(cell_degrees: float = CELL_DEGREES) -> tuple[int, int]:
+    return math.ceil(180 / cell_degrees), math.ceil(360 / cell_degrees)
+
+
+def _cell_of(
+    latitude: npt.NDArray[np.float32], longitude: npt.NDArray[np.float32], rows: int, columns: int
+) -> npt.NDArray[np.int64]:
+    row = np.clip(((latitude.astype(np.float64) + 90) // CELL_DEGREES).astype(np.int64), 0, rows - 1)
+    column = ((longitude.astype(np.float64) + 180) // CELL_DEGREES).astype(np.int64) % columns
+    return row * columns + column
+
+
+_gazetteer: Gazetteer | None = None
+_gazetteer_loaded = False
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer | None:
+    """Return the shared gazetteer, or None when ``GAZETTEER_PATH`` is empty or holds no index."""
+    global _gazetteer, _gazetteer_loaded
+    with _gazetteer_lock:
+        if not _gazetteer_loaded:
+            _gazetteer_loaded = True
+            directory = Path(GAZETTEER_PATH) if GAZETTEER_PATH else None
+            if directory and (directory / "gazetteer.json").exists():
+                _gazetteer = Gazetteer(directory)
+                logger.info(f"Loaded gazetteer of {len(_gazetteer)} places from {directory}")
+            elif directory:
+                logger.info(f"No gazetteer in {directory}, entries will not be geocoded")
+        return _gazetteer
+
+
+def locate(gps_data: Dict[str, Any] | None) -> Dict[str, str] | None:
+    """Reverse geocode the coordinates of a photo, see ``locate_many``."""
+    return locate_many([gps_data])[0]
+
+
+def locate_many(gps_data: List[Dict[str, Any] | None]) -> List[Dict[str, str] | None]:
+    """
+    Reverse geocode the coordinates of photos into the ``locality``, ``region`` and ``country`` of their entries.
+
+    All the photos are looked up in one vectorized call. A photo gets None without
+    coordinates, without a gazetteer, or when its nearest place is further than
+    ``GAZETTEER_MAX_DISTANCE_KM``.
+    """
+    places: List[Dict[str, str] | None] = [None] * len(gps_data)
+    gazetteer = get_gazetteer()
+    located = [i for i, gps in enumerate(gps_data) if gps]
+    if gazetteer is None or not located:
+        return places
+
+    found = gazetteer.lookup(
+        [gps_data[i]["latitude"] for i in located],  # type: ignore[index]
+        [gps_data[i]["longitude"] for i in located],  # type: ignore[index]
+        GAZETTEER_MAX_DISTANCE_KM,
+    )
+    for i, place in zip(located, found):
+        if place is not None:
+            places[i] = {
+                key: value
+                for key, value in (("locality", place.locality), ("region", place.region), ("country", place.country))
+                if value
+            }
+    return places
@@ -0,0 +1,105 @@
+import base64
+import logging
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from herbabot.http_clients import get_http_session
+from herbabot.rate_limits import get_rate_limiter, update_from_github_headers
+
+logger = logging.getLogger(__name__)
+
+
+def github_headers(github_token: str) -> dict[str, str]:
+    return {
+        "Authorization": f"token {github_token}",
+        "Accept": "application/vnd.github.v3+json",
+    }
+
+
+def github_request(method: str, url: str, github_token: str, **kwargs: Any) -> requests.Response:
+    """Send a GitHub REST API request within the hourly budget, which the response headers keep up to date."""
+    limiter = get_rate_limiter("github")
+    if limiter is not None:
+        limiter.acquire(requests=1)
+    response = get_http_session("github").request(method, url, headers=github_headers(github_token), **kwargs)
+    update_from_github_headers(limiter, response.headers)
+    return response
+
+
+def _request(method: str, url: str, github_token: str, expected_status: int, **kwargs: Any) -> dict[str, Any]:
+    response = github_request(method, url, github_token, **kwargs)
+
+    if response.status_code != expected_status:
+        raise RuntimeError(f"GitHub API {method} {url} failed: {response.status_code} - {response.text}")
+
+    return response.json()
+
+
+def commit_files_via_api(
+    files: dict[str, Path],
+    commit_message: str,
+    branch_name: str,
+    base_branch: str,
+    github_token: str,
+    repo_owner: str,
+    repo_name: str,
+    api_url: str,
+) -> str:
+    """
+    Commit files on a new branch through the Git Data API, without any local repository.
+
+    Creates one blob per file, a tree on top of the base branch's tree, a commit and finally
+    the branch ref.
+
+    Args:
+        files: Mapping of repository paths to the local files to commit
+        commit_message: Message of the commit
+        branch_name: Name of the branch to create
+        base_branch: Branch the new commit is based on
+        github_token: Token used to authenticate against GitHub
+        repo_owner: Owner of the portfolio repository
+        repo_name: Name of the portfolio repository
+        api_url: Base URL of the GitHub REST API
+
+    Returns:
+        SHA of the created commit
+    """
+    repo_api = f"{api_url}/repos/{repo_owner}/{repo_name}"
+    logger.info(f"Committing {len(files)} files on branch {branch_name} via the Git Data API")
+
+    base_commit = _request("GET", f"{repo_api}/git/ref/heads/{base_branch}", github_token, 200)["object"]["sha"]
+    base_tree = _request("GET", f"{repo_api}/git/commits/{base_commit}", github_token, 200)["tree"]["sha"]
+
+    tree_items = []
+    for path, local_file in files.items():
+        blob = _request(
+            "POST",
+            f"{repo_api}/git/blobs",
+            github_token,
+            201,
+            json={"content": base64.b64encode(local_file.read_bytes()).decode("ascii"), "encoding": "base64"},
+        )
+        tree_items.append({"path": path, "mode": "100644", "type": "blob", "sha": blob["sha"]})
+
+    tree = _request(
+        "POST", f"{repo_api}/git/trees", github_token, 201, json={"base_tree": base_tree, "tree": tree_items}
+    )
+    commit = _request(
+        "POST",
+        f"{repo_api}/git/commits",
+        github_token,
+        201,
+        json={"message": commit_message, "tree": tree["sha"], "parents": [base_commit]},
+    )
+    _request(
+        "POST",
+        f"{repo_api}/git/refs",
+        github_token,
+        201,
+        json={"ref": f"refs/heads/{branch_name}", "sha": commit["sha"]},
+    )
+
+    logger.info(f"Commit {commit['sha'][:8]} created on {branch_name}")
+    return commit["sha"]
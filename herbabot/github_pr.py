@@ -1,191 +1,156 @@
 import logging
-import shutil
-import subprocess
-import tempfile
 import uuid
 from pathlib import Path
 
-import requests
-
-from herbabot.config import GITHUB_REPO_NAME, GITHUB_REPO_OWNER, GITHUB_REPO_URL, GITHUB_TOKEN
+from herbabot.config import (
+    ENTRY_TEMPLATES,
+    GITHUB_API_URL,
+    GITHUB_BASE_BRANCH,
+    GITHUB_COMMIT_BACKEND,
+    GITHUB_REPO_NAME,
+    GITHUB_REPO_OWNER,
+    GITHUB_REPO_URL,
+    GITHUB_TOKEN,
+    REPO_MIRROR_MAX_AGE_SECONDS,
+    REPO_MIRROR_PATH,
+)
+from herbabot.github_api import commit_files_via_api, github_request
+from herbabot.metrics import time_stage
+from herbabot.plant_entry import ENTRIES_DIR
+from herbabot.rate_limits import RateLimitedError, get_rate_limiter
+from herbabot.repo_mirror import commit_files, read_objects, sync_mirror
+from herbabot.species_index import SpeciesEntry, get_species_index
+from herbabot.templating import output_suffix
+from herbabot.workspace import JobWorkspace
 
 logger = logging.getLogger(__name__)
 
+IMAGE_SUFFIXES = {".jpg", ".webp", ".avif"}
+ENTRY_SUFFIXES = {output_suffix(name) for name in ENTRY_TEMPLATES}
+
 
 def create_pr_from_plant_entries(
-    tmp_dir: Path,
+    workspace: JobWorkspace,
     repo_url: str,
     github_token: str,
     repo_owner: str,
     repo_name: str,
-    plant_info: dict | None = None,
+    plant_info: dict | list[dict] | None = None,
+    mirror_path: Path = Path(REPO_MIRROR_PATH),
+    base_branch: str = GITHUB_BASE_BRANCH,
+    commit_backend: str = GITHUB_COMMIT_BACKEND,
+    api_url: str = GITHUB_API_URL,
+    mirror_max_age_seconds: float = REPO_MIRROR_MAX_AGE_SECONDS,
 ) -> str | None:
-    if not tmp_dir.exists():
-        logger.warning(f"Tmp directory {tmp_dir} does not exist")
+    entries_dir = workspace.entries_dir
+    if not entries_dir.exists():
+        logger.warning(f"Entries directory {entries_dir} does not exist")
         return None
 
-    # Find all markdown files in tmp directory
-    md_files = list(tmp_dir.glob("*.md"))
+    # Find all markdown files of this job
+    md_files = list(entries_dir.glob("*.md"))
     if not md_files:
-        logger.warning("No markdown files found in tmp directory")
+        logger.warning(f"No markdown files found in {entries_dir}")
         return None
 
-    with tempfile.TemporaryDirectory() as temp_clone_dir:
-        try:
-            # Clone the repo
-            clone_path = Path(temp_clone_dir)
-            clone_repo(clone_path, repo_url, github_token)
-
-            # Create branch
-            branch_name = f"bot_{uuid.uuid4().hex[:8]}"
-            create_branch(clone_path, branch_name)
-
-            # Copy files
-            files_copied = copy_plant_files(tmp_dir, clone_path)
-            if not files_copied:
-                logger.warning("No files were copied")
-                return None
-
-            # Commit and push
-            commit_message = f"Add plant entries: {', '.join([f.name for f in md_files])}"
-            commit_and_push(clone_path, commit_message, branch_name)
-
-            # Generate PR body
-            if plant_info:
-                body = f"**Plant:** {plant_info.get('latin_name', 'Unknown')}\n"
-                if plant_info.get("common_name"):
-                    body += f"**Common name:** {plant_info['common_name']}\n"
-                if plant_info.get("score") is not None:
-                    body += f"**Confidence:** {plant_info['score']*100:.1f}%\n"
-                body += f"\n\nThis PR was automatically generated by the Herbabot plant identification system."
-            else:
-                body = (
-                    f"Automated PR from Herbabot\n\n"
-                    f"This PR was automatically generated by the Herbabot plant identification system."
+    try:
+        branch_name = f"bot_{uuid.uuid4().hex[:8]}"
+        commit_message = f"Add plant entries: {', '.join([f.name for f in md_files])}"
+        files = collect_plant_files(entries_dir)
+
+        # Pushes have their own budget, on top of the REST calls
+        limiter = get_rate_limiter("github")
+        if limiter is not None:
+            limiter.acquire(pushes=1)
+
+        if commit_backend == "api":
+            # Create blobs, tree, commit and branch through the Git Data API
+            with time_stage("github_commit_api"):
+                commit_files_via_api(
+                    files,
+                    commit_message,
+                    branch_name,
+                    base_branch,
+                    github_token,
+                    repo_owner,
+                    repo_name,
+                    api_url,
                 )
-
-            # Create pull request
-            pr_url = create_pull_request(
-                branch_name,
+        else:
+            # Refresh the local mirror of the repo (unless just prefetched), then commit on a new branch and push
+            sync_mirror(mirror_path, repo_url, github_token, mirror_max_age_seconds)
+            commit_files(
+                mirror_path,
+                files,
                 commit_message,
-                body,
+                branch_name,
+                base_branch,
+                workspace.git_index,
                 github_token,
-                repo_owner,
-                repo_name,
             )
 
-            logger.info(f"Pull request created successfully: {pr_url}")
-            return pr_url
-
-        except Exception as e:
-            logger.error(f"Failed to create pull request: {e}")
-            return None
-
-
-def clone_repo(clone_path: Path, repo_url: str, github_token: str) -> None:
-    """Clone the repository to the specified path."""
-    logger.info(f"Cloning repository to {clone_path}")
-
-    # Use HTTPS with token for authentication
-    if repo_url.startswith("git@github.com:"):
-        # Convert SSH URL to HTTPS with token
-        repo_path = repo_url.replace("git@github.com:", "")
-        auth_url = f"https://{github_token}@github.com/{repo_path}"
-    else:
-        # Already HTTPS URL, just add token
-        auth_url = repo_url.replace("https://", f"https://{github_token}@")
-
-    result = subprocess.run(
-        ["git", "clone", auth_url, str(clone_path)],
-        capture_output=True,
-        text=True,
-        cwd=clone_path.parent,
-    )
-
-    if result.returncode != 0:
-        raise RuntimeError(f"Failed to clone repository: {result.stderr}")
-
-    logger.info("Repository cloned successfully")
-
-
-def create_branch(repo_path: Path, branch_name: str) -> None:
-    """Create a new branch in the repository."""
-    logger.info(f"Creating branch: {branch_name}")
-
-    result = subprocess.run(
-        ["git", "checkout", "-b", branch_name],
-        capture_output=True,
-        text=True,
-        cwd=repo_path,
-    )
-
-    if result.returncode != 0:
-        raise RuntimeError(f"Failed to create branch: {result.stderr}")
-
-    logger.info(f"Branch {branch_name} created successfully")
-
-
-def copy_plant_files(tmp_dir: Path, repo_path: Path) -> bool:
-    """Copy plant entry files from tmp to the appropriate directories in the repo."""
-    files_copied = False
-
-    # Create target directories if they don't exist
-    plants_data_dir = repo_path / "src" / "data" / "plants"
-    plants_public_dir = repo_path / "public" / "plants"
-
-    plants_data_dir.mkdir(parents=True, exist_ok=True)
-    plants_public_dir.mkdir(parents=True, exist_ok=True)
-
-    # Copy markdown files
-    for md_file in tmp_dir.glob("*.md"):
-        dest_path = plants_data_dir / md_file.name
-        shutil.copy2(md_file, dest_path)
-        logger.info(f"Copied markdown file: {md_file.name}")
-        files_copied = True
-
-    # Copy image files
-    for img_file in tmp_dir.glob("*.jpg"):
-        dest_path = plants_public_dir / img_file.name
-        shutil.copy2(img_file, dest_path)
-        logger.info(f"Copied image file: {img_file.name}")
-        files_copied = True
-
-    return files_copied
-
-
-def commit_and_push(repo_path: Path, commit_message: str, branch_name: str) -> None:
-    """Commit changes and push to the remote repository."""
-    logger.info("Committing and pushing changes")
+        # Generate PR body
+        plant_infos = plant_info if isinstance(plant_info, list) else [plant_info] if plant_info else []
+        if len(plant_infos) == 1:
+            info = plant_infos[0]
+            body = f"**Plant:** {info.get('latin_name', 'Unknown')}\n"
+            if info.get("common_name"):
+                body += f"**Common name:** {info['common_name']}\n"
+            if info.get("score") is not None:
+                body += f"**Confidence:** {info['score']*100:.1f}%\n"
+            body += f"\n\nThis PR was automatically generated by the Herbabot plant identification system."
+        elif plant_infos:
+            body = f"**Plants ({len(plant_infos)}):**\n\n| Plant | Common name | Confidence |\n| --- | --- | --- |\n"
+            for info in plant_infos:
+                score = f"{info['score']*100:.1f}%" if info.get("score") is not None else ""
+                body += f"| {info.get('latin_name', 'Unknown')} | {info.get('common_name') or ''} | {score} |\n"
+            body += f"\n\nThis PR was automatically generated by the Herbabot plant identification system."
+        else:
+            body = (
+                f"Automated PR from Herbabot\n\n"
+                f"This PR was automatically generated by the Herbabot plant identification system."
+            )
 
-    # Add all files
-    result = subprocess.run(["git", "add", "."], capture_output=True, text=True, cwd=repo_path)
+        # Create pull request
+        pr_url = create_pull_request(
+            branch_name,
+            commit_message,
+            body,
+            github_token,
+            repo_owner,
+            repo_name,
+            base_branch,
+            api_url,
+        )
+
+        logger.info(f"Pull request created successfully: {pr_url}")
+        return pr_url
+
+    except RateLimitedError:
+        # The job is retried once the budget refilled
+        raise
+    except Exception as e:
+        logger.error(f"Failed to create pull request: {e}")
+        return None
 
-    if result.returncode != 0:
-        raise RuntimeError(f"Failed to add files: {result.stderr}")
 
-    # Commit
-    result = subprocess.run(
-        ["git", "commit", "-m", commit_message],
-        capture_output=True,
-        text=True,
-        cwd=repo_path,
-    )
+def collect_plant_files(entries_dir: Path) -> dict[str, Path]:
+    """Map plant entry files from the job workspace to their destination paths in the repo."""
+    files: dict[str, Path] = {}
 
-    if result.returncode != 0:
-        raise RuntimeError(f"Failed to commit: {result.stderr}")
-
-    # Push
-    result = subprocess.run(
-        ["git", "push", "origin", branch_name],
-        capture_output=True,
-        text=True,
-        cwd=repo_path,
-    )
+    # Markdown entries and their sidecar files go to the data directory
+    for entry_file in sorted(entries_dir.iterdir()):
+        if entry_file.suffix in ENTRY_SUFFIXES:
+            files[f"{ENTRIES_DIR}/{entry_file.name}"] = entry_file
+            logger.info(f"Collected entry file: {entry_file.name}")
 
-    if result.returncode != 0:
-        raise RuntimeError(f"Failed to push: {result.stderr}")
+    # Images are served from the public directory
+    for img_file in sorted(entries_dir.iterdir()):
+        if img_file.suffix in IMAGE_SUFFIXES:
+            files[f"public/plants/{img_file.name}"] = img_file
+            logger.info(f"Collected image file: {img_file.name}")
 
-    logger.info("Changes committed and pushed successfully")
+    return files
 
 
 def create_pull_request(
@@ -195,26 +160,23 @@ def create_pull_request(
     github_token: str,
     repo_owner: str,
     repo_name: str,
+    base_branch: str = GITHUB_BASE_BRANCH,
+    api_url: str = GITHUB_API_URL,
 ) -> str:
     """Create a pull request using GitHub API."""
     logger.info("Creating pull request via GitHub API")
 
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
-
     data = {
         "title": title,
         "body": body,
         "head": branch_name,
-        "base": "main",  # Assuming main is the default branch
+        "base": base_branch,
     }
 
-    api_base = "https://api.github.com"
-    url = f"{api_base}/repos/{repo_owner}/{repo_name}/pulls"
+    url = f"{api_url}/repos/{repo_owner}/{repo_name}/pulls"
 
-    response = requests.post(url, headers=headers, json=data)
+    with time_stage("github_pr_api"):
+        response = github_request("POST", url, github_token, json=data)
 
     if response.status_code != 201:
         raise RuntimeError(f"Failed to create PR: {response.status_code} - {response.text}")
@@ -223,12 +185,46 @@ def create_pull_request(
     return pr_data["html_url"]
 
 
-def create_plant_pr(tmp_dir: Path, plant_info: dict | None = None) -> str | None:
+def create_plant_pr(workspace: JobWorkspace, plant_info: dict | list[dict] | None = None) -> str | None:
     return create_pr_from_plant_entries(
-        tmp_dir,
+        workspace,
         GITHUB_REPO_URL,
         GITHUB_TOKEN,
         GITHUB_REPO_OWNER,
         GITHUB_REPO_NAME,
         plant_info,
     )
+
+
+def prefetch_repository() -> None:
+    """Sync the repository mirror ahead of a push, so that the push itself does not have to wait for the fetch."""
+    if GITHUB_COMMIT_BACKEND != "mirror":
+        return
+    sync_mirror(Path(REPO_MIRROR_PATH), GITHUB_REPO_URL, GITHUB_TOKEN, REPO_MIRROR_MAX_AGE_SECONDS)
+
+
+def find_existing_entries(scientific_name: str, stem: str) -> list[SpeciesEntry]:
+    """
+    Look up the portfolio entries of a species, and the entry its file name would overwrite, in the species index.
+
+    The index is refreshed from the repository mirror first, which is only synced again
+    when older than ``REPO_MIRROR_MAX_AGE_SECONDS``. Nothing is found with the API backend,
+    which keeps no local copy of the repository, or when the index is disabled.
+    """
+    index = get_species_index()
+    if index is None or GITHUB_COMMIT_BACKEND != "mirror":
+        return []
+
+    mirror_path = Path(REPO_MIRROR_PATH)
+    sync_mirror(mirror_path, GITHUB_REPO_URL, GITHUB_TOKEN, REPO_MIRROR_MAX_AGE_SECONDS)
+    index.refresh(mirror_path, GITHUB_BASE_BRANCH)
+    return index.find(scientific_name, f"{ENTRIES_DIR}/{stem}.md")
+
+
+def read_repository_file(path: str) -> str:
+    """Read a file of the base branch from the repository mirror."""
+    name = f"refs/heads/{GITHUB_BASE_BRANCH}:{path}"
+    contents = read_objects(Path(REPO_MIRROR_PATH), [name])
+    if name not in contents:
+        raise FileNotFoundError(f"{path} not found on {GITHUB_BASE_BRANCH}")
+    return contents[name].decode("utf-8")
@@ -1,24 +1,17 @@
 import logging
-from functools import wraps
-from pathlib import Path
-from typing import Any, Callable, Coroutine, Dict
+from functools import partial, wraps
+from typing import Any, Callable, Coroutine
 
 from telegram import Message, Update
 from telegram.ext import CommandHandler, ContextTypes, MessageHandler, filters
 
+from herbabot.albums import AlbumPhoto, get_album_collector
 from herbabot.config import ALLOWED_USER_IDS
-from herbabot.exif_utils import extract_exif_metadata
-from herbabot.github_pr import create_plant_pr
-from herbabot.handlers_utils import (
-    cleanup_temporary_directory,
-    handle_exif_metadata,
-    load_welcome_message,
-    prepare_date,
-    prepare_gps_data,
-    process_incoming_file,
-)
-from herbabot.plant_entry import create_plant_entry, get_plant_entry_info
-from herbabot.plant_id import identify_plant
+from herbabot.executor import run_blocking
+from herbabot.handlers_utils import load_welcome_message, parse_force, parse_organ, process_incoming_file
+from herbabot.job_queue import WAITING, get_job_queue
+from herbabot.pipeline import wake_job_workers
+from herbabot.pr_batcher import get_pr_batcher
 
 logger = logging.getLogger(__name__)
 
@@ -58,25 +51,42 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 @require_authorized_user
 async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.message
-    tmp_dir = Path("tmp")
 
-    if not message:
+    if not message or not update.effective_user:
         return None
 
     try:
+        # Photos of an album are identified together, as a single specimen
+        collector = get_album_collector()
+        if message.media_group_id and collector:
+            await collector.add(
+                f"{message.chat_id}:{message.media_group_id}",
+                _download_album_photo(message),
+                partial(_enqueue_album, update.effective_user.id),
+            )
+            return
+
         # Validate and download file
         file_path = await process_incoming_file(message)
         if not file_path:
             return
 
+        # The rest of the pipeline runs in the job workers and survives restarts
+        organ = parse_organ(message.caption)
+        outputs: dict[str, Any] = {"photos": [{"path": str(file_path), "organ": organ}]} if organ else {}
+        if parse_force(message.caption):
+            outputs["force"] = True
+        await run_blocking(
+            "queue",
+            get_job_queue().enqueue,
+            message.chat_id,
+            message.message_id,
+            update.effective_user.id,
+            file_path,
+            outputs,
+        )
         await message.reply_text("📸 *Image received!* Processing your plant... 🌿", parse_mode="Markdown")
-
-        # Extract EXIF metadata
-        exif_metadata = extract_exif_metadata(file_path)
-        await handle_exif_metadata(message, exif_metadata)
-
-        # Process plant identification and create entry
-        await _process_plant_identification(message, file_path, exif_metadata, tmp_dir)
+        wake_job_workers()
 
     except Exception as e:
         logger.error(f"Error processing file: {e}")
@@ -84,95 +94,54 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             "❌ *An error occurred while processing your file*\n\nPlease try again.",
             parse_mode="Markdown",
         )
-    finally:
-        cleanup_temporary_directory(tmp_dir)
-
-
-def register_handlers(app: Any) -> None:
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(MessageHandler(filters.ATTACHMENT, handle_file))
-
-
-async def _process_plant_identification(
-    message: Message,
-    file_path: Path,
-    exif_metadata: Dict[str, Any],
-    tmp_dir: Path,
-) -> None:
-    try:
-        logger.info(f"Starting plant identification for file: {file_path}")
-        logger.debug(f"File size: {file_path.stat().st_size} bytes")
-
-        result = identify_plant(file_path)
-        logger.info(f"Plant identification successful: {result.get('latin_name', 'Unknown')}")
-
-        # Send plant identification results
-        await _send_plant_identification_result(message, result)
-
-        # Notify user about AI description generation
-        await message.reply_text("🤖 *Generating detailed description with AI...*", parse_mode="Markdown")
-
-        # Create plant entry and PR
-        await _create_plant_entry_and_pr(message, result, file_path, exif_metadata, tmp_dir)
-
-    except Exception as e:
-        logger.error("Plant identification error", exc_info=True)
-        logger.error(f"Plant identification failed for file: {file_path}")
-        logger.error(f"Error details: {str(e)}")
-        await message.reply_text(
-            "❌ *Could not identify the plant*\n\nPlease try another photo with better lighting and focus.",
-            parse_mode="Markdown",
-        )
 
 
-async def _send_plant_identification_result(message: Message, result: Dict[str, Any]) -> None:
-    """Send formatted plant identification results to the user."""
-    plant_message = f"🌿 *{result['latin_name']}*"
+async def _download_album_photo(message: Message) -> AlbumPhoto | None:
+    file_path = await process_incoming_file(message)
+    if not file_path:
+        return None
+    return AlbumPhoto(file_path, parse_organ(message.caption), message)
 
-    if result.get("common_name"):
-        plant_message += f"\n🌸 _{result['common_name']}_"
 
-    if result.get("family"):
-        plant_message += f"\n🌳 **Family:** {result['family']}"
+async def _enqueue_album(user_id: int, photos: list[AlbumPhoto]) -> None:
+    # The job replies to the first photo of the album
+    first = photos[0].message
+    outputs: dict[str, Any] = {"photos": [{"path": str(photo.path), "organ": photo.organ} for photo in photos]}
+    if any(parse_force(photo.message.caption) for photo in photos):
+        outputs["force"] = True
+    await run_blocking(
+        "queue", get_job_queue().enqueue, first.chat_id, first.message_id, user_id, photos[0].path, outputs
+    )
+    await first.reply_text(
+        f"📸 *Album of {len(photos)} images received!* Identifying them as one plant... 🌿",
+        parse_mode="Markdown",
+    )
+    wake_job_workers()
 
-    plant_message += f"\n\n🎯 *Confidence:* {result['score']:.1%}"
 
-    if result.get("description"):
-        plant_message += f"\n\n📖 {result['description']}"
+@require_authorized_user
+async def flush(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not update.message:
+        return None
 
-    await message.reply_text(plant_message, parse_mode="Markdown")
+    batcher = get_pr_batcher()
+    queue = get_job_queue()
+    # Jobs wait in the queue until their batch is published, whichever process holds it
+    pending = (await run_blocking("queue", queue.depth)).get(WAITING, 0) if batcher else 0
+    if not batcher or not pending:
+        await update.message.reply_text("📭 No pending plant entries to publish.")
+        return None
 
+    await update.message.reply_text(
+        f"🚀 *Publishing {pending} pending entries...*",
+        parse_mode="Markdown",
+    )
+    # The batches held by herbabot.worker processes are published when they see the request
+    await run_blocking("queue", queue.request_flush)
+    await batcher.flush()
 
-async def _create_plant_entry_and_pr(
-    message: Message,
-    result: Dict[str, Any],
-    file_path: Path,
-    exif_metadata: Dict[str, Any],
-    tmp_dir: Path,
-) -> None:
-    gps_data = prepare_gps_data(exif_metadata)
-    date = prepare_date(exif_metadata.get("date_taken"))
 
-    # Create plant entry
-    plant_entry_path = create_plant_entry(result, file_path, gps_data, date)
-    if not plant_entry_path:
-        await message.reply_text(
-            "❌ Failed to create plant entry. Please try again.",
-            parse_mode="Markdown",
-        )
-        return
-
-    entry_info = get_plant_entry_info(result)
-    logger.debug(f"Plant entry created: {entry_info['markdown_filename']}")
-
-    # Create pull request
-    pr_url = create_plant_pr(tmp_dir, result)
-    if pr_url:
-        await message.reply_text(
-            f"✨ *Plant entry created successfully!*\n\n"
-            f"🔗 [View Pull Request]({pr_url})\n"
-            f"📝 Ready for review and merge",
-            parse_mode="Markdown",
-        )
-    else:
-        await message.reply_text("⚠️ Plant entry created, but failed to create pull request.")
+def register_handlers(app: Any) -> None:
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("flush", flush))
+    app.add_handler(MessageHandler(filters.ATTACHMENT, handle_file))
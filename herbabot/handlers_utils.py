@@ -1,20 +1,29 @@
+import functools
 import logging
-import shutil
+import re
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Protocol
 
 from telegram import Document, Message
 
-from herbabot.exif_utils import convert_heic_to_jpeg
+from herbabot.metrics import time_stage
+from herbabot.templating import TEMPLATES_DIR
 
 logger = logging.getLogger(__name__)
 
 
+class ReplyTarget(Protocol):
+    """Anything that can be replied to, a Telegram message or a queued job's notifier."""
+
+    async def reply_text(self, text: str, parse_mode: str | None = None) -> Any: ...
+
+
+@functools.cache
 def load_welcome_message() -> str:
-    """Load the welcome message from the template file."""
-    template_path = Path(__file__).parent.parent / "templates" / "bot_welcome.md"
+    """Load the welcome message from the template file, read once and then kept in memory."""
+    template_path = TEMPLATES_DIR / "bot_welcome.md"
     try:
         with open(template_path, "r", encoding="utf-8") as f:
             return f.read().strip()
@@ -35,27 +44,17 @@ async def process_incoming_file(message: Message) -> Optional[Path]:
         return None
 
     try:
-        file = await document.get_file()
-        media_dir = Path("media")
-        media_dir.mkdir(parents=True, exist_ok=True)
+        with time_stage("download"):
+            file = await document.get_file()
+            media_dir = Path("media")
+            media_dir.mkdir(parents=True, exist_ok=True)
 
-        # Generate filename and download
-        filename = generate_filename(document.file_name or "")
-        file_path = media_dir / filename
-        await file.download_to_drive(file_path)
+            # Generate filename and download
+            filename = generate_filename(document.file_name or "")
+            file_path = media_dir / filename
+            await file.download_to_drive(file_path)
 
         logger.info(f"File successfully downloaded: {file_path}")
-
-        # Convert HEIC if needed
-        if filename.lower().endswith(".heic"):
-            jpeg_path = convert_heic_to_jpeg(file_path)
-            if jpeg_path:
-                file_path = jpeg_path
-                logger.info(f"HEIC converted to JPEG: {jpeg_path}")
-            else:
-                await message.reply_text("❌ Failed to convert HEIC image. Please try sending a JPEG or PNG image.")
-                return None
-
         return file_path
 
     except Exception as e:
@@ -76,6 +75,38 @@ def is_valid_image_document(document: Document) -> bool:
     return document.mime_type.startswith("image/")
 
 
+# Caption words tagging the organ shown in a photo, mapped to Pl@ntNet organ names
+ORGAN_KEYWORDS = {
+    "leaf": "leaf",
+    "leaves": "leaf",
+    "flower": "flower",
+    "flowers": "flower",
+    "blossom": "flower",
+    "fruit": "fruit",
+    "fruits": "fruit",
+    "berry": "fruit",
+    "berries": "fruit",
+    "bark": "bark",
+}
+
+
+def parse_organ(caption: str | None) -> str | None:
+    """Return the Pl@ntNet organ named in a photo caption ("leaf", "flower"...), or None."""
+    for word in re.findall(r"\w+", (caption or "").lower()):
+        if word in ORGAN_KEYWORDS:
+            return ORGAN_KEYWORDS[word]
+    return None
+
+
+# Caption words asking to process a photo even if it looks like one sent before
+FORCE_KEYWORDS = {"new", "again"}
+
+
+def parse_force(caption: str | None) -> bool:
+    """Whether a photo caption asks to process the photo even if it is a near-duplicate of an earlier one."""
+    return any(word in FORCE_KEYWORDS for word in re.findall(r"\w+", (caption or "").lower()))
+
+
 def generate_filename(original_filename: str) -> str:
     """Generate a unique filename for the uploaded file."""
     is_heic = original_filename.lower().endswith(".heic")
@@ -83,7 +114,7 @@ def generate_filename(original_filename: str) -> str:
     return f"{uuid.uuid4()}{extension}"
 
 
-async def handle_exif_metadata(message: Message, exif_metadata: Dict[str, Any]) -> None:
+async def handle_exif_metadata(message: ReplyTarget, exif_metadata: Dict[str, Any]) -> None:
     """Handle and log EXIF metadata from the image."""
     logger.debug(f"EXIF metadata: {exif_metadata}")
 
@@ -142,13 +173,3 @@ def prepare_date(date_str: str | None) -> str | None:
     except (ValueError, TypeError) as e:
         logger.warning(f"Failed to parse date '{date_str}': {e}")
         return None
-
-
-def cleanup_temporary_directory(tmp_dir: Path) -> None:
-    """Clean up the temporary directory."""
-    if tmp_dir.exists():
-        try:
-            shutil.rmtree(tmp_dir)
-            logger.info("Temporary directory cleaned up successfully")
-        except Exception as e:
-            logger.error(f"Failed to clean up temporary directory: {e}")
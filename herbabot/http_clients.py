@@ -0,0 +1,185 @@
+import logging
+import threading
+from typing import Any
+
+import requests
+from openai import OpenAI, Timeout
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from herbabot.config import (
+    HTTP_CONNECT_TIMEOUT_SECONDS,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT_SECONDS,
+    HTTP_RETRY_BACKOFF_SECONDS,
+    HTTP_RETRY_MAX_DELAY_SECONDS,
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+)
+from herbabot.metrics import HTTP_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TimeoutSession(requests.Session):
+    """``requests.Session`` applying a default ``(connect, read)`` timeout to every request."""
+
+    def __init__(self, timeout: tuple[float, float]) -> None:
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, *args, **kwargs)
+
+
+class CountingRetry(Retry):
+    """
+    ``Retry`` recording every retried request in ``HTTP_RETRIES`` under the name of its service.
+
+    Requests with a non-idempotent method (``POST``, ``PATCH``) are only retried when they were
+    rejected before being processed: connection errors and 429 responses.
+    """
+
+    def __init__(self, *args: Any, service: str = "http", **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.service = service
+
+    def new(self, **kwargs: Any) -> "CountingRetry":
+        retry = super().new(**kwargs)
+        retry.service = self.service
+        return retry
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429 and status_code in (self.status_forcelist or ()):
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, *args: Any, **kwargs: Any) -> "CountingRetry":
+        HTTP_RETRIES.inc(service=self.service)
+        return super().increment(*args, **kwargs)
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff_seconds: float = HTTP_RETRY_BACKOFF_SECONDS,
+    max_delay_seconds: float = HTTP_RETRY_MAX_DELAY_SECONDS,
+    timeout: tuple[float, float] = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS),
+    service: str = "http",
+) -> TimeoutSession:
+    """
+    Create a keep-alive HTTP session with timeouts and retries.
+
+    Connection errors and the ``RETRY_STATUSES`` responses are retried up to ``max_retries``
+    times with jittered exponential backoff, waiting for ``Retry-After`` when the server
+    sends one. ``POST`` requests, such as opening a pull request or creating a branch ref,
+    may have succeeded upstream despite a 5xx response or a read timeout: they are only
+    retried on connection errors and 429 responses, and are otherwise left to the job
+    retries. Retries are counted in the metrics under ``service``.
+    """
+    retry = CountingRetry(
+        total=max_retries,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        backoff_factor=backoff_seconds,
+        backoff_jitter=backoff_seconds,
+        backoff_max=max_delay_seconds,
+        respect_retry_after_header=True,
+        retry_after_max=int(max_delay_seconds),
+        raise_on_status=False,
+        service=service,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = TimeoutSession(timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_sessions: dict[str, TimeoutSession] = {}
+_openai_client: OpenAI | None = None
+_lock = threading.Lock()
+
+
+def get_http_session(name: str) -> TimeoutSession:
+    """
+    Return the shared session of an upstream service (``"plantnet"``, ``"github"``, ...).
+
+    Each service gets its own session, created on first use and reused by every module and
+    thread afterwards, so connections stay open between jobs.
+    """
+    with _lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = create_session(service=name)
+            _sessions[name] = session
+            logger.debug(f"Created HTTP session for {name}")
+        return session
+
+
+def get_openai_client() -> OpenAI:
+    """Return the shared OpenAI client, which keeps its own connection pool and retries."""
+    global _openai_client
+    with _lock:
+        if _openai_client is None:
+            _openai_client = OpenAI(
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL or None,
+                timeout=Timeout(HTTP_READ_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+                max_retries=HTTP_MAX_RETRIES,
+            )
+        return _openai_client
+
+
+def connection_stats(session: requests.Session) -> dict[str, int]:
+    """
+    Return the connection reuse statistics of a session.
+
+    The number of requests sent (retries included), the number of connections opened to
+    send them and the number of requests that reused an open connection.
+    """
+    requests_sent = connections = 0
+    # The same adapter is usually mounted for both http:// and https://
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        if not isinstance(adapter, HTTPAdapter):
+            continue
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections += pool.num_connections
+    return {
+        "requests": requests_sent,
+        "connections": connections,
+        "reused": max(requests_sent - connections, 0),
+    }
+
+
+def http_client_stats() -> dict[str, dict[str, int]]:
+    """Return the connection reuse statistics of every shared session, by service name."""
+    with _lock:
+        sessions = dict(_sessions)
+    return {name: connection_stats(session) for name, session in sessions.items()}
+
+
+def close_http_clients() -> None:
+    """Close the shared sessions and the OpenAI client, logging their connection reuse."""
+    global _openai_client
+    for name, stats in http_client_stats().items():
+        logger.info(f"HTTP session {name}: {stats['requests']} requests over {stats['connections']} connections")
+
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        if _openai_client is not None:
+            _openai_client.close()
+            _openai_client = None
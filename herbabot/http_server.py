@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from http import HTTPStatus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HTTPResponse:
+    status: HTTPStatus
+    body: bytes | None = None
+    content_type: str = "text/plain"
+
+
+class HTTPServer:
+    """
+    Minimal asyncio HTTP/1.1 server for the bot's own endpoints.
+
+    Requests are parsed here and handed to ``dispatch``, which subclasses implement.
+    Connections are kept alive unless the client asks otherwise.
+    """
+
+    name = "HTTP"
+
+    def __init__(self, listen: str, port: int, max_body_bytes: int = 1024 * 1024) -> None:
+        self.listen = listen
+        self.port = port
+        self.max_body_bytes = max_body_bytes
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        # Report the actual port when listening on port 0
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"{self.name} server listening on {self.listen}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            logger.info(f"{self.name} server stopped")
+
+    async def dispatch(self, method: str, path: str, headers: dict[str, str], body: bytes) -> HTTPResponse:
+        """Answer a request. ``path`` is the request target without its query string."""
+        raise NotImplementedError
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                keep_alive = await self._handle_request(reader, writer)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"{self.name} connection error: {e}")
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        request_line = await reader.readline()
+        if not request_line:
+            return False
+
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            await _respond(writer, HTTPResponse(HTTPStatus.BAD_REQUEST), keep_alive=False)
+            return False
+
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            await _respond(writer, HTTPResponse(HTTPStatus.BAD_REQUEST), keep_alive=False)
+            return False
+        if length > self.max_body_bytes:
+            await _respond(writer, HTTPResponse(HTTPStatus.REQUEST_ENTITY_TOO_LARGE), keep_alive=False)
+            return False
+        body = await reader.readexactly(length) if length else b""
+
+        response = await self.dispatch(method, target.split("?", 1)[0], headers, body)
+        await _respond(writer, response, keep_alive)
+        return keep_alive
+
+
+async def _respond(writer: asyncio.StreamWriter, response: HTTPResponse, keep_alive: bool) -> None:
+    status = response.status
+    body = response.body if response.body is not None else status.phrase.encode()
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {response.content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
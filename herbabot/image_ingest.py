@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from herbabot.config import ARCHIVAL_JPEG_QUALITY, IDENTIFICATION_JPEG_QUALITY, IDENTIFICATION_MAX_EDGE
+from herbabot.exif_utils import encode_identification_image, flatten_to_rgb, parse_exif_metadata
+from herbabot.photo_hashes import dhash
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestedImage:
+    """An uploaded photo after its single ingest pass."""
+
+    source_path: Path
+    archival_path: Path
+    content_hash: str
+    exif_metadata: dict[str, Any]
+    identification_image: bytes
+    perceptual_hash: int
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def ingest_image(
+    source_path: Path,
+    max_edge: int = IDENTIFICATION_MAX_EDGE,
+    identification_quality: int = IDENTIFICATION_JPEG_QUALITY,
+    archival_quality: int = ARCHIVAL_JPEG_QUALITY,
+    archival_dir: Path | None = None,
+) -> IngestedImage:
+    """
+    Read an uploaded photo once and derive everything the pipeline needs from it.
+
+    EXIF metadata is parsed from the raw bytes without decoding pixels. JPEG uploads are kept
+    as the archival image and only decoded at reduced scale for the identification derivative;
+    other formats (HEIC, PNG, ...) are decoded once and both the archival JPEG and the
+    derivative are encoded from that single bitmap. The perceptual hash spotting near-duplicate
+    photos is computed from the bitmap already decoded for the derivative.
+
+    Args:
+        source_path: Path to the downloaded photo
+        max_edge: Longest edge of the identification derivative in pixels
+        identification_quality: JPEG quality of the identification derivative
+        archival_quality: JPEG quality of the archival image converted from other formats
+        archival_dir: Directory receiving the converted archival image, next to the photo by default
+
+    Returns:
+        The ingested image, with per-stage timings in seconds
+
+    Raises:
+        OSError: If the file cannot be read or is not a supported image
+    """
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+
+    def lap(stage: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = now - started
+        started = now
+
+    raw = source_path.read_bytes()
+    content_hash = hashlib.sha256(raw).hexdigest()
+    lap("read")
+
+    with Image.open(BytesIO(raw)) as image:
+        exif_bytes = image.info.get("exif")
+        exif_metadata = parse_exif_metadata(exif_bytes)
+        lap("exif")
+
+        if image.format == "JPEG":
+            archival_path = source_path
+            if max(image.size) <= max_edge:
+                identification_image = raw
+            else:
+                identification_image = encode_identification_image(image, max_edge, identification_quality)
+            lap("derivative")
+
+            # The image is now loaded at the derivative's reduced scale (or is small already)
+            perceptual_hash = dhash(image)
+            lap("hash")
+        else:
+            rgb = flatten_to_rgb(image)
+            lap("decode")
+
+            archival_path = (archival_dir or source_path.parent) / f"{source_path.stem}.jpg"
+            rgb.save(archival_path, format="JPEG", exif=exif_bytes or b"", quality=archival_quality)
+            lap("archival")
+
+            identification_image = encode_identification_image(rgb, max_edge, identification_quality)
+            lap("derivative")
+
+            perceptual_hash = dhash(rgb)
+            lap("hash")
+
+    logger.info(
+        f"Ingested {source_path.name} ({len(raw)} bytes): "
+        + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items())
+    )
+
+    return IngestedImage(
+        source_path=source_path,
+        archival_path=archival_path,
+        content_hash=content_hash,
+        exif_metadata=exif_metadata,
+        identification_image=identification_image,
+        perceptual_hash=perceptual_hash,
+        timings=timings,
+    )
@@ -0,0 +1,123 @@
+import logging
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import piexif
+from PIL import Image, ImageOps, features
+
+from herbabot.exif_utils import flatten_to_rgb
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp", "avif": ".avif"}
+ORIENTATION_TAG = 0x0112
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    """One published rendition of a plant photo."""
+
+    file_name: str
+    width: int
+    height: int
+    format: str
+    is_master: bool
+
+
+def render_image_variants(
+    source_path: Path,
+    output_dir: Path,
+    stem: str,
+    max_edge: int,
+    widths: list[int],
+    formats: list[str],
+    quality: int,
+    keep_exif: bool,
+) -> list[ImageVariant]:
+    """
+    Write the size-bounded master image and its responsive variants for the portfolio.
+
+    The master is ``<stem>.<ext>`` bounded to ``max_edge``; every width smaller than the master
+    gets a ``<stem>-<width>w.<ext>`` variant, in each requested format. Only the master JPEG can
+    keep the EXIF metadata. A source JPEG that already fits is published without re-encoding.
+
+    Runs in a worker process, so all arguments and results are plain picklable values.
+
+    Args:
+        source_path: Archival image produced by the ingest
+        output_dir: Directory receiving the images, usually ``JobWorkspace.entries_dir``
+        stem: Base file name derived from the scientific name
+        max_edge: Longest edge of the master image in pixels
+        widths: Widths of the responsive variants in pixels
+        formats: Output formats among ``jpeg``, ``webp`` and ``avif``
+        quality: Encoding quality
+        keep_exif: Whether the master JPEG keeps the EXIF metadata
+
+    Returns:
+        The written variants, masters first
+    """
+    formats = [fmt for fmt in formats if _is_supported(fmt)]
+    output_dir.mkdir(parents=True, exist_ok=True)
+    variants: list[ImageVariant] = []
+
+    with Image.open(source_path) as image:
+        exif_bytes = image.info.get("exif", b"")
+        orientation = image.getexif().get(ORIENTATION_TAG, 1)
+        fits = image.format == "JPEG" and max(image.size) <= max_edge and orientation == 1
+
+        if fits:
+            # Publish the JPEG as-is (EXIF removed losslessly when stripping)
+            master_jpeg = output_dir / f"{stem}.jpg"
+            if keep_exif or not exif_bytes:
+                shutil.copyfile(source_path, master_jpeg)
+            else:
+                piexif.remove(str(source_path), str(master_jpeg))
+            variants.append(ImageVariant(master_jpeg.name, image.width, image.height, "jpeg", True))
+            if formats == ["jpeg"] and all(width >= image.width for width in widths):
+                return variants
+
+        image.draft("RGB", (max_edge, max_edge))
+        master = flatten_to_rgb(ImageOps.exif_transpose(image))
+        master.thumbnail((max_edge, max_edge), reducing_gap=3.0)
+        # exif_transpose drops the orientation tag, keep the rest of the metadata
+        master_exif = master.info.get("exif", b"") if keep_exif else b""
+
+        for fmt in formats:
+            if not (fits and fmt == "jpeg"):
+                file_name = f"{stem}{FORMAT_EXTENSIONS[fmt]}"
+                exif = master_exif if fmt == "jpeg" else b""
+                _save(master, output_dir / file_name, fmt, quality, exif)
+                variants.append(ImageVariant(file_name, master.width, master.height, fmt, True))
+
+        for width in sorted(widths, reverse=True):
+            if width >= master.width:
+                continue
+            height = round(master.height * width / master.width)
+            resized = master.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for fmt in formats:
+                file_name = f"{stem}-{width}w{FORMAT_EXTENSIONS[fmt]}"
+                _save(resized, output_dir / file_name, fmt, quality, b"")
+                variants.append(ImageVariant(file_name, width, height, fmt, False))
+
+    logger.info(f"Rendered {len(variants)} image variants for {stem}")
+    return variants
+
+
+def _is_supported(fmt: str) -> bool:
+    if fmt not in FORMAT_EXTENSIONS:
+        logger.warning(f"Unknown image format '{fmt}', skipping")
+        return False
+    if fmt != "jpeg" and not features.check(fmt):
+        logger.warning(f"Pillow was built without {fmt} support, skipping")
+        return False
+    return True
+
+
+def _save(image: Image.Image, path: Path, fmt: str, quality: int, exif: bytes) -> None:
+    options: dict[str, object] = {"quality": quality}
+    if fmt == "jpeg":
+        options["progressive"] = True
+    if exif:
+        options["exif"] = exif
+    image.save(path, format=fmt.upper(), **options)
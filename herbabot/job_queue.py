@@ -0,0 +1,342 @@
+import functools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from herbabot.config import JOB_LEASE_SECONDS, JOB_QUEUE_PATH
+from herbabot.metrics import JOB_QUEUE_DEPTH, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Completed stages of a job, in order. A job is enqueued once its photo is downloaded.
+STAGES = ("downloaded", "identified", "described", "rendered", "pushed")
+
+PENDING = "pending"
+RUNNING = "running"
+WAITING = "waiting"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    """A photo-to-PR job and the outputs of its completed stages."""
+
+    id: str
+    chat_id: int
+    message_id: int
+    user_id: int
+    source_path: str
+    stage: str = "downloaded"
+    status: str = PENDING
+    payload: dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+    next_attempt_at: float = 0.0
+    last_error: str | None = None
+    worker_id: str | None = None
+
+    @property
+    def next_stage(self) -> str | None:
+        index = STAGES.index(self.stage)
+        return STAGES[index + 1] if index + 1 < len(STAGES) else None
+
+
+class LeaseLostError(RuntimeError):
+    """Raised when a worker updates a job whose lease was taken over by another worker."""
+
+
+class JobQueue:
+    """
+    Persistent SQLite-backed queue of pipeline jobs, shareable by several worker processes.
+
+    Each job records the last stage it completed together with the stage outputs, so a
+    restarted bot resumes jobs where they stopped instead of redoing the network calls.
+
+    A claimed job is leased to the claiming worker for ``lease_seconds`` and the worker
+    keeps renewing the lease while it holds the job. Jobs whose lease expired, because
+    their worker crashed or was stopped, are claimed again by the next free worker. Jobs
+    of the same user are claimed in upload order: a job is not started while an earlier
+    job of its user is still queued or running.
+    """
+
+    def __init__(self, path: Path, lease_seconds: float = 60, worker_id: str | None = None) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        # WAL needs shared memory: the processes sharing the queue must run on the same host
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                source_path TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                worker_id TEXT,
+                lease_expires_at REAL NOT NULL DEFAULT 0
+            )
+            """)
+        # Queues created before leases were introduced
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "worker_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN worker_id TEXT")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_attempt_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, status)")
+        # Requests sent to every process sharing the queue, such as /flush
+        self._conn.execute("CREATE TABLE IF NOT EXISTS signals (name TEXT PRIMARY KEY, sent_at REAL NOT NULL)")
+        self._conn.commit()
+
+    def enqueue(
+        self,
+        chat_id: int,
+        message_id: int,
+        user_id: int,
+        source_path: Path,
+        outputs: dict[str, Any] | None = None,
+    ) -> Job:
+        """
+        Add a job whose photo has been downloaded to ``source_path``.
+
+        ``outputs`` are the outputs of the download stage, such as the other photos of an album.
+        """
+        job = Job(
+            id=uuid.uuid4().hex[:12],
+            chat_id=chat_id,
+            message_id=message_id,
+            user_id=user_id,
+            source_path=str(source_path),
+            payload=dict(outputs or {}),
+        )
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (id, chat_id, message_id, user_id, source_path, stage, status, payload,
+                                  created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job.id,
+                    chat_id,
+                    message_id,
+                    user_id,
+                    job.source_path,
+                    job.stage,
+                    job.status,
+                    json.dumps(job.payload),
+                    now,
+                    now,
+                ),
+            )
+            self._conn.commit()
+        logger.info(f"Job {job.id} enqueued for {source_path}")
+        return job
+
+    def claim(self) -> Job | None:
+        """
+        Lease the oldest runnable job to this worker and mark it as running.
+
+        Runnable jobs are pending jobs past their retry delay and running or waiting jobs
+        whose lease expired, skipping jobs queued behind an earlier unfinished job of the
+        same user. The claim is a single statement, so concurrent workers never get the
+        same job.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                """
+                UPDATE jobs SET status = :running, worker_id = :worker_id, lease_expires_at = :lease_expires_at,
+                                updated_at = :now
+                WHERE id = (
+                    SELECT id FROM jobs AS job
+                    WHERE (
+                        (job.status = :pending AND job.next_attempt_at <= :now)
+                        OR (job.status IN (:running, :waiting) AND job.lease_expires_at < :now)
+                    )
+                    AND NOT EXISTS (
+                        SELECT 1 FROM jobs AS earlier
+                        WHERE earlier.user_id = job.user_id
+                        AND earlier.rowid < job.rowid
+                        AND earlier.status IN (:pending, :running)
+                    )
+                    ORDER BY job.rowid LIMIT 1
+                )
+                RETURNING *
+                """,
+                {
+                    "running": RUNNING,
+                    "pending": PENDING,
+                    "waiting": WAITING,
+                    "worker_id": self.worker_id,
+                    "lease_expires_at": now + self.lease_seconds,
+                    "now": now,
+                },
+            ).fetchone()
+            self._conn.commit()
+
+        if row is None:
+            return None
+
+        job = _row_to_job(row)
+        logger.info(f"Job {job.id} claimed by {self.worker_id} after stage {job.stage}")
+        return job
+
+    def renew_leases(self) -> int:
+        """Extend the lease of every job held by this worker. Returns the number of renewed jobs."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE worker_id = ? AND status IN (?, ?)",
+                (now + self.lease_seconds, self.worker_id, RUNNING, WAITING),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def complete_stage(self, job: Job, stage: str, outputs: dict[str, Any] | None = None) -> None:
+        """
+        Record that ``job`` completed ``stage``, merging its outputs into the payload.
+
+        Steps outside ``STAGES``, which run alongside them, only record their outputs.
+        """
+        if stage in STAGES and STAGES.index(stage) > STAGES.index(job.stage):
+            job.stage = stage
+        job.payload.update(outputs or {})
+        job.attempts = 0
+        job.last_error = None
+        self._update(job, stage=job.stage, payload=json.dumps(job.payload), attempts=0, last_error=None)
+
+    def retry(self, job: Job, error: str, delay: float, count_attempt: bool = True) -> None:
+        """
+        Put ``job`` back in the queue to retry its next stage after ``delay`` seconds.
+
+        Jobs deferred without ``count_attempt`` (waiting for an upstream rate limit, for
+        instance) keep their remaining attempts.
+        """
+        job.status = PENDING
+        if count_attempt:
+            job.attempts += 1
+        job.next_attempt_at = time.time() + delay
+        job.last_error = error
+        self._update(
+            job,
+            status=PENDING,
+            attempts=job.attempts,
+            next_attempt_at=job.next_attempt_at,
+            last_error=error,
+        )
+
+    def wait(self, job: Job) -> None:
+        """Park ``job`` until an external event (such as a batch being published) resumes it."""
+        job.status = WAITING
+        self._update(job, status=WAITING)
+
+    def finish(self, job: Job) -> None:
+        job.status = DONE
+        self._update(job, status=DONE)
+
+    def fail(self, job: Job, error: str) -> None:
+        job.status = FAILED
+        job.last_error = error
+        self._update(job, status=FAILED, last_error=error)
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def depth(self) -> dict[str, int]:
+        """Return the number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def request_flush(self) -> None:
+        """Ask every process sharing the queue to publish its pending batch, see ``flush_requested_at``."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO signals (name, sent_at) VALUES ('flush', ?)"
+                " ON CONFLICT (name) DO UPDATE SET sent_at = excluded.sent_at",
+                (time.time(),),
+            )
+            self._conn.commit()
+
+    def flush_requested_at(self) -> float:
+        """Return the time of the last ``request_flush``, 0 if none was sent."""
+        with self._lock:
+            row = self._conn.execute("SELECT sent_at FROM signals WHERE name = 'flush'").fetchone()
+        return row[0] if row else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _update(self, job: Job, **columns: Any) -> None:
+        # Only the worker holding the lease may update a job
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND worker_id = ?",
+                (*columns.values(), time.time(), job.id, self.worker_id),
+            )
+            self._conn.commit()
+        if cursor.rowcount == 0:
+            raise LeaseLostError(f"Job {job.id} is no longer leased to {self.worker_id}")
+
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"],
+        chat_id=row["chat_id"],
+        message_id=row["message_id"],
+        user_id=row["user_id"],
+        source_path=row["source_path"],
+        stage=row["stage"],
+        status=row["status"],
+        payload=json.loads(row["payload"]),
+        attempts=row["attempts"],
+        next_attempt_at=row["next_attempt_at"],
+        last_error=row["last_error"],
+        worker_id=row["worker_id"],
+    )
+
+
+_queue: JobQueue | None = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the shared job queue stored at ``JOB_QUEUE_PATH``."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(Path(JOB_QUEUE_PATH), JOB_LEASE_SECONDS)
+            REGISTRY.add_collector(functools.partial(_collect_depth, _queue))
+        return _queue
+
+
+def _collect_depth(queue: JobQueue) -> None:
+    depth = queue.depth()
+    for status in (PENDING, RUNNING, WAITING, DONE, FAILED):
+        JOB_QUEUE_DEPTH.set(depth.get(status, 0), status=status)
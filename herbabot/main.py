@@ -1,18 +1,60 @@
+import asyncio
 import logging
 
-from telegram.ext import ApplicationBuilder
+from telegram.ext import Application, ApplicationBuilder
 
-from herbabot.config import TELEGRAM_BOT_TOKEN, get_logging_level
+from herbabot.albums import get_album_collector
+from herbabot.config import CONCURRENT_UPDATES, TELEGRAM_BOT_TOKEN, UPDATE_MODE, get_logging_level
+from herbabot.executor import shutdown_executor
 from herbabot.handlers import register_handlers
+from herbabot.http_clients import close_http_clients
+from herbabot.metrics import start_metrics_server, stop_metrics_server
+from herbabot.pipeline import start_job_workers, stop_job_workers
+from herbabot.pr_batcher import get_pr_batcher
+from herbabot.webhook import run_webhook
 
 logging.basicConfig(level=get_logging_level())
 
 
+async def _post_init(app: Application) -> None:
+    await start_metrics_server()
+    start_job_workers(app.bot)
+
+
+async def _post_stop(app: Application) -> None:
+    # Enqueue albums still waiting for their last photos
+    collector = get_album_collector()
+    if collector:
+        await collector.flush()
+    await stop_job_workers()
+    # Publish entries still waiting for their batch while the bot can still notify users
+    batcher = get_pr_batcher()
+    if batcher:
+        await batcher.flush()
+
+
+async def _post_shutdown(app: Application) -> None:
+    await stop_metrics_server()
+    shutdown_executor()
+    close_http_clients()
+
+
 def main() -> None:
-    app = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(_post_init)
+        .post_stop(_post_stop)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
     register_handlers(app)
-    print("🤖 Herbabot is running...")
-    app.run_polling()
+    print(f"🤖 Herbabot is running ({UPDATE_MODE})...")
+    if UPDATE_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+
+from telegram import Bot
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Longest text of a Telegram message
+MAX_MESSAGE_LENGTH = 4096
+
+
+class MessageStreamer:
+    """
+    Progressively edits a Telegram message with text that is still being generated.
+
+    ``update`` can be called as often as new text arrives: the message is edited with the
+    latest text at most once every ``min_interval`` seconds, which keeps the bot under
+    Telegram's edit rate limits. ``close`` waits for the last text to be shown.
+    """
+
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, min_interval: float = 1.5) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = min_interval
+        self.edits = 0
+        self._text = ""
+        self._sent = ""
+        self._closed = False
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def update(self, text: str) -> None:
+        """Show ``text`` in the message on the next edit. Must be called from the event loop."""
+        if self._closed:
+            return
+        self._text = text
+        self._changed.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop streaming once the latest text has been shown."""
+        self._closed = True
+        self._changed.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self) -> None:
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            await self._edit()
+            if self._closed:
+                return
+            await asyncio.sleep(self.min_interval)
+
+    async def _edit(self) -> None:
+        text = _truncate(self._text)
+        if not text or text == self._sent:
+            return
+
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id)
+            self._sent = text
+            self.edits += 1
+        except RetryAfter as e:
+            # Too many edits for this chat: wait, then show the latest text
+            retry_after = e.retry_after
+            delay = retry_after if isinstance(retry_after, (int, float)) else retry_after.total_seconds()
+            logger.warning(f"Telegram asked to slow down message edits for {delay}s")
+            await asyncio.sleep(delay)
+            await self._edit()
+        except BadRequest as e:
+            # Raised when the text did not change, or the message was deleted
+            logger.debug(f"Message edit rejected: {e}")
+        except TelegramError as e:
+            logger.warning(f"Failed to edit message {self.message_id}: {e}")
+
+
+def _truncate(text: str) -> str:
+    text = text.strip()
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        return text
+    return text[: MAX_MESSAGE_LENGTH - 1] + "…"
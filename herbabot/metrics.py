@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import Callable, Iterator
+
+from herbabot.config import METRICS_LISTEN, METRICS_PORT
+from herbabot.http_server import HTTPResponse, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds: from a cache hit to a slow push
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = tuple[str, ...]
+
+
+class Metric:
+    """
+    Base of the metric types, holding one value per combination of label values.
+
+    Metrics are thread-safe: pipeline stages update them from the worker pool threads.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        """Return the ``(name, labels, value)`` samples of the metric."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in values]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: count of each bucket (not cumulative), then the sum of the observations
+        self._values: dict[LabelValues, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            values = self._values.get(self._key(labels))
+        return sum(values[0]) if values else 0
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        samples: list[tuple[str, dict[str, str], float]] = []
+        for key, (counts, total) in values:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Set of metrics rendered together in the Prometheus text format.
+
+    Collectors are callbacks run before each rendering, to refresh gauges whose value is
+    read from elsewhere (the depth of the job queue, for instance).
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return "".join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+
+STAGE_DURATION = Histogram(
+    "herbabot_stage_duration_seconds",
+    "Duration of the pipeline stages and of the upstream calls they make.",
+    ("stage",),
+)
+JOB_STEP_DURATION = Histogram(
+    "herbabot_job_step_duration_seconds",
+    "Duration of the steps of a job, including the time spent waiting for a free stage slot.",
+    ("step",),
+)
+STAGE_ERRORS = Counter("herbabot_stage_errors_total", "Pipeline stages that raised an error.", ("stage",))
+CACHE_REQUESTS = Counter(
+    "herbabot_cache_requests_total",
+    "Lookups in the identification and description caches.",
+    ("cache", "result"),
+)
+HTTP_RETRIES = Counter("herbabot_http_retries_total", "Upstream HTTP requests retried.", ("service",))
+JOB_RETRIES = Counter("herbabot_job_retries_total", "Job steps scheduled for a retry after a failure.", ("stage",))
+JOBS_FINISHED = Counter("herbabot_jobs_finished_total", "Jobs that reached a final state.", ("outcome",))
+JOB_QUEUE_DEPTH = Gauge("herbabot_job_queue_depth", "Jobs in the queue, by status.", ("status",))
+RATE_LIMIT_BUDGET = Gauge(
+    "herbabot_rate_limit_budget",
+    "Calls (or tokens) left in the budget of an upstream, negative while calls are queued.",
+    ("upstream", "bucket"),
+)
+RATE_LIMIT_WAIT = Gauge(
+    "herbabot_rate_limit_wait_seconds",
+    "Seconds a new call to an upstream would wait for its budget.",
+    ("upstream", "bucket"),
+)
+RATE_LIMIT_DEFERRALS = Counter(
+    "herbabot_rate_limit_deferrals_total",
+    "Upstream calls deferred because their budget would refill too late.",
+    ("upstream",),
+)
+
+for _metric in (
+    STAGE_DURATION,
+    JOB_STEP_DURATION,
+    STAGE_ERRORS,
+    CACHE_REQUESTS,
+    HTTP_RETRIES,
+    JOB_RETRIES,
+    JOBS_FINISHED,
+    JOB_QUEUE_DEPTH,
+    RATE_LIMIT_BUDGET,
+    RATE_LIMIT_WAIT,
+    RATE_LIMIT_DEFERRALS,
+):
+    REGISTRY.register(_metric)
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """Record the duration of the wrapped block in ``STAGE_DURATION``, and its errors in ``STAGE_ERRORS``."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, stage=stage)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class MetricsServer(HTTPServer):
+    """Serves the metrics of a registry at ``GET /metrics``, for Prometheus to scrape."""
+
+    name = "Metrics"
+
+    def __init__(self, listen: str, port: int, registry: Registry = REGISTRY) -> None:
+        super().__init__(listen, port, max_body_bytes=0)
+        self.registry = registry
+
+    async def dispatch(self, method: str, path: str, headers: dict[str, str], body: bytes) -> HTTPResponse:
+        if path != "/metrics":
+            return HTTPResponse(HTTPStatus.NOT_FOUND)
+        if method not in ("GET", "HEAD"):
+            return HTTPResponse(HTTPStatus.METHOD_NOT_ALLOWED)
+        # Collectors read the job queue, which may wait for another process's lock
+        metrics = await asyncio.to_thread(self.registry.render)
+        return HTTPResponse(HTTPStatus.OK, metrics.encode(), CONTENT_TYPE)
+
+
+_server: MetricsServer | None = None
+
+
+async def start_metrics_server(port: int = METRICS_PORT, listen: str = METRICS_LISTEN) -> MetricsServer | None:
+    """Start serving ``/metrics`` in this process, unless ``port`` is 0."""
+    global _server
+    if port <= 0 or _server is not None:
+        return _server
+    _server = MetricsServer(listen, port)
+    await _server.start()
+    return _server
+
+
+async def stop_metrics_server() -> None:
+    global _server
+    if _server is not None:
+        await _server.stop()
+        _server = None
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
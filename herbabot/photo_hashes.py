@@ -0,0 +1,280 @@
+import functools
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Generic, TypeVar
+
+from PIL import ExifTags, Image
+
+from herbabot.config import PHOTO_HASH_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Transposition turning a photo upright, by EXIF orientation
+ORIENTATION_TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def dhash(image: Image.Image) -> int:
+    """
+    64-bit difference hash of an image.
+
+    Each bit tells whether a pixel of a 9x8 grayscale thumbnail is brighter than its right
+    neighbor. Near-identical photos, such as the frames of a burst, only differ by a few
+    bits, see ``hamming_distance``. The image should already be decoded at reduced scale
+    (JPEG draft mode), shrinking it to 9x8 is then negligible.
+    """
+    # Shrink first and orient the thumbnail, as ImageOps.exif_transpose would copy the full image
+    orientation = image.getexif().get(ExifTags.Base.Orientation, 1)
+    size = (8, 9) if orientation in (5, 6, 7, 8) else (9, 8)
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    thumbnail = image.resize(size, Image.Resampling.BOX).convert("L")
+    if orientation in ORIENTATION_TRANSPOSES:
+        thumbnail = thumbnail.transpose(ORIENTATION_TRANSPOSES[orientation])
+    pixels = thumbnail.tobytes()
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            left = pixels[row * 9 + column]
+            value = (value << 1) | (left > pixels[row * 9 + column + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits of two hashes."""
+    return (a ^ b).bit_count()
+
+
+class MultiIndexHashTable(Generic[T]):
+    """
+    Table of 64-bit hashes searched by Hamming distance, with multi-index hashing.
+
+    Each hash is split into ``CHUNKS`` chunks of 16 bits, each indexed in its own table. Two
+    hashes at most ``max_distance`` bits apart have, by the pigeonhole principle, a chunk at
+    most ``max_distance // CHUNKS`` bits apart: a search only looks up the chunks of the query
+    with up to that many bits flipped, and measures the few hashes found there.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self) -> None:
+        # Hashes and items, and the positions of the entries by chunk value in each table
+        self._entries: list[tuple[int, T]] = []
+        self._tables: list[dict[int, list[int]]] = [{} for _ in range(self.CHUNKS)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, hash_value: int, item: T) -> None:
+        position = len(self._entries)
+        self._entries.append((hash_value, item))
+        for table, chunk in zip(self._tables, self._chunks(hash_value)):
+            table.setdefault(chunk, []).append(position)
+
+    def search(self, hash_value: int, max_distance: int) -> list[tuple[int, T]]:
+        """Return the items whose hash is at most ``max_distance`` bits away, closest first."""
+        if max_distance < 0:
+            return []
+
+        # An entry is found once per matching chunk
+        positions: set[int] = set()
+        masks = _flip_masks(self.CHUNK_BITS, max_distance // self.CHUNKS)
+        for table, chunk in zip(self._tables, self._chunks(hash_value)):
+            for mask in masks:
+                positions.update(table.get(chunk ^ mask, ()))
+
+        found = []
+        for position in positions:
+            candidate, item = self._entries[position]
+            distance = hamming_distance(hash_value, candidate)
+            if distance <= max_distance:
+                found.append((distance, item))
+        found.sort(key=lambda match: match[0])
+        return found
+
+    def _chunks(self, hash_value: int) -> list[int]:
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(hash_value >> (self.CHUNK_BITS * i)) & mask for i in range(self.CHUNKS)]
+
+
+@functools.cache
+def _flip_masks(bits: int, max_flips: int) -> list[int]:
+    """Every ``bits``-bit mask with at most ``max_flips`` bits set."""
+    return [
+        sum(1 << bit for bit in flipped)
+        for flips in range(min(max_flips, bits) + 1)
+        for flipped in itertools.combinations(range(bits), flips)
+    ]
+
+
+@dataclass
+class PhotoRecord:
+    """A photo sent to the bot or imported, identified by its perceptual hash."""
+
+    id: int
+    hash: int
+    job_id: str
+    chat_id: int | None
+    message_id: int | None
+    latin_name: str | None
+    created_at: float
+
+
+class PhotoHashIndex:
+    """
+    SQLite record of the perceptual hashes of every photo processed, searched in memory.
+
+    The hashes are loaded once in a ``MultiIndexHashTable``, which then only catches up with
+    the photos recorded since, so several processes (bot and ``herbabot.worker``) can share
+    the index. Photos of jobs that failed are forgotten, so sending them again processes
+    them again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._table: MultiIndexHashTable[int] = MultiIndexHashTable()
+        self._records: dict[int, PhotoRecord] = {}
+        self._last_id = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS photos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                chat_id INTEGER,
+                message_id INTEGER,
+                latin_name TEXT,
+                created_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS photos_job ON photos (job_id)")
+        with self._lock:
+            self._catch_up()
+        logger.info(f"Loaded {len(self._records)} photo hashes from {path}")
+
+    def claim(
+        self,
+        hashes: list[int],
+        job_id: str,
+        max_distance: int,
+        chat_id: int | None = None,
+        message_id: int | None = None,
+    ) -> PhotoRecord | None:
+        """
+        Record the photos of a job, unless each of them is a near-duplicate of a photo of another job.
+
+        The check and the record are atomic, so of several near-duplicates sent at once only
+        the first is processed. Photos the job recorded before, in a failed attempt, are replaced.
+
+        Returns:
+            The earlier photo closest to the first one of the job if all of them are near-duplicates,
+            otherwise None once the photos are recorded
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._catch_up()
+                matches = [self._find(hash_value, max_distance, job_id) for hash_value in hashes]
+                if hashes and all(matches):
+                    self._conn.execute("COMMIT")
+                    return matches[0]
+
+                self._conn.execute("DELETE FROM photos WHERE job_id = ?", (job_id,))
+                self._conn.executemany(
+                    "INSERT INTO photos (hash, job_id, chat_id, message_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(f"{hash_value:016x}", job_id, chat_id, message_id, time.time()) for hash_value in hashes],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._forget_records(job_id)
+            self._catch_up()
+        return None
+
+    def identify(self, job_id: str, latin_name: str) -> None:
+        """Record the species identified in the photos of a job, shown to the senders of near-duplicates."""
+        with self._lock:
+            self._conn.execute("UPDATE photos SET latin_name = ? WHERE job_id = ?", (latin_name, job_id))
+            for record in self._records.values():
+                if record.job_id == job_id:
+                    record.latin_name = latin_name
+
+    def forget(self, job_id: str) -> None:
+        """Remove the photos of a job, e.g. when it failed."""
+        with self._lock:
+            self._conn.execute("DELETE FROM photos WHERE job_id = ?", (job_id,))
+            self._forget_records(job_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _find(self, hash_value: int, max_distance: int, job_id: str) -> PhotoRecord | None:
+        for _, record_id in self._table.search(hash_value, max_distance):
+            record = self._records.get(record_id)
+            if record is None or record.job_id == job_id:
+                continue
+            # Another process may have identified or forgotten the photo since it was loaded
+            row = self._conn.execute("SELECT latin_name FROM photos WHERE id = ?", (record_id,)).fetchone()
+            if row is None:
+                del self._records[record_id]
+                continue
+            record.latin_name = row[0]
+            return record
+        return None
+
+    def _catch_up(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, hash, job_id, chat_id, message_id, latin_name, created_at FROM photos WHERE id > ? ORDER BY id",
+            (self._last_id,),
+        ).fetchall()
+        for record_id, hash_text, *fields in rows:
+            record = PhotoRecord(record_id, int(hash_text, 16), *fields)
+            self._records[record_id] = record
+            self._table.add(record.hash, record_id)
+            self._last_id = record_id
+
+    def _forget_records(self, job_id: str) -> None:
+        # The table keeps the ids, searches skip the ones without a record
+        for record_id in [record.id for record in self._records.values() if record.job_id == job_id]:
+            del self._records[record_id]
+
+
+_index: PhotoHashIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_photo_hash_index() -> PhotoHashIndex | None:
+    """Return the shared photo hash index, or None when it is disabled (empty ``PHOTO_HASH_INDEX_PATH``)."""
+    global _index
+    if not PHOTO_HASH_INDEX_PATH:
+        return None
+
+    with _index_lock:
+        if _index is None:
+            _index = PhotoHashIndex(Path(PHOTO_HASH_INDEX_PATH))
+        return _index
@@ -0,0 +1,604 @@
+import asyncio
+import functools
+import logging
+import random
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict
+
+from telegram import Bot, Message, ReplyParameters
+
+from herbabot.config import (
+    ARCHIVE_EXIF_POLICY,
+    ARCHIVE_FORMATS,
+    ARCHIVE_MAX_EDGE,
+    ARCHIVE_QUALITY,
+    ARCHIVE_WIDTHS,
+    DESCRIPTION_EDIT_INTERVAL_SECONDS,
+    DESCRIPTION_STREAMING,
+    DUPLICATE_ENTRY_POLICY,
+    DUPLICATE_PHOTO_MAX_DISTANCE,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_DELAY_SECONDS,
+    JOB_RETRY_MAX_DELAY_SECONDS,
+    JOB_WORKERS,
+    JOB_WORKSPACE_ROOT,
+)
+from herbabot.executor import run_blocking, run_cpu
+from herbabot.geocoding import locate
+from herbabot.github_pr import create_plant_pr, find_existing_entries, prefetch_repository, read_repository_file
+from herbabot.handlers_utils import handle_exif_metadata, prepare_date, prepare_gps_data
+from herbabot.image_ingest import IngestedImage, ingest_image
+from herbabot.image_output import ImageVariant, render_image_variants
+from herbabot.job_queue import DONE, STAGES, Job, JobQueue, get_job_queue
+from herbabot.message_stream import MessageStreamer
+from herbabot.metrics import JOB_RETRIES, JOB_STEP_DURATION, JOBS_FINISHED, STAGE_DURATION
+from herbabot.photo_hashes import get_photo_hash_index
+from herbabot.plant_description import generate_plant_description
+from herbabot.plant_entry import append_plant_entry, create_plant_entry, get_plant_entry_info, plan_plant_entry
+from herbabot.plant_id import identify_ingested_specimen
+from herbabot.pr_batcher import get_pr_batcher
+from herbabot.rate_limits import RateLimitedError
+from herbabot.stage_graph import StageFailedError, StageNode, run_stage_graph
+from herbabot.workspace import JobWorkspace, open_job_workspace, remove_workspace
+
+logger = logging.getLogger(__name__)
+
+GENERIC_FAILURE = "❌ *An error occurred while processing your file*\n\nPlease try again."
+
+# Message sent when a job gives up while working towards a stage
+FAILURE_MESSAGES = {
+    "identified": "❌ *Could not identify the plant*\n\nPlease try another photo with better lighting and focus.",
+    "encoded": "❌ Failed to create plant entry. Please try again.",
+    "rendered": "❌ Failed to create plant entry. Please try again.",
+    "pushed": "⚠️ Plant entry created, but failed to create pull request.",
+}
+
+
+class PermanentJobError(Exception):
+    """A stage failure that retrying cannot fix, reported to the user with ``user_message``."""
+
+    def __init__(self, user_message: str) -> None:
+        super().__init__(user_message)
+        self.user_message = user_message
+
+
+class JobSkipped(Exception):
+    """Raised by a stage when the job has nothing to publish; the job finishes and ``user_message`` is sent."""
+
+    def __init__(self, user_message: str) -> None:
+        super().__init__(user_message)
+        self.user_message = user_message
+
+
+class JobNotifier:
+    """Sends replies to the message a job was created from, without needing the original update."""
+
+    def __init__(self, bot: Bot, job: Job) -> None:
+        self.bot = bot
+        self.job = job
+
+    async def reply_text(self, text: str, parse_mode: str | None = None) -> Message:
+        return await self.bot.send_message(
+            chat_id=self.job.chat_id,
+            text=text,
+            parse_mode=parse_mode,
+            reply_parameters=ReplyParameters(message_id=self.job.message_id, allow_sending_without_reply=True),
+        )
+
+
+# Runs a step and returns the outputs to record, or None when there is nothing to record
+StageRunner = Callable[[Job, JobNotifier, JobWorkspace], Awaitable[Dict[str, Any] | None]]
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter before retrying a stage that already failed ``attempts`` times."""
+    delay = min(JOB_RETRY_MAX_DELAY_SECONDS, JOB_RETRY_DELAY_SECONDS * 2**attempts)
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def run_job(bot: Bot, queue: JobQueue, job: Job) -> None:
+    """
+    Run the remaining steps of a claimed job, recording each completed stage in the queue.
+
+    Independent steps run concurrently: once the plant is identified, the description, the
+    image encoding and the repository prefetch proceed in parallel and join before the
+    entry is rendered and pushed. A failing step is retried later with exponential backoff,
+    up to ``JOB_MAX_ATTEMPTS`` times; steps completed before are never run again.
+    """
+    notifier = JobNotifier(bot, job)
+    workspace = open_job_workspace(job.id, Path(JOB_WORKSPACE_ROOT))
+    nodes = _job_graph(queue, job, notifier, workspace)
+
+    try:
+        result = await run_stage_graph(nodes)
+    except StageFailedError as e:
+        await _handle_failure(queue, job, notifier, workspace, e.stage, e.error)
+        return
+
+    logger.info(f"Job {job.id} ran in {result.describe(nodes)}")
+    for name, timing in result.timings.items():
+        JOB_STEP_DURATION.observe(timing.duration, step=name)
+    # Batched jobs are finished by the batch's callback, possibly before add returned
+    if job.stage == "pushed" and job.status != DONE:
+        await _finish_job(queue, job, workspace)
+
+
+async def _finish_job(queue: JobQueue, job: Job, workspace: JobWorkspace) -> None:
+    await run_blocking("queue", queue.finish, job)
+    JOBS_FINISHED.inc(outcome="done")
+    remove_workspace(workspace)
+
+
+def _job_graph(queue: JobQueue, job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> list[StageNode]:
+    def step(name: str, runner: StageRunner, after: tuple[str, ...] = ()) -> StageNode:
+        async def run() -> None:
+            if _is_done(job, name):
+                return
+            outputs = await runner(job, notifier, workspace)
+            if outputs is not None:
+                await run_blocking("queue", queue.complete_stage, job, name, outputs)
+                logger.info(f"Job {job.id} completed step {name}")
+
+        return StageNode(name, run, after)
+
+    return [
+        step("prefetched", _prefetch),
+        step("identified", _identify),
+        step("described", _describe, after=("identified",)),
+        step("encoded", _encode, after=("identified",)),
+        step("rendered", _render, after=("described", "encoded")),
+        step("pushed", functools.partial(_push, queue), after=("rendered", "prefetched")),
+    ]
+
+
+def _is_done(job: Job, step: str) -> bool:
+    if step in STAGES:
+        return STAGES.index(job.stage) >= STAGES.index(step)
+    if step == "encoded":
+        return "image_variants" in job.payload or _is_done(job, "rendered")
+    return _is_done(job, "pushed")
+
+
+async def _prefetch(job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> Dict[str, Any] | None:
+    # Batches are published later, and refresh the repository themselves
+    if get_pr_batcher() is None:
+        try:
+            await run_blocking("pr", prefetch_repository)
+        except Exception as e:
+            # Only an optimization, the push syncs the repository again
+            logger.warning(f"Failed to prefetch the repository for job {job.id}: {e}")
+    return None
+
+
+async def _identify(job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> Dict[str, Any]:
+    # Album jobs hold several photos of the same specimen, identified in a single request
+    photos = job.payload.get("photos") or [{"path": job.source_path, "organ": None}]
+    try:
+        images = await asyncio.gather(*(run_blocking("ingest", ingest_image, Path(photo["path"])) for photo in photos))
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to ingest images of job {job.id}: {e}")
+        raise PermanentJobError("❌ Failed to read your image. Please try sending a JPEG or PNG image.") from e
+
+    # Break the ingest down: read, exif, and decode plus archival for the HEIC/PNG conversion
+    for image in images:
+        for lap, seconds in image.timings.items():
+            STAGE_DURATION.observe(seconds, stage=f"ingest_{lap}")
+
+    await _check_duplicate(job, images)
+
+    # The entry shows the first photo, located and dated by the first photo with metadata
+    image = images[0]
+    exif_metadata = next((other.exif_metadata for other in images if other.exif_metadata), image.exif_metadata)
+    await handle_exif_metadata(notifier, exif_metadata)
+
+    logger.info(f"Starting plant identification for {len(images)} file(s): {image.source_path}")
+    try:
+        result = await run_blocking(
+            "identify", identify_ingested_specimen, list(images), [photo.get("organ") for photo in photos]
+        )
+    except ValueError as e:
+        raise PermanentJobError(FAILURE_MESSAGES["identified"]) from e
+    logger.info(f"Plant identification successful: {result.get('latin_name', 'Unknown')}")
+    index = get_photo_hash_index()
+    if index is not None:
+        await run_blocking("photo_index", index.identify, job.id, result["latin_name"])
+
+    await _send_plant_identification_result(notifier, result)
+
+    entry = await _plan_entry(job, result, exif_metadata)
+    if entry["action"] == "skip":
+        raise JobSkipped(
+            f"📚 *{result['latin_name']}* is already in the herbarium (`{entry['existing']}`).\n\n"
+            f"No pull request was created."
+        )
+
+    return {
+        "result": result,
+        "archival_path": str(image.archival_path),
+        "exif_metadata": exif_metadata,
+        "entry": entry,
+    }
+
+
+async def _check_duplicate(job: Job, images: list[IngestedImage]) -> None:
+    # Burst shots are recognized before paying for their identification, description and pull request
+    index = get_photo_hash_index()
+    if index is None:
+        return
+
+    # A negative distance matches nothing: photos sent with the "new" caption are only recorded
+    max_distance = -1 if job.payload.get("force") else DUPLICATE_PHOTO_MAX_DISTANCE
+    duplicate = await run_blocking(
+        "photo_index",
+        index.claim,
+        [image.perceptual_hash for image in images],
+        job.id,
+        max_distance,
+        job.chat_id,
+        job.message_id,
+    )
+    if duplicate is None:
+        return
+
+    logger.info(f"Job {job.id} is a near-duplicate of job {duplicate.job_id}")
+    sent = datetime.fromtimestamp(duplicate.created_at).strftime("%Y-%m-%d %H:%M")
+    status = f"identified as *{duplicate.latin_name}*" if duplicate.latin_name else "still being processed"
+    raise JobSkipped(
+        f"🔁 *Same as the photo sent on {sent}*, {status}.\n\n"
+        f"It was not processed again. Send it with the caption _new_ to process it anyway."
+    )
+
+
+async def _plan_entry(job: Job, result: Dict[str, Any], exif_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    # Check the species index before describing and encoding anything for an existing entry
+    stem = get_plant_entry_info(result)["stem"]
+    try:
+        existing = await run_blocking("species_index", find_existing_entries, result["latin_name"], stem)
+    except Exception as e:
+        logger.warning(f"Failed to look up existing entries for job {job.id}: {e}")
+        existing = []
+
+    entry = plan_plant_entry(
+        result,
+        [existing_entry.path for existing_entry in existing],
+        DUPLICATE_ENTRY_POLICY,
+        prepare_date(exif_metadata.get("date_taken")),
+        prepare_gps_data(exif_metadata) is not None,
+    )
+    if entry["existing"]:
+        logger.info(f"Job {job.id} found existing entry {entry['existing']}, action: {entry['action']}")
+    return entry
+
+
+def _entry_plan(job: Job) -> Dict[str, Any]:
+    # Jobs identified before the species index existed create their entry as before
+    return job.payload.get("entry") or {
+        "action": "create",
+        "stem": get_plant_entry_info(job.payload["result"])["stem"],
+        "existing": None,
+    }
+
+
+async def _describe(job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> Dict[str, Any]:
+    if _entry_plan(job)["action"] == "append":
+        # The existing entry keeps its description
+        return {"description": None}
+
+    progress = await notifier.reply_text("🤖 *Generating detailed description with AI...*", parse_mode="Markdown")
+    if not DESCRIPTION_STREAMING:
+        description = await run_blocking("describe", generate_plant_description, job.payload["result"])
+        return {"description": description}
+
+    # Show the description in the progress message while it is being generated
+    streamer = MessageStreamer(notifier.bot, job.chat_id, progress.message_id, DESCRIPTION_EDIT_INTERVAL_SECONDS)
+    loop = asyncio.get_running_loop()
+
+    def on_text(text: str) -> None:
+        loop.call_soon_threadsafe(streamer.update, f"🤖 {text}")
+
+    try:
+        description = await run_blocking("describe", generate_plant_description, job.payload["result"], on_text)
+        if description:
+            # Also shows descriptions served from the cache, which are not streamed
+            streamer.update(f"🤖 {description}")
+    finally:
+        await streamer.close()
+
+    return {"description": description}
+
+
+async def _encode(job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> Dict[str, Any]:
+    entry = _entry_plan(job)
+    if entry["action"] == "append":
+        # An appended observation publishes no new images
+        return {"image_variants": []}
+
+    # Encode the published images in the process pool
+    image_variants = await run_cpu(
+        "encode",
+        render_image_variants,
+        Path(job.payload["archival_path"]),
+        workspace.entries_dir,
+        entry["stem"],
+        ARCHIVE_MAX_EDGE,
+        ARCHIVE_WIDTHS,
+        ARCHIVE_FORMATS,
+        ARCHIVE_QUALITY,
+        ARCHIVE_EXIF_POLICY == "keep",
+    )
+    return {"image_variants": [asdict(variant) for variant in image_variants]}
+
+
+async def _render(job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> Dict[str, Any]:
+    result = job.payload["result"]
+    exif_metadata = job.payload["exif_metadata"]
+    entry = _entry_plan(job)
+
+    if entry["action"] == "append":
+        entry_text = await run_blocking("species_index", read_repository_file, entry["existing"])
+        appended = await run_blocking(
+            "render",
+            append_plant_entry,
+            entry_text,
+            workspace.entries_dir / f"{entry['stem']}.md",
+            prepare_date(exif_metadata.get("date_taken")),
+            prepare_gps_data(exif_metadata),
+        )
+        if not appended:
+            raise JobSkipped(f"📚 This observation of *{result['latin_name']}* is already in the herbarium.")
+        return {}
+
+    gps_data = prepare_gps_data(exif_metadata)
+    # The first lookup loads the gazetteer, and every lookup reads its memory-mapped arrays
+    place = await run_blocking("render", locate, gps_data)
+    plant_entry_path = await run_blocking(
+        "render",
+        create_plant_entry,
+        result,
+        Path(job.payload["archival_path"]),
+        workspace.entries_dir,
+        gps_data,
+        prepare_date(exif_metadata.get("date_taken")),
+        job.payload.get("description"),
+        [ImageVariant(**variant) for variant in job.payload["image_variants"]],
+        entry["stem"],
+        place=place,
+    )
+    if not plant_entry_path:
+        raise RuntimeError("Failed to create plant entry")
+
+    logger.debug(f"Plant entry created: {plant_entry_path.name}")
+    return {}
+
+
+async def _push(queue: JobQueue, job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> Dict[str, Any] | None:
+    if get_pr_batcher() is not None:
+        # The stage completes once the batch is published
+        await _add_to_batch(queue, job, notifier, workspace)
+        return None
+
+    pr_url = await run_blocking("pr", create_plant_pr, workspace, job.payload["result"])
+    if not pr_url:
+        raise RuntimeError("Failed to create pull request")
+
+    await _send_pr_result(notifier, pr_url)
+    return {"pr_url": pr_url}
+
+
+async def _add_to_batch(queue: JobQueue, job: Job, notifier: JobNotifier, workspace: JobWorkspace) -> None:
+    batcher = get_pr_batcher()
+    assert batcher is not None
+
+    async def published(pr_url: str | None) -> None:
+        if not pr_url:
+            await _handle_failure(queue, job, notifier, workspace, "pushed", RuntimeError("Failed to publish batch"))
+            wake_job_workers()
+            return
+
+        await run_blocking("queue", queue.complete_stage, job, "pushed", {"pr_url": pr_url})
+        await _finish_job(queue, job, workspace)
+        await _send_pr_result(notifier, pr_url)
+
+    # Park the job first, the batch may be published (and the job resumed) before add returns
+    await run_blocking("queue", queue.wait, job)
+    pending = await batcher.add(workspace, job.payload["result"], published)
+    if pending:
+        await notifier.reply_text(
+            f"📥 *Added to the next pull request* ({pending} pending)\n\nSend /flush to publish it now.",
+            parse_mode="Markdown",
+        )
+
+
+async def _handle_failure(
+    queue: JobQueue,
+    job: Job,
+    notifier: JobNotifier,
+    workspace: JobWorkspace,
+    stage: str,
+    error: Exception,
+) -> None:
+    if isinstance(error, JobSkipped):
+        logger.info(f"Job {job.id} skipped at stage {stage}: {error}")
+        await run_blocking("queue", queue.finish, job)
+        JOBS_FINISHED.inc(outcome="skipped")
+        remove_workspace(workspace)
+        await _notify(notifier, job, error.user_message)
+        return
+
+    if isinstance(error, RateLimitedError):
+        # Waiting for the budget of an upstream is not a failure, the job keeps its attempts
+        delay = error.retry_after * random.uniform(1.0, 1.1)
+        logger.info(f"Job {job.id} deferred at stage {stage} ({error}), resuming in {delay:.0f}s")
+        await run_blocking("queue", queue.retry, job, str(error), delay, count_attempt=False)
+        return
+
+    if isinstance(error, PermanentJobError):
+        user_message = error.user_message
+    elif job.attempts + 1 < JOB_MAX_ATTEMPTS:
+        delay = retry_delay(job.attempts)
+        logger.warning(f"Job {job.id} failed at stage {stage} ({error}), retrying in {delay:.0f}s")
+        await run_blocking("queue", queue.retry, job, str(error), delay)
+        JOB_RETRIES.inc(stage=stage)
+        return
+    else:
+        user_message = FAILURE_MESSAGES.get(stage, GENERIC_FAILURE)
+
+    logger.error(f"Job {job.id} failed at stage {stage}: {error}")
+    await run_blocking("queue", queue.fail, job, str(error))
+    index = get_photo_hash_index()
+    if index is not None:
+        # Sending the photos again processes them again
+        await run_blocking("photo_index", index.forget, job.id)
+    JOBS_FINISHED.inc(outcome="failed")
+    remove_workspace(workspace)
+    await _notify(notifier, job, user_message)
+
+
+async def _notify(notifier: JobNotifier, job: Job, text: str) -> None:
+    try:
+        await notifier.reply_text(text, parse_mode="Markdown")
+    except Exception as e:
+        logger.error(f"Failed to notify user about job {job.id}: {e}")
+
+
+async def _send_plant_identification_result(notifier: JobNotifier, result: Dict[str, Any]) -> None:
+    """Send formatted plant identification results to the user."""
+    plant_message = f"🌿 *{result['latin_name']}*"
+
+    if result.get("common_name"):
+        plant_message += f"\n🌸 _{result['common_name']}_"
+
+    if result.get("family"):
+        plant_message += f"\n🌳 **Family:** {result['family']}"
+
+    plant_message += f"\n\n🎯 *Confidence:* {result['score']:.1%}"
+
+    if result.get("description"):
+        plant_message += f"\n\n📖 {result['description']}"
+
+    await notifier.reply_text(plant_message, parse_mode="Markdown")
+
+
+async def _send_pr_result(notifier: JobNotifier, pr_url: str) -> None:
+    await notifier.reply_text(
+        f"✨ *Plant entry created successfully!*\n\n"
+        f"🔗 [View Pull Request]({pr_url})\n"
+        f"📝 Ready for review and merge",
+        parse_mode="Markdown",
+    )
+
+
+class JobWorkers:
+    """
+    Worker coroutines that pull jobs from the queue and run them.
+
+    Several ``JobWorkers``, in the bot process or in separate ``herbabot.worker`` processes,
+    can consume the same queue. A heartbeat renews the leases of the jobs they hold. In
+    batch mode, each process publishes its own pending batch when ``/flush`` is sent
+    through the queue.
+    """
+
+    def __init__(self, bot: Bot, queue: JobQueue, count: int, poll_interval: float = 1.0) -> None:
+        self.bot = bot
+        self.queue = queue
+        self.count = count
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def start(self) -> None:
+        """Start the workers and the lease heartbeat."""
+        self._tasks = [asyncio.create_task(self._work(), name=f"herbabot-job-worker-{i}") for i in range(self.count)]
+        self._tasks.append(asyncio.create_task(self._heartbeat(), name="herbabot-job-heartbeat"))
+        if get_pr_batcher() is not None:
+            self._tasks.append(asyncio.create_task(self._watch_flush(), name="herbabot-job-flush"))
+        logger.info(f"Started {self.count} job workers as {self.queue.worker_id}")
+
+    def wake(self) -> None:
+        """Tell idle workers that a job is ready."""
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        """Stop the workers. Jobs interrupted mid-stage are resumed on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job workers stopped")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await run_blocking("queue", self.queue.renew_leases)
+            except Exception as e:
+                logger.error(f"Failed to renew job leases: {e}")
+
+    async def _watch_flush(self) -> None:
+        batcher = get_pr_batcher()
+        assert batcher is not None
+        # Only requests sent after the start apply, the batch of a new process is empty anyway
+        flushed_at = time.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                requested_at = await run_blocking("queue", self.queue.flush_requested_at)
+                if requested_at > flushed_at:
+                    flushed_at = requested_at
+                    if batcher.pending_count:
+                        await batcher.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush the pending batch: {e}")
+
+    async def _work(self) -> None:
+        while True:
+            job = await run_blocking("queue", self.queue.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+                continue
+
+            try:
+                await run_job(self.bot, self.queue, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error in job {job.id}: {e}", exc_info=True)
+
+
+_workers: JobWorkers | None = None
+
+
+def start_job_workers(bot: Bot, count: int = JOB_WORKERS) -> JobWorkers | None:
+    """
+    Start the job workers of this process, which also resume the jobs left over by a previous run.
+
+    Returns None when ``count`` is 0: the process then only enqueues jobs, and separate
+    ``herbabot.worker`` processes run them.
+    """
+    global _workers
+    if count <= 0:
+        logger.info("No job workers in this process, jobs are run by herbabot.worker processes")
+        return None
+    if _workers is None:
+        _workers = JobWorkers(bot, get_job_queue(), count)
+        _workers.start()
+    return _workers
+
+
+def wake_job_workers() -> None:
+    if _workers is not None:
+        _workers.wake()
+
+
+async def stop_job_workers() -> None:
+    global _workers
+    if _workers is not None:
+        await _workers.stop()
+        _workers = None
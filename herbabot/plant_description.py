@@ -1,37 +1,108 @@
 import logging
-from typing import Any, Dict, Optional
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from openai import APIStatusError
+from openai.types.chat import ChatCompletionMessageParam
+
+from herbabot.cache import SQLiteCache, TieredCache
+from herbabot.config import (
+    DESCRIPTION_CACHE_MAX_ENTRIES,
+    DESCRIPTION_CACHE_MEMORY_ENTRIES,
+    DESCRIPTION_CACHE_PATH,
+    DESCRIPTION_CACHE_TTL_SECONDS,
+    OPENAI_API_KEY,
+)
+from herbabot.http_clients import get_openai_client
+from herbabot.metrics import time_stage
+from herbabot.rate_limits import estimate_tokens, get_rate_limiter, update_from_openai_headers
 
-from openai import OpenAI
+logger = logging.getLogger(__name__)
 
-from herbabot.config import OPENAI_API_KEY
+# Longest description requested, also counted against the tokens-per-minute budget
+MAX_TOKENS = 800
 
-logger = logging.getLogger(__name__)
+# Bump whenever the prompt changes so that descriptions generated by the old prompt are not reused
+PROMPT_VERSION = 1
+
+_cache: TieredCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_description_cache() -> TieredCache:
+    """Return the store of generated descriptions, persisted on disk unless disabled."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            disk = None
+            if DESCRIPTION_CACHE_PATH and DESCRIPTION_CACHE_TTL_SECONDS > 0:
+                disk = SQLiteCache(
+                    Path(DESCRIPTION_CACHE_PATH),
+                    "descriptions",
+                    DESCRIPTION_CACHE_TTL_SECONDS,
+                    DESCRIPTION_CACHE_MAX_ENTRIES,
+                )
+            _cache = TieredCache(disk, DESCRIPTION_CACHE_MEMORY_ENTRIES, name="descriptions")
+        return _cache
+
+
+def description_cache_key(plant_data: Dict[str, Any]) -> str:
+    """Cache key of a description: normalized latin name and family plus the prompt version."""
+
+    def normalize(value: Any) -> str:
+        return " ".join(str(value or "").split()).lower()
 
+    return f"v{PROMPT_VERSION}:{normalize(plant_data.get('latin_name'))}:{normalize(plant_data.get('family'))}"
 
-def generate_plant_description(plant_data: Dict[str, Any]) -> Optional[str]:
+
+def generate_plant_description(
+    plant_data: Dict[str, Any],
+    on_text: Optional[Callable[[str], None]] = None,
+) -> Optional[str]:
+    """
+    Return an AI-generated description of the plant, reusing the one already generated for the species.
+
+    Concurrent calls for the same species share a single OpenAI request.
+
+    Args:
+        plant_data: Identification result of the plant
+        on_text: Optional callback streaming the completion: it is called with the text
+            generated so far each time new tokens arrive. It is not called when the
+            description comes from the cache.
+
+    Returns:
+        The description, or None if it could not be generated
+    """
     if not OPENAI_API_KEY:
         logger.warning("OpenAI API key not configured, skipping description generation")
         return None
 
-    try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
+    if not plant_data.get("latin_name"):
+        return _request_plant_description(plant_data, on_text)
+
+    return get_description_cache().get_or_compute(
+        description_cache_key(plant_data), lambda: _request_plant_description(plant_data, on_text)
+    )
 
-        # Extract plant information
-        latin_name = plant_data.get("latin_name", "Unknown")
-        common_name = plant_data.get("common_name", "")
-        family = plant_data.get("family", "")
-        existing_description = plant_data.get("description", "")
 
-        # Build the prompt
-        prompt = f"""Write a detailed and informative description for the plant {latin_name}"""
+def build_description_messages(plant_data: Dict[str, Any]) -> List[ChatCompletionMessageParam]:
+    """Build the chat messages asking for the description of a plant."""
+    latin_name = plant_data.get("latin_name", "Unknown")
+    common_name = plant_data.get("common_name", "")
+    family = plant_data.get("family", "")
+    existing_description = plant_data.get("description", "")
 
-        if common_name:
-            prompt += f" (commonly known as {common_name})"
+    # Build the prompt
+    prompt = f"""Write a detailed and informative description for the plant {latin_name}"""
 
-        if family:
-            prompt += f" from the {family} family"
+    if common_name:
+        prompt += f" (commonly known as {common_name})"
 
-        prompt += """.
+    if family:
+        prompt += f" from the {family} family"
+
+    prompt += """.
 
 The description should be:
 - Educational and informative
@@ -41,27 +112,64 @@ The description should be:
 - Written in a clear, accessible style
 - Factually accurate"""
 
-        if existing_description:
-            prompt += f"\n\nExisting description from PlantNet: {existing_description}"
-            prompt += "\n\nPlease expand on this information or provide a more comprehensive description."
+    if existing_description:
+        prompt += f"\n\nExisting description from PlantNet: {existing_description}"
+        prompt += "\n\nPlease expand on this information or provide a more comprehensive description."
+
+    return [
+        {
+            "role": "system",
+            "content": "You are a botanical expert writing informative plant descriptions for a herbarium collection. Provide accurate, educational content suitable for plant enthusiasts and researchers.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _request_plant_description(
+    plant_data: Dict[str, Any],
+    on_text: Optional[Callable[[str], None]] = None,
+) -> Optional[str]:
+    latin_name = plant_data.get("latin_name", "Unknown")
+    messages = build_description_messages(plant_data)
+    limiter = get_rate_limiter("openai")
+    if limiter is not None:
+        # Raises RateLimitedError when the budget refills too late, so the job is retried then
+        prompt = "".join(str(message.get("content", "")) for message in messages)
+        limiter.acquire(requests=1, tokens=estimate_tokens(prompt, MAX_TOKENS))
 
+    try:
+        client = get_openai_client()
         logger.info(f"Generating OpenAI description for {latin_name}")
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a botanical expert writing informative plant descriptions for a herbarium collection. Provide accurate, educational content suitable for plant enthusiasts and researchers.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=800,
-            temperature=0.7,
-        )
-
-        if response.choices and response.choices[0].message.content:
-            description = response.choices[0].message.content.strip()
+        with time_stage("openai_api"):
+            if on_text is None:
+                raw_response = client.chat.completions.with_raw_response.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=MAX_TOKENS,
+                    temperature=0.7,
+                )
+                update_from_openai_headers(limiter, raw_response.headers)
+                response = raw_response.parse()
+                content = response.choices[0].message.content if response.choices else None
+            else:
+                raw_stream = client.chat.completions.with_raw_response.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    max_tokens=MAX_TOKENS,
+                    temperature=0.7,
+                    stream=True,
+                )
+                update_from_openai_headers(limiter, raw_stream.headers)
+                content = ""
+                for chunk in raw_stream.parse():
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        content += delta
+                        on_text(content)
+
+        if content and content.strip():
+            description = content.strip()
             logger.info(f"OpenAI description generated successfully for {latin_name}")
             return description
         else:
@@ -69,5 +177,8 @@ The description should be:
             return None
 
     except Exception as e:
+        if isinstance(e, APIStatusError):
+            # Rejected calls (429) report the budget too, and hold back the next ones
+            update_from_openai_headers(limiter, e.response.headers)
         logger.error(f"Error generating OpenAI description for {latin_name}: {e}")
         return None
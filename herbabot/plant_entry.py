@@ -1,15 +1,22 @@
 import logging
 import re
 import shutil
+from dataclasses import asdict
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from jinja2 import Template
+from jinja2 import TemplateNotFound
 
-from herbabot.plant_description import generate_plant_description
+from herbabot.config import ENTRY_TEMPLATES
+from herbabot.image_output import ImageVariant
+from herbabot.templating import get_template_environment, output_suffix
 
 logger = logging.getLogger(__name__)
 
+# Directory of the plant entries in the portfolio repository
+ENTRIES_DIR = "src/data/plants"
+
 
 def _sanitize_filename(name: str) -> str:
     """Convert scientific name to a safe filename."""
@@ -22,44 +29,55 @@ def _sanitize_filename(name: str) -> str:
 def create_plant_entry(
     result: Dict[str, Any],
     image_path: Path,
+    output_dir: Path,
     gps_data: Dict[str, float] | None = None,
     date: str | None = None,
+    ai_description: str | None = None,
+    image_variants: List[ImageVariant] | None = None,
+    stem: str | None = None,
+    templates: List[str] = ENTRY_TEMPLATES,
+    place: Dict[str, str] | None = None,
 ) -> Path | None:
     """
-    Create a plant entry markdown file using the Jinja2 template.
+    Create a plant entry markdown file, and its sidecar files, using the Jinja2 templates.
 
     Args:
         result: Dictionary containing plant identification results
         image_path: Path to the original image file
+        output_dir: Directory receiving the entry files, usually ``JobWorkspace.entries_dir``
         gps_data: Optional dictionary containing GPS coordinates
                   Expected format: {"latitude": float, "longitude": float, "accuracy": float}
+        date: Optional date the photo was taken (YYYY-MM-DD)
+        ai_description: Optional AI-generated description, see ``generate_plant_description``
+        image_variants: Optional images already written to ``output_dir`` by ``render_image_variants``;
+                        the original image is copied as-is when omitted
+        stem: Optional base file name of the entry, see ``plan_plant_entry``; derived from the
+              scientific name when omitted
+        templates: Templates to render, see ``ENTRY_TEMPLATES``; each one writes ``<stem><suffix>``,
+                   e.g. ``plant_entry.json.j2`` a JSON sidecar. The first one renders the entry itself.
+        place: Optional ``locality``, ``region`` and ``country`` of the photo, see ``locate``
 
     Returns:
         Path to the created plant entry markdown file, or None if creation failed
     """
-    # Load the template
-    template_path = Path(__file__).parent.parent / "templates" / "plant_entry.md.j2"
+    # Load the compiled templates
     try:
-        with open(template_path, "r", encoding="utf-8") as f:
-            template_content = f.read()
-    except FileNotFoundError:
-        logger.error(f"Plant entry template not found at {template_path}")
+        environment = get_template_environment()
+        compiled = [environment.get_template(name) for name in templates]
+    except TemplateNotFound as e:
+        logger.error(f"Plant entry template not found: {e}")
         return None
 
-    # Create tmp directory
-    tmp_dir = Path("tmp")
-    tmp_dir.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
 
     # Generate filename from scientific name
     scientific_name = result.get("latin_name", "unknown-plant")
-    filename = _sanitize_filename(scientific_name)
+    filename = f"{stem}.jpg" if stem else _sanitize_filename(scientific_name)
+    entry_stem = filename.removesuffix(".jpg")
 
-    # Create the plant entry file path
-    plant_entry_path = tmp_dir / f"{_sanitize_filename(scientific_name).replace('.jpg', '')}.md"
-
-    # Generate enhanced description using OpenAI
-    logger.info(f"Generating OpenAI description for {scientific_name}")
-    ai_description = generate_plant_description(result)
+    # Create the plant entry file paths
+    entry_paths = [output_dir / f"{entry_stem}{output_suffix(name)}" for name in templates]
+    plant_entry_path = entry_paths[0]
 
     # Use OpenAI description if available, otherwise fall back to existing description
     description = ai_description if ai_description else result.get("description")
@@ -74,27 +92,36 @@ def create_plant_entry(
         "date": date,
     }
 
+    # Expose responsive images so the site can build srcset attributes
+    if image_variants:
+        template_vars["images"] = [asdict(variant) for variant in image_variants]
+        template_vars["srcset"] = ", ".join(
+            f"/plants/{variant.file_name} {variant.width}w"
+            for variant in sorted(image_variants, key=lambda variant: variant.width)
+            if variant.format == "jpeg"
+        )
+
     # Add GPS data if available
     if gps_data:
         template_vars["latitude"] = gps_data.get("latitude")
         template_vars["longitude"] = gps_data.get("longitude")
         template_vars["accuracy"] = gps_data.get("accuracy")
+    if place:
+        template_vars.update(place)
 
-    # Render the template
-    template = Template(template_content)
-    rendered_content = template.render(**template_vars)
-
-    # Write the plant entry file
+    # Render and write the plant entry files
     try:
-        with open(plant_entry_path, "w", encoding="utf-8") as f:
-            f.write(rendered_content)
-
-        # Copy the image to tmp directory with scientific name
-        image_dest_path = tmp_dir / filename
-        shutil.copy2(image_path, image_dest_path)
+        for template, entry_path in zip(compiled, entry_paths):
+            with open(entry_path, "w", encoding="utf-8") as f:
+                f.write(template.render(**template_vars))
 
         logger.info(f"Plant entry created: {plant_entry_path}")
-        logger.info(f"Image copied to: {image_dest_path}")
+
+        if not image_variants:
+            # Copy the image next to the entry with scientific name
+            image_dest_path = output_dir / filename
+            shutil.copy2(image_path, image_dest_path)
+            logger.info(f"Image copied to: {image_dest_path}")
 
         return plant_entry_path
     except Exception as e:
@@ -118,5 +145,151 @@ def get_plant_entry_info(result: Dict[str, Any]) -> Dict[str, str]:
     return {
         "scientific_name": scientific_name,
         "filename": filename,
+        "stem": filename.removesuffix(".jpg"),
         "markdown_filename": f"{_sanitize_filename(scientific_name).replace('.jpg', '')}.md",
     }
+
+
+def plan_plant_entry(
+    result: Dict[str, Any],
+    existing: List[str],
+    policy: str,
+    date: str | None = None,
+    located: bool = False,
+) -> Dict[str, Any]:
+    """
+    Decide how to add an identified plant to the portfolio, given the entries it already has for it.
+
+    Args:
+        result: Dictionary containing plant identification results
+        existing: Repository paths of the portfolio entries of the same species, see ``SpeciesIndex.find``
+        policy: ``DUPLICATE_ENTRY_POLICY``, one of ``overwrite``, ``skip``, ``append`` and ``variant``
+        date: Optional date the photo was taken (YYYY-MM-DD), naming dated variants
+        located: Whether the photo has GPS coordinates
+
+    Returns:
+        Dictionary with the ``action`` to take (``create``, ``overwrite``, ``skip``, ``append``
+        or ``variant``), the ``stem`` of the entry files and the ``existing`` entry concerned
+    """
+    stem = get_plant_entry_info(result)["stem"]
+    own_path = f"{ENTRIES_DIR}/{stem}.md"
+    if not existing:
+        return {"action": "create", "stem": stem, "existing": None}
+
+    # Prefer the entry the plain file name points to over dated variants
+    current = own_path if own_path in existing else sorted(existing)[0]
+    if policy == "overwrite":
+        if own_path in existing:
+            return {"action": "overwrite", "stem": stem, "existing": own_path}
+        return {"action": "create", "stem": stem, "existing": None}
+    if policy == "skip" or (policy == "append" and not date and not located):
+        # Nothing to append without a date or a location
+        return {"action": "skip", "stem": Path(current).stem, "existing": current}
+    if policy == "append":
+        return {"action": "append", "stem": Path(current).stem, "existing": current}
+
+    base = f"{stem}-{date or datetime.now().strftime('%Y-%m-%d')}"
+    variant = base
+    suffix = 2
+    while f"{ENTRIES_DIR}/{variant}.md" in existing:
+        variant = f"{base}-{suffix}"
+        suffix += 1
+    return {"action": "variant", "stem": variant, "existing": current}
+
+
+def parse_front_matter(entry_text: str) -> Dict[str, str]:
+    """
+    Read the top-level scalar fields of a plant entry's front matter.
+
+    Only ``key: value`` lines are read, with their quotes removed; nested lists such as
+    ``images`` are skipped. Entries without front matter give an empty dictionary.
+    """
+    lines = entry_text.splitlines()
+    if not lines or lines[0].strip() != "---":
+        return {}
+
+    fields: Dict[str, str] = {}
+    for line in lines[1:]:
+        if line.strip() == "---":
+            break
+        if line[:1].isspace() or ":" not in line:
+            continue
+        key, value = line.split(":", 1)
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        if value:
+            fields[key.strip()] = value
+    return fields
+
+
+def append_observation(
+    entry_text: str,
+    date: str | None = None,
+    gps_data: Dict[str, float] | None = None,
+) -> str:
+    """
+    Add an observation of the plant to the ``observations`` list of an existing entry's front matter.
+
+    The entry is returned unchanged when the observation is empty, or already recorded as
+    the entry's own date and location or in its ``observations``.
+
+    Args:
+        entry_text: Content of the existing plant entry
+        date: Optional date the photo was taken (YYYY-MM-DD)
+        gps_data: Optional dictionary containing GPS coordinates, as for ``create_plant_entry``
+
+    Returns:
+        Content of the entry with the observation appended
+    """
+    fields: List[Tuple[str, Any]] = [("date", date)]
+    if gps_data:
+        fields += [(key, gps_data.get(key)) for key in ("latitude", "longitude", "accuracy")]
+    values = [(key, str(value)) for key, value in fields if value is not None]
+    if not values:
+        return entry_text
+
+    front_matter = parse_front_matter(entry_text)
+    if all(front_matter.get(key) == value for key, value in values if key != "accuracy"):
+        return entry_text
+
+    item = [f"  - {values[0][0]}: {values[0][1]}", *(f"    {key}: {value}" for key, value in values[1:])]
+    lines = entry_text.split("\n")
+    if "\n".join(item) in entry_text or not lines or lines[0].strip() != "---":
+        return entry_text
+    end = next((i for i in range(1, len(lines)) if lines[i].strip() == "---"), None)
+    if end is None:
+        return entry_text
+
+    start = next((i for i in range(1, end) if lines[i].rstrip() == "observations:"), None)
+    if start is None:
+        lines[end:end] = ["observations:", *item]
+    else:
+        # Append after the last line of the existing list
+        position = start + 1
+        while position < end and lines[position][:1].isspace():
+            position += 1
+        lines[position:position] = item
+    return "\n".join(lines)
+
+
+def append_plant_entry(
+    entry_text: str,
+    output_path: Path,
+    date: str | None = None,
+    gps_data: Dict[str, float] | None = None,
+) -> bool:
+    """
+    Write an existing plant entry with a new observation appended, see ``append_observation``.
+
+    Returns:
+        True if the entry was written, False if the observation was already recorded
+    """
+    updated = append_observation(entry_text, date, gps_data)
+    if updated == entry_text:
+        return False
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(updated, encoding="utf-8")
+    logger.info(f"Observation appended to plant entry: {output_path}")
+    return True
@@ -1,65 +1,165 @@
 import logging
+import threading
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
-from herbabot.config import PLANTNET_API_KEY, PLANTNET_API_URL
+from herbabot.cache import SQLiteCache
+from herbabot.config import (
+    PLANTNET_API_KEY,
+    PLANTNET_API_URL,
+    PLANTNET_CACHE_MAX_ENTRIES,
+    PLANTNET_CACHE_PATH,
+    PLANTNET_CACHE_TTL_SECONDS,
+)
+from herbabot.http_clients import get_http_session
+from herbabot.image_ingest import IngestedImage
+from herbabot.metrics import record_cache_lookup, time_stage
+from herbabot.rate_limits import get_rate_limiter, update_from_plantnet_response
 
 logger = logging.getLogger(__name__)
 
+# Most images Pl@ntNet accepts in a single identification request
+MAX_IMAGES = 5
 
-def identify_plant(
-    image_path: Path | str,
-    organs: Optional[str] = None,
+# Organ sent for untagged images when other images of the request are tagged
+AUTO_ORGAN = "auto"
+
+_cache: SQLiteCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_identification_cache() -> SQLiteCache | None:
+    """Return the persistent cache of identifications, or None when caching is disabled."""
+    global _cache
+    if not PLANTNET_CACHE_PATH or PLANTNET_CACHE_TTL_SECONDS <= 0:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteCache(
+                Path(PLANTNET_CACHE_PATH),
+                "plantnet",
+                PLANTNET_CACHE_TTL_SECONDS,
+                PLANTNET_CACHE_MAX_ENTRIES,
+            )
+        return _cache
+
+
+def identification_cache_key(content_hash: str, organs: Optional[str] = None) -> str:
+    """Content-addressed cache key of an identification request, from the SHA-256 of the original image."""
+    return f"{content_hash}:{organs or ''}"
+
+
+def identify_ingested_plant(image: IngestedImage, organs: Optional[str] = None) -> Dict[str, Any]:
+    """Identify an ingested photo, uploading the derivative prepared during ingest."""
+    if not PLANTNET_API_KEY:
+        raise ValueError("Missing PLANTNET_API_KEY environment variable for Pl@ntNet API access")
+
+    cache_key = identification_cache_key(image.content_hash, organs)
+    return _identify(cache_key, [(image.source_path, image.identification_image)], [organs] if organs else None)
+
+
+def identify_ingested_specimen(
+    images: List[IngestedImage],
+    organs: Optional[List[Optional[str]]] = None,
 ) -> Dict[str, Any]:
+    """
+    Identify a specimen from several photos (leaf, flower, bark...) in a single Pl@ntNet request.
+
+    Args:
+        images: Ingested photos of the same plant; only the first ``MAX_IMAGES`` are sent
+        organs: Optional organ of each photo (``"leaf"``, ``"flower"``...), None when unknown
+
+    Returns:
+        The identification result, as returned by ``identify_ingested_plant``
+    """
+    if not images:
+        raise ValueError("No image to identify")
+    if len(images) > MAX_IMAGES:
+        logger.info(f"Identifying from the first {MAX_IMAGES} of {len(images)} images")
+        images = images[:MAX_IMAGES]
+
+    tags = list(organs or [])[: len(images)]
+    tags += [None] * (len(images) - len(tags))
+    if len(images) == 1:
+        return identify_ingested_plant(images[0], tags[0])
+
     if not PLANTNET_API_KEY:
         raise ValueError("Missing PLANTNET_API_KEY environment variable for Pl@ntNet API access")
 
-    path = Path(image_path)
-    if not path.is_file():
-        raise ValueError(f"Image file not found: {image_path}")
+    # Pl@ntNet expects either no organs at all, or one per image
+    request_organs = [tag or AUTO_ORGAN for tag in tags] if any(tags) else None
+    cache_key = identification_cache_key(
+        "+".join(image.content_hash for image in images), ",".join(request_organs or [])
+    )
+    uploads = [(image.source_path, image.identification_image) for image in images]
+    return _identify(cache_key, uploads, request_organs)
+
+
+def _identify(
+    cache_key: str,
+    uploads: List[Tuple[Path, bytes]],
+    organs: Optional[List[str]],
+) -> Dict[str, Any]:
+    # Identical photos are answered from the cache without calling Pl@ntNet
+    names = ", ".join(str(path) for path, _ in uploads)
+    cache = get_identification_cache()
+    if cache is not None:
+        cached = cache.get(cache_key)
+        record_cache_lookup("plantnet", cached is not None)
+        if cached is not None:
+            logger.info(f"PlantNet cache hit for {names} ({cache.hits} hits, {cache.misses} misses)")
+            return cached
 
     # Log request preparation
-    logger.info(f"Preparing PlantNet API request for image: {path}")
-    logger.info(f"Image file size: {path.stat().st_size} bytes")
-    logger.info(f"Image file exists: {path.exists()}")
+    logger.info(f"Preparing PlantNet API request for {len(uploads)} image(s): {names}")
+    files = []
+    for path, image_data in uploads:
+        logger.info(f"Identification image size: {len(image_data)} bytes")
+        files.append(("images", (f"{path.stem}.jpg", image_data, "image/jpeg")))
 
     params: Dict[str, Any] = {"api-key": PLANTNET_API_KEY}
     if organs:
         params["organs"] = organs
 
-    logger.info(f"API parameters: {params}")
-    logger.info(f"API URL: {PLANTNET_API_URL}")
+    # Identifications are queued within the daily quota rather than rejected by Pl@ntNet
+    limiter = get_rate_limiter("plantnet")
+    if limiter is not None:
+        limiter.acquire(identifications=1)
 
     try:
-        with path.open("rb") as f:
-            files = {"images": f}
-            logger.info("Sending request to PlantNet API...")
-            response = requests.post(PLANTNET_API_URL, params=params, files=files)
+        logger.info("Sending request to PlantNet API...")
+        with time_stage("plantnet_api"):
+            response = get_http_session("plantnet").post(PLANTNET_API_URL, params=params, files=files)
 
-        # Log response details
         logger.info(f"PlantNet API response status: {response.status_code}")
-        logger.info(f"PlantNet API response headers: {dict(response.headers)}")
-
         if response.status_code != 200:
             logger.error(f"PlantNet API error response: {response.text}")
-            logger.error(f"Request URL: {response.url}")
-            logger.error(f"Request headers: {dict(response.request.headers)}")
+        if response.status_code == 429:
+            # The daily quota is exhausted
+            update_from_plantnet_response(limiter, {"remainingIdentificationRequests": 0})
 
         response.raise_for_status()
         data = response.json()
+        update_from_plantnet_response(limiter, data)
 
-        logger.info(f"PlantNet API response received successfully")
         logger.info(f"Number of results: {len(data.get('results', []))}")
 
     except requests.exceptions.RequestException as e:
-        logger.error(f"PlantNet API request failed: {e}")
-        if hasattr(e, "response") and e.response is not None:
-            logger.error(f"Error response status: {e.response.status_code}")
-            logger.error(f"Error response text: {e.response.text}")
+        # The exception message would include the URL and its api-key parameter
+        logger.error(f"PlantNet API request failed: {type(e).__name__}")
         raise
 
+    result = _parse_identification(data)
+    if cache is not None:
+        cache.set(cache_key, result)
+
+    return result
+
+
+def _parse_identification(data: Dict[str, Any]) -> Dict[str, Any]:
     results = data.get("results") or []
     if not results:
         logger.warning("No plant identification results returned from PlantNet API")
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import shutil
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from herbabot.config import PR_BATCH_MAX_ENTRIES, PR_BATCH_WINDOW_SECONDS
+from herbabot.executor import run_blocking
+from herbabot.github_pr import create_plant_pr
+from herbabot.workspace import JobWorkspace, job_workspace
+
+logger = logging.getLogger(__name__)
+
+PublishCallback = Callable[[JobWorkspace, list[dict[str, Any]]], str | None]
+NotifyCallback = Callable[[str | None], Awaitable[None]]
+
+
+@dataclass
+class _PendingEntry:
+    plant_info: dict[str, Any]
+    notify: NotifyCallback
+
+
+class PRBatcher:
+    """
+    Coalesces the entries of several jobs into a single branch, commit and pull request.
+
+    A batch is published when it holds ``max_entries`` entries, ``window_seconds`` after its
+    first entry was added, or when ``flush`` is called explicitly (the ``/flush`` command).
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        max_entries: int,
+        publish: PublishCallback = create_plant_pr,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.publish = publish
+        self._pending: list[_PendingEntry] = []
+        self._workspace: JobWorkspace | None = None
+        self._workspace_stack = ExitStack()
+        self._timer: asyncio.Task[None] | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def add(self, workspace: JobWorkspace, plant_info: dict[str, Any], notify: NotifyCallback) -> int:
+        """
+        Add the entry files of a job to the current batch.
+
+        The files are copied out of the job workspace, which can be removed as soon as this
+        returns. ``notify`` is awaited with the pull request URL (or None on failure) once the
+        batch is published.
+
+        Returns:
+            The number of entries waiting in the batch after this one was added, 0 if the
+            batch was published right away
+        """
+        async with self._lock:
+            if self._workspace is None:
+                self._workspace = self._workspace_stack.enter_context(job_workspace("batch"))
+
+            # The same species twice in a batch would overwrite the first entry, publish it first
+            collision = await run_blocking(
+                "render", _has_collision, workspace.entries_dir, self._workspace.entries_dir
+            )
+            if collision:
+                logger.info("Entry already present in the current batch, publishing the batch first")
+                await self._flush_locked()
+                self._workspace = self._workspace_stack.enter_context(job_workspace("batch"))
+
+            await run_blocking("render", _copy_entries, workspace.entries_dir, self._workspace.entries_dir)
+            self._pending.append(_PendingEntry(plant_info, notify))
+            logger.info(f"Entry {plant_info.get('latin_name')} added to batch ({len(self._pending)} pending)")
+
+            if len(self._pending) >= self.max_entries:
+                await self._flush_locked()
+            elif self._timer is None:
+                self._timer = asyncio.create_task(self._flush_after_window())
+
+            return len(self._pending)
+
+    async def flush(self) -> int:
+        """Publish the current batch now. Returns the number of published entries."""
+        async with self._lock:
+            return await self._flush_locked()
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window_seconds)
+        async with self._lock:
+            self._timer = None
+            await self._flush_locked()
+
+    async def _flush_locked(self) -> int:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+
+        pending, self._pending = self._pending, []
+        workspace, self._workspace = self._workspace, None
+        if not pending or workspace is None:
+            self._workspace_stack.close()
+            return 0
+
+        try:
+            logger.info(f"Publishing batch of {len(pending)} entries")
+            pr_url = await run_blocking("pr", self.publish, workspace, [entry.plant_info for entry in pending])
+        except Exception as e:
+            logger.error(f"Failed to publish batch: {e}")
+            pr_url = None
+        finally:
+            self._workspace_stack.close()
+
+        for entry in pending:
+            try:
+                await entry.notify(pr_url)
+            except Exception as e:
+                logger.error(f"Failed to notify about published batch: {e}")
+
+        return len(pending)
+
+
+def _has_collision(source_dir: Path, batch_dir: Path) -> bool:
+    return any((batch_dir / path.name).exists() for path in source_dir.glob("*.md"))
+
+
+def _copy_entries(source_dir: Path, batch_dir: Path) -> None:
+    for path in source_dir.iterdir():
+        if path.is_file():
+            shutil.copy2(path, batch_dir / path.name)
+
+
+_batcher: PRBatcher | None = None
+
+
+def get_pr_batcher() -> PRBatcher | None:
+    """Return the shared batcher, or None when batching is disabled (``PR_BATCH_WINDOW_SECONDS=0``)."""
+    global _batcher
+    if PR_BATCH_WINDOW_SECONDS <= 0:
+        return None
+    if _batcher is None:
+        _batcher = PRBatcher(PR_BATCH_WINDOW_SECONDS, PR_BATCH_MAX_ENTRIES)
+    return _batcher
@@ -0,0 +1,251 @@
+import functools
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Mapping
+
+from herbabot.config import (
+    GITHUB_PUSHES_PER_MINUTE,
+    GITHUB_REQUESTS_PER_HOUR,
+    OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_TOKENS_PER_MINUTE,
+    PLANTNET_DAILY_QUOTA,
+    RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+from herbabot.metrics import RATE_LIMIT_BUDGET, RATE_LIMIT_DEFERRALS, RATE_LIMIT_WAIT, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Budgets of each upstream: bucket name, calls (or tokens) allowed and the period they are allowed over
+UPSTREAM_LIMITS: dict[str, list[tuple[str, int, float]]] = {
+    "plantnet": [("identifications", PLANTNET_DAILY_QUOTA, 24 * 3600)],
+    "openai": [("requests", OPENAI_REQUESTS_PER_MINUTE, 60), ("tokens", OPENAI_TOKENS_PER_MINUTE, 60)],
+    "github": [("requests", GITHUB_REQUESTS_PER_HOUR, 3600), ("pushes", GITHUB_PUSHES_PER_MINUTE, 60)],
+}
+
+# Durations of the OpenAI reset headers, such as "20ms", "6m0s" or "1h2m3.5s"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class RateLimitedError(Exception):
+    """Raised instead of calling an upstream whose budget would take more than the allowed wait to refill."""
+
+    def __init__(self, upstream: str, retry_after: float) -> None:
+        super().__init__(f"{upstream} rate limit reached, next call possible in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Budget of calls (or tokens) refilled continuously at ``capacity / period`` per second.
+
+    Calls take their tokens when they are scheduled, so the budget goes negative while calls
+    are queued and each new call waits behind the ones before it. The upstream can report its
+    own remaining budget, which lowers ours, and stop the refill until its window resets when
+    it is exhausted. Not thread-safe, ``RateLimiter`` serializes the access.
+    """
+
+    def __init__(self, capacity: float, period: float, now: float) -> None:
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = capacity
+        self._updated_at = now
+        # While the upstream reports an exhausted budget, nothing refills until its window resets
+        self._paused_until = 0.0
+
+    def budget(self, now: float) -> float:
+        """Tokens available at ``now``, negative when calls are queued."""
+        self._refill(now)
+        return self._tokens
+
+    def wait_time(self, tokens: float, now: float) -> float:
+        """Seconds until ``tokens`` tokens are available."""
+        self._refill(now)
+        tokens = min(tokens, self.capacity)
+        if self._tokens >= tokens:
+            return 0.0
+        if now < self._paused_until:
+            after_reset = min(self.capacity, self._tokens + self.capacity)
+            return self._paused_until - now + max(tokens - after_reset, 0) / self.rate
+        return (tokens - self._tokens) / self.rate
+
+    def take(self, tokens: float, now: float) -> None:
+        self._refill(now)
+        self._tokens -= min(tokens, self.capacity)
+
+    def update(self, remaining: float, reset_after: float | None, now: float) -> None:
+        """Apply the remaining budget reported by the upstream, whose window resets in ``reset_after`` seconds."""
+        self._refill(now)
+        self._tokens = min(self._tokens, remaining)
+        if remaining < 1 and reset_after is not None:
+            self._paused_until = max(self._paused_until, now + reset_after)
+
+    def _refill(self, now: float) -> None:
+        if self._paused_until:
+            if now < self._paused_until:
+                self._updated_at = now
+                return
+            # The upstream window reset: its whole budget is available again, minus the queued calls
+            self._tokens = min(self.capacity, self._tokens + self.capacity)
+            self._updated_at = self._paused_until
+            self._paused_until = 0.0
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = max(self._updated_at, now)
+
+
+class RateLimiter:
+    """
+    Schedules the calls to one upstream within its budgets, one ``TokenBucket`` per limit.
+
+    ``acquire`` blocks the calling thread until every bucket has the tokens of the call,
+    which queues bursts of calls instead of letting the upstream reject them. Calls that
+    would wait longer than ``max_wait_seconds`` raise ``RateLimitedError`` right away,
+    without taking any token, so the job can be retried once the budget refilled.
+    """
+
+    def __init__(
+        self,
+        upstream: str,
+        limits: list[tuple[str, int, float]],
+        max_wait_seconds: float = RATE_LIMIT_MAX_WAIT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.upstream = upstream
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        now = clock()
+        self._buckets = {name: TokenBucket(limit, period, now) for name, limit, period in limits if limit > 0}
+
+    def acquire(self, **costs: float) -> float:
+        """
+        Wait until the call can be made, e.g. ``acquire(requests=1, tokens=1200)``.
+
+        Costs of buckets without a limit are ignored.
+
+        Returns:
+            Seconds waited
+
+        Raises:
+            RateLimitedError: If the call would have to wait longer than ``max_wait_seconds``
+        """
+        with self._lock:
+            now = self._clock()
+            wait = self._wait_time(costs, now)
+            if wait > self.max_wait_seconds:
+                RATE_LIMIT_DEFERRALS.inc(upstream=self.upstream)
+                raise RateLimitedError(self.upstream, wait)
+            for name, tokens in costs.items():
+                if name in self._buckets:
+                    self._buckets[name].take(tokens, now)
+
+        if wait > 0:
+            logger.info(f"Waiting {wait:.1f}s for the {self.upstream} rate limit")
+            self._sleep(wait)
+        return wait
+
+    def update(self, bucket: str, remaining: float, reset_after: float | None = None) -> None:
+        """Lower the budget of ``bucket`` to the ``remaining`` budget reported by the upstream."""
+        with self._lock:
+            if bucket in self._buckets:
+                self._buckets[bucket].update(remaining, reset_after, self._clock())
+        if remaining < 1:
+            logger.warning(
+                f"{self.upstream} {bucket} budget exhausted"
+                + (f", resets in {reset_after:.0f}s" if reset_after is not None else "")
+            )
+
+    def budget(self) -> dict[str, float]:
+        """Tokens currently available in each bucket, negative when calls are queued."""
+        with self._lock:
+            now = self._clock()
+            return {name: bucket.budget(now) for name, bucket in self._buckets.items()}
+
+    def wait_time(self, **costs: float) -> float:
+        """Seconds a call costing ``costs`` would wait now, one token of every bucket by default."""
+        with self._lock:
+            return self._wait_time(costs or {name: 1 for name in self._buckets}, self._clock())
+
+    def _wait_time(self, costs: Mapping[str, float], now: float) -> float:
+        return max(
+            (self._buckets[name].wait_time(tokens, now) for name, tokens in costs.items() if name in self._buckets),
+            default=0.0,
+        )
+
+
+_limiters: dict[str, RateLimiter | None] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(upstream: str) -> RateLimiter | None:
+    """Return the shared rate limiter of an upstream (``"plantnet"``, ``"openai"``, ``"github"``), None without limits."""
+    with _limiters_lock:
+        if upstream not in _limiters:
+            limits = [limit for limit in UPSTREAM_LIMITS.get(upstream, []) if limit[1] > 0]
+            limiter = RateLimiter(upstream, limits) if limits else None
+            _limiters[upstream] = limiter
+            if limiter is not None:
+                REGISTRY.add_collector(functools.partial(_collect_budget, limiter))
+        return _limiters[upstream]
+
+
+def _collect_budget(limiter: RateLimiter) -> None:
+    for name, budget in limiter.budget().items():
+        RATE_LIMIT_BUDGET.set(budget, upstream=limiter.upstream, bucket=name)
+        RATE_LIMIT_WAIT.set(limiter.wait_time(**{name: 1}), upstream=limiter.upstream, bucket=name)
+
+
+def update_from_github_headers(limiter: RateLimiter | None, headers: Mapping[str, str]) -> None:
+    """Apply the ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset`` (epoch seconds) headers of a GitHub response."""
+    remaining = headers.get("x-ratelimit-remaining")
+    if limiter is None or remaining is None:
+        return
+    reset = headers.get("x-ratelimit-reset")
+    try:
+        reset_after = max(float(reset) - time.time(), 0) if reset else None
+        limiter.update("requests", float(remaining), reset_after)
+    except ValueError:
+        logger.debug(f"Ignoring malformed GitHub rate limit headers: {remaining}, {reset}")
+
+
+def update_from_openai_headers(limiter: RateLimiter | None, headers: Mapping[str, str]) -> None:
+    """Apply the ``x-ratelimit-remaining-*`` and ``x-ratelimit-reset-*`` headers of an OpenAI response."""
+    if limiter is None:
+        return
+    for bucket in ("requests", "tokens"):
+        remaining = headers.get(f"x-ratelimit-remaining-{bucket}")
+        if remaining is None:
+            continue
+        try:
+            limiter.update(bucket, float(remaining), parse_duration(headers.get(f"x-ratelimit-reset-{bucket}", "")))
+        except ValueError:
+            logger.debug(f"Ignoring malformed OpenAI rate limit header: {remaining}")
+
+
+def update_from_plantnet_response(limiter: RateLimiter | None, data: Mapping[str, object]) -> None:
+    """Apply the ``remainingIdentificationRequests`` of a Pl@ntNet response; the quota resets at midnight UTC."""
+    remaining = data.get("remainingIdentificationRequests")
+    if limiter is None or not isinstance(remaining, (int, float)):
+        return
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+    limiter.update("identifications", remaining, (midnight - now).total_seconds())
+
+
+def parse_duration(text: str) -> float | None:
+    """Seconds of a duration such as ``"6m0s"``, None when it cannot be parsed."""
+    parts = _DURATION_PART.findall(text)
+    if not parts or "".join(value + unit for value, unit in parts) != text.strip():
+        return None
+    return sum(float(value) * _DURATION_UNITS[unit] for value, unit in parts)
+
+
+def estimate_tokens(text: str, max_completion_tokens: int) -> int:
+    """Tokens a chat completion may count against the budget: about 4 characters per prompt token, plus the completion."""
+    return len(text) // 4 + max_completion_tokens
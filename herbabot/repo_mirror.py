@@ -0,0 +1,214 @@
+import base64
+import logging
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from herbabot.metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+_mirror_lock = threading.Lock()
+_last_sync: dict[Path, float] = {}
+
+
+def remote_url(repo_url: str) -> str:
+    """Return the HTTPS URL of the repository, without any credentials, to record as the mirror's remote."""
+    if repo_url.startswith("git@github.com:"):
+        # Convert SSH URL to HTTPS, authenticated by git_auth_env
+        return f"https://github.com/{repo_url.removeprefix('git@github.com:')}"
+    return repo_url
+
+
+def git_auth_env(github_token: str, env: dict[str, str] | None = None) -> dict[str, str]:
+    """
+    Return the environment authenticating git against GitHub with ``github_token``.
+
+    The token is passed as an extra HTTP header through ``GIT_CONFIG_*`` variables, so it is
+    neither written to the mirror's config nor visible in the command line of git.
+    """
+    credentials = base64.b64encode(f"x-access-token:{github_token}".encode()).decode("ascii")
+    return {
+        **(env if env is not None else os.environ),
+        "GIT_CONFIG_COUNT": "1",
+        "GIT_CONFIG_KEY_0": "http.extraHeader",
+        "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+    }
+
+
+def _run_git(args: list[str], cwd: Path | None = None, env: dict[str, str] | None = None, stdin: str = "") -> str:
+    result = subprocess.run(
+        ["git", *args],
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        env=env,
+        input=stdin,
+    )
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to run git {args[0]}: {result.stderr}")
+
+    return result.stdout.strip()
+
+
+def sync_mirror(mirror_path: Path, repo_url: str, github_token: str, max_age_seconds: float = 0) -> None:
+    """
+    Bring the local bare mirror of the portfolio repository up to date.
+
+    The first call clones the repository; later calls only fetch the objects that changed
+    since the previous sync. Syncs are serialized so concurrent jobs share one fetch at a time.
+
+    Args:
+        mirror_path: Location of the bare mirror on disk
+        repo_url: URL of the portfolio repository
+        github_token: Token used to authenticate against GitHub
+        max_age_seconds: Skip the fetch when the mirror was synced less than this long ago
+    """
+    url = remote_url(repo_url)
+    env = git_auth_env(github_token)
+
+    with _mirror_lock:
+        last_sync = _last_sync.get(mirror_path)
+        if (
+            last_sync is not None
+            and time.monotonic() - last_sync < max_age_seconds
+            and (mirror_path / "HEAD").exists()
+        ):
+            logger.debug(f"Repository mirror {mirror_path} synced recently, skipping fetch")
+            return
+
+        if not (mirror_path / "HEAD").exists():
+            logger.info(f"Creating repository mirror at {mirror_path}")
+            mirror_path.parent.mkdir(parents=True, exist_ok=True)
+            with time_stage("git_clone"):
+                _run_git(["clone", "--bare", url, str(mirror_path)], env=env)
+            logger.info("Repository mirror created successfully")
+        else:
+            logger.info(f"Fetching updates into repository mirror {mirror_path}")
+            # Also drops the token that mirrors created by earlier versions kept in their remote URL
+            _run_git(["remote", "set-url", "origin", url], cwd=mirror_path)
+            with time_stage("git_fetch"):
+                _run_git(["fetch", "--prune", "origin", "+refs/heads/*:refs/heads/*"], cwd=mirror_path, env=env)
+            logger.info("Repository mirror is up to date")
+
+        _last_sync[mirror_path] = time.monotonic()
+
+
+def commit_files(
+    mirror_path: Path,
+    files: dict[str, Path],
+    commit_message: str,
+    branch_name: str,
+    base_branch: str,
+    index_path: Path,
+    github_token: str = "",
+) -> str:
+    """
+    Commit files on a new branch straight from the mirror's object database and push it.
+
+    No working tree is checked out: the files are hashed into the object database, staged in
+    a private index on top of ``base_branch`` and committed, so only the new objects are pushed.
+
+    Args:
+        mirror_path: Location of the bare mirror on disk
+        files: Mapping of repository paths to the local files to commit
+        commit_message: Message of the commit
+        branch_name: Name of the branch to create on the remote
+        base_branch: Branch the new commit is based on
+        index_path: Private index file for this commit, usually ``JobWorkspace.git_index``
+        github_token: Token used to authenticate the push against GitHub
+
+    Returns:
+        SHA of the pushed commit
+    """
+    logger.info(f"Committing {len(files)} files on branch {branch_name}")
+    env = {**os.environ, "GIT_INDEX_FILE": str(index_path)}
+
+    base_commit = _run_git(["rev-parse", f"refs/heads/{base_branch}^{{commit}}"], cwd=mirror_path)
+    _run_git(["read-tree", base_commit], cwd=mirror_path, env=env)
+
+    repo_paths = list(files)
+    blob_shas = _run_git(
+        ["hash-object", "-w", "--stdin-paths"],
+        cwd=mirror_path,
+        stdin="\n".join(str(files[path].resolve()) for path in repo_paths) + "\n",
+    ).splitlines()
+    index_info = "".join(f"100644 {sha}\t{path}\n" for sha, path in zip(blob_shas, repo_paths))
+    _run_git(["update-index", "--index-info"], cwd=mirror_path, env=env, stdin=index_info)
+
+    tree = _run_git(["write-tree"], cwd=mirror_path, env=env)
+    commit = _run_git(["commit-tree", tree, "-p", base_commit, "-m", commit_message], cwd=mirror_path)
+
+    with time_stage("git_push"):
+        _run_git(
+            ["push", "origin", f"{commit}:refs/heads/{branch_name}"],
+            cwd=mirror_path,
+            env=git_auth_env(github_token),
+        )
+    logger.info(f"Commit {commit[:8]} pushed to {branch_name}")
+
+    return commit
+
+
+def resolve_ref(mirror_path: Path, ref: str) -> str | None:
+    """Return the commit SHA ``ref`` points to in the mirror, or None when it does not exist."""
+    result = subprocess.run(
+        ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+        capture_output=True,
+        text=True,
+        cwd=mirror_path,
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def list_files(mirror_path: Path, ref: str, directory: str) -> dict[str, str]:
+    """Map the repository paths of the files under ``directory`` at ``ref`` to their blob SHAs."""
+    output = _run_git(["ls-tree", "-r", "-z", ref, "--", directory], cwd=mirror_path)
+    files: dict[str, str] = {}
+    for record in filter(None, output.split("\0")):
+        info, path = record.split("\t", 1)
+        _, kind, sha = info.split()
+        if kind == "blob":
+            files[path] = sha
+    return files
+
+
+def read_objects(mirror_path: Path, names: list[str]) -> dict[str, bytes]:
+    """
+    Read the content of several blobs from the mirror with a single ``git cat-file`` process.
+
+    Args:
+        mirror_path: Location of the bare mirror on disk
+        names: Blob SHAs or ``<ref>:<path>`` names
+
+    Returns:
+        Content of each name found in the mirror; missing objects are left out
+    """
+    if not names:
+        return {}
+    result = subprocess.run(
+        ["git", "cat-file", "--batch"],
+        capture_output=True,
+        cwd=mirror_path,
+        input="".join(f"{name}\n" for name in names).encode(),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to run git cat-file: {result.stderr.decode(errors='replace')}")
+
+    contents: dict[str, bytes] = {}
+    output = result.stdout
+    position = 0
+    for name in names:
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].split()
+        position = header_end + 1
+        if len(header) != 3:
+            # "<name> missing" or "<name> ambiguous"
+            continue
+        size = int(header[2])
+        contents[name] = output[position : position + size]
+        position += size + 1
+    return contents
@@ -0,0 +1,159 @@
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from herbabot.config import SPECIES_INDEX_PATH
+from herbabot.plant_entry import ENTRIES_DIR, parse_front_matter
+from herbabot.repo_mirror import list_files, read_objects, resolve_ref
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SpeciesEntry:
+    """A plant entry of the portfolio, as described by its front matter."""
+
+    path: str
+    scientific_name: str | None
+    name: str | None
+    date: str | None
+    latitude: float | None
+    longitude: float | None
+
+
+def species_key(scientific_name: str) -> str:
+    """Normalized scientific name used to match entries of the same species."""
+    return " ".join(scientific_name.lower().split())
+
+
+class SpeciesIndex:
+    """
+    Local SQLite index of the plant entries of the portfolio repository.
+
+    The index records the species, date and coordinates of every ``src/data/plants/*.md``
+    entry of a branch of the repository mirror. ``refresh`` updates it incrementally: it
+    does nothing when the branch did not move, and otherwise only reads the entries whose
+    blob changed since the previous refresh.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                blob TEXT NOT NULL,
+                species TEXT,
+                scientific_name TEXT,
+                name TEXT,
+                date TEXT,
+                latitude REAL,
+                longitude REAL
+            )
+            """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_species ON entries (species)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def refresh(self, mirror_path: Path, branch: str) -> int:
+        """
+        Bring the index in line with ``branch`` of the repository mirror.
+
+        Returns:
+            Number of entries added, changed or removed
+        """
+        ref = f"refs/heads/{branch}"
+        commit = resolve_ref(mirror_path, ref)
+        if commit is None:
+            logger.warning(
+                f"Branch {branch} not found in repository mirror {mirror_path}, species index not refreshed"
+            )
+            return 0
+
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'commit'").fetchone()
+            if row is not None and row[0] == commit:
+                return 0
+
+            files = {
+                path: blob
+                for path, blob in list_files(mirror_path, commit, ENTRIES_DIR).items()
+                if path.endswith(".md")
+            }
+            indexed = dict(self._conn.execute("SELECT path, blob FROM entries").fetchall())
+            changed = {path: blob for path, blob in files.items() if indexed.get(path) != blob}
+            removed = [path for path in indexed if path not in files]
+
+            contents = read_objects(mirror_path, sorted(set(changed.values())))
+            for path, blob in changed.items():
+                front_matter = parse_front_matter(contents.get(blob, b"").decode("utf-8", errors="replace"))
+                scientific_name = front_matter.get("scientificName")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(path, blob, species, scientific_name, name, date, latitude, longitude) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        path,
+                        blob,
+                        species_key(scientific_name) if scientific_name else None,
+                        scientific_name,
+                        front_matter.get("name"),
+                        front_matter.get("date"),
+                        _coordinate(front_matter.get("latitude")),
+                        _coordinate(front_matter.get("longitude")),
+                    ),
+                )
+            self._conn.executemany("DELETE FROM entries WHERE path = ?", [(path,) for path in removed])
+            self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('commit', ?)", (commit,))
+            self._conn.commit()
+
+        logger.info(f"Species index refreshed at {commit[:8]}: {len(changed)} entries read, {len(removed)} removed")
+        return len(changed) + len(removed)
+
+    def find(self, scientific_name: str, path: str | None = None) -> list[SpeciesEntry]:
+        """Return the entries of a species, plus the entry at ``path`` whatever its species, by path."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, scientific_name, name, date, latitude, longitude FROM entries "
+                "WHERE species = ? OR path = ? ORDER BY path",
+                (species_key(scientific_name), path),
+            ).fetchall()
+        return [SpeciesEntry(*row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _coordinate(value: str | None) -> float | None:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+_index: SpeciesIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_species_index() -> SpeciesIndex | None:
+    """Return the shared species index, or None when it is disabled (empty ``SPECIES_INDEX_PATH``)."""
+    global _index
+    if not SPECIES_INDEX_PATH:
+        return None
+
+    with _index_lock:
+        if _index is None:
+            _index = SpeciesIndex(Path(SPECIES_INDEX_PATH))
+        return _index
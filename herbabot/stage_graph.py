@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageNode:
+    """A step of a job, run once all the steps named in ``after`` completed."""
+
+    name: str
+    run: Callable[[], Awaitable[Any]]
+    after: tuple[str, ...] = ()
+
+
+@dataclass
+class StageTiming:
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class StageFailedError(Exception):
+    """Raised by ``run_stage_graph`` with the name of the step whose failure stopped the graph."""
+
+    def __init__(self, stage: str, error: Exception) -> None:
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+@dataclass
+class StageGraphResult:
+    """Results and timings (relative to the start of the graph) of every step."""
+
+    results: dict[str, Any] = field(default_factory=dict)
+    timings: dict[str, StageTiming] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return max((timing.end for timing in self.timings.values()), default=0.0)
+
+    def critical_path(self, nodes: list[StageNode]) -> list[str]:
+        """
+        Return the chain of steps that determined the total duration.
+
+        Walks back from the step that finished last, each time through the dependency that
+        finished last, i.e. the one the step was waiting for.
+        """
+        after = {node.name: node.after for node in nodes}
+        timed = [name for name in after if name in self.timings]
+        if not timed:
+            return []
+
+        path = [max(timed, key=lambda name: self.timings[name].end)]
+        while True:
+            dependencies = [name for name in after[path[-1]] if name in self.timings]
+            if not dependencies:
+                break
+            path.append(max(dependencies, key=lambda name: self.timings[name].end))
+        return list(reversed(path))
+
+    def describe(self, nodes: list[StageNode]) -> str:
+        """Summarize the timings, critical path first, for the logs."""
+        path = self.critical_path(nodes)
+        summary = " → ".join(f"{name} {self.timings[name].duration:.2f}s" for name in path)
+        others = [f"{name} {timing.duration:.2f}s" for name, timing in self.timings.items() if name not in path]
+        if others:
+            summary += f" (in parallel: {', '.join(others)})"
+        return f"{self.total:.2f}s, critical path: {summary}"
+
+
+async def run_stage_graph(nodes: list[StageNode]) -> StageGraphResult:
+    """
+    Run the steps of a job concurrently, each as soon as its dependencies completed.
+
+    When a step fails, the steps depending on it are skipped while independent steps still
+    run to completion, so their work is not lost. The failure is then raised as a
+    ``StageFailedError`` naming the step that failed first in the graph.
+
+    Args:
+        nodes: Steps of the job, in a topological order
+
+    Returns:
+        The result and timings of every step
+    """
+    result = StageGraphResult()
+    tasks: dict[str, asyncio.Task[Any]] = {}
+    started = time.perf_counter()
+
+    async def run_node(node: StageNode) -> Any:
+        await asyncio.gather(*(tasks[name] for name in node.after))
+        node_started = time.perf_counter() - started
+        try:
+            return await node.run()
+        finally:
+            result.timings[node.name] = StageTiming(node_started, time.perf_counter() - started)
+
+    seen: set[str] = set()
+    for node in nodes:
+        unknown = [name for name in node.after if name not in seen]
+        if unknown:
+            raise ValueError(f"Step {node.name} depends on unknown or later steps: {', '.join(unknown)}")
+        seen.add(node.name)
+
+    for node in nodes:
+        tasks[node.name] = asyncio.create_task(run_node(node), name=f"stage-{node.name}")
+
+    try:
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    for node, outcome in zip(nodes, outcomes):
+        if isinstance(outcome, BaseException):
+            # Skipped steps re-raise the failure of their dependency; report the step that ran
+            if node.name in result.timings:
+                if not isinstance(outcome, Exception):
+                    raise outcome
+                raise StageFailedError(node.name, outcome) from outcome
+        else:
+            result.results[node.name] = outcome
+
+    return result
@@ -0,0 +1,42 @@
+import logging
+import threading
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from herbabot.config import TEMPLATE_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "templates"
+
+_environment: Environment | None = None
+_environment_lock = threading.Lock()
+
+
+def get_template_environment() -> Environment:
+    """
+    Return the shared Jinja2 environment of the ``templates`` directory.
+
+    Each template is read and compiled once per process and then kept in memory; templates
+    are not reloaded when they change on disk. The compiled bytecode is also stored in
+    ``TEMPLATE_CACHE_PATH``, so a restarted bot skips the compilation (disabled when empty).
+    """
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            bytecode_cache = None
+            if TEMPLATE_CACHE_PATH:
+                Path(TEMPLATE_CACHE_PATH).mkdir(parents=True, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_PATH)
+            _environment = Environment(
+                loader=FileSystemLoader(TEMPLATES_DIR),
+                bytecode_cache=bytecode_cache,
+                auto_reload=False,
+            )
+        return _environment
+
+
+def output_suffix(template_name: str) -> str:
+    """Suffix of the files rendered from a template, e.g. ``.json`` for ``plant_entry.json.j2``."""
+    return Path(template_name.removesuffix(".j2")).suffix
@@ -0,0 +1,148 @@
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+import signal
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable
+
+from telegram import Update
+from telegram.ext import Application
+
+from herbabot.config import (
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_BODY_BYTES,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
+)
+from herbabot.http_server import HTTPResponse, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+UpdateCallback = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class WebhookServer(HTTPServer):
+    """
+    Minimal asyncio HTTP/1.1 server receiving Telegram webhook updates.
+
+    Only ``POST`` requests to ``path`` carrying the secret token are accepted; their JSON
+    body is handed to ``on_update``, and bodies it cannot decode as an update are answered
+    with 400. Connections are kept alive, as Telegram reuses them between updates.
+    """
+
+    name = "Webhook"
+
+    def __init__(
+        self,
+        listen: str,
+        port: int,
+        path: str,
+        secret_token: str,
+        on_update: UpdateCallback,
+        max_body_bytes: int = 1024 * 1024,
+    ) -> None:
+        if not secret_token:
+            # Anyone could post forged updates, passing as an allowed user
+            raise ValueError("The webhook server needs a secret token")
+        super().__init__(listen, port, max_body_bytes)
+        self.path = path
+        self.secret_token = secret_token
+        self.on_update = on_update
+
+    async def dispatch(self, method: str, path: str, headers: dict[str, str], body: bytes) -> HTTPResponse:
+        if path != self.path:
+            return HTTPResponse(HTTPStatus.NOT_FOUND)
+        if method != "POST":
+            return HTTPResponse(HTTPStatus.METHOD_NOT_ALLOWED)
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, ""), self.secret_token):
+            logger.warning("Webhook request rejected: invalid secret token")
+            return HTTPResponse(HTTPStatus.FORBIDDEN)
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return HTTPResponse(HTTPStatus.BAD_REQUEST)
+        if not isinstance(data, dict):
+            return HTTPResponse(HTTPStatus.BAD_REQUEST)
+
+        try:
+            await self.on_update(data)
+        except Exception as e:
+            logger.warning(f"Webhook request rejected: invalid update ({type(e).__name__}: {e})")
+            return HTTPResponse(HTTPStatus.BAD_REQUEST)
+        return HTTPResponse(HTTPStatus.OK)
+
+
+def update_queue_feeder(app: Application) -> UpdateCallback:
+    """Return a callback that decodes webhook payloads and queues them for the application's handlers."""
+
+    async def feed(data: dict[str, Any]) -> None:
+        update = Update.de_json(data, app.bot)
+        await app.update_queue.put(update)
+
+    return feed
+
+
+async def run_webhook(app: Application) -> None:
+    """
+    Run the application behind the built-in webhook server until SIGINT or SIGTERM.
+
+    This is the webhook counterpart of ``Application.run_polling``: the post init, post
+    stop and post shutdown hooks run as they would there. The webhook is registered with
+    Telegram only when ``WEBHOOK_URL`` is set, so that several instances behind a load
+    balancer can share a single registration.
+
+    Without ``WEBHOOK_SECRET_TOKEN``, the instance registering the webhook generates a
+    random secret token for it; instances that do not register it refuse to start.
+    """
+    secret_token = WEBHOOK_SECRET_TOKEN
+    if not secret_token:
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_SECRET_TOKEN must be set when the webhook is registered by another instance")
+        secret_token = secrets.token_urlsafe(32)
+        logger.info("WEBHOOK_SECRET_TOKEN is not set, registering the webhook with a random secret token")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = WebhookServer(
+        WEBHOOK_LISTEN,
+        WEBHOOK_PORT,
+        WEBHOOK_PATH,
+        secret_token,
+        update_queue_feeder(app),
+        WEBHOOK_MAX_BODY_BYTES,
+    )
+
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=WEBHOOK_URL,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info(f"Webhook registered at {WEBHOOK_URL}")
+
+        await app.start()
+        await server.start()
+        await stop.wait()
+    finally:
+        await server.stop()
+        if app.running:
+            await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import logging
+import signal
+
+from telegram import Bot
+
+from herbabot.config import JOB_WORKERS, TELEGRAM_BOT_TOKEN, get_logging_level
+from herbabot.executor import shutdown_executor
+from herbabot.http_clients import close_http_clients
+from herbabot.job_queue import get_job_queue
+from herbabot.metrics import start_metrics_server, stop_metrics_server
+from herbabot.pipeline import JobWorkers
+from herbabot.pr_batcher import get_pr_batcher
+
+logging.basicConfig(level=get_logging_level())
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(concurrency: int, poll_interval: float, metrics_port: int = 0) -> None:
+    """Run jobs from the shared queue until SIGINT or SIGTERM."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await start_metrics_server(metrics_port)
+    async with Bot(TELEGRAM_BOT_TOKEN) as bot:
+        workers = JobWorkers(bot, get_job_queue(), concurrency, poll_interval)
+        workers.start()
+        try:
+            await stop.wait()
+        finally:
+            await workers.stop()
+            # Publish entries still waiting for their batch in this process
+            batcher = get_pr_batcher()
+            if batcher:
+                await batcher.flush()
+            await stop_metrics_server()
+            shutdown_executor()
+            close_http_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m herbabot.worker",
+        description="Run photo-to-PR jobs enqueued by the bot. Start as many worker processes as needed.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=max(JOB_WORKERS, 1),
+        help="jobs processed at the same time by this process (default: JOB_WORKERS)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="seconds between queue checks while idle (default: 1)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=0,
+        help="port serving /metrics for this process, distinct from the bot's METRICS_PORT (default: 0, disabled)",
+    )
+    args = parser.parse_args()
+
+    print(f"🌿 Herbabot worker is running ({args.concurrency} concurrent jobs)...")
+    asyncio.run(run_worker(args.concurrency, args.poll_interval, args.metrics_port))
+
+
+if __name__ == "__main__":
+    main()
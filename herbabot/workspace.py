@@ -0,0 +1,94 @@
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from herbabot.config import WORKSPACE_ROOT
+
+logger = logging.getLogger(__name__)
+
+TMPFS_ROOT = Path("/dev/shm")
+
+
+@dataclass(frozen=True)
+class JobWorkspace:
+    """Private scratch directory of a single photo-to-PR job."""
+
+    job_id: str
+    root: Path
+
+    @property
+    def entries_dir(self) -> Path:
+        """Directory holding the rendered entry files (markdown and images) to publish."""
+        return self.root / "entries"
+
+    @property
+    def git_index(self) -> Path:
+        """Private git index used to stage this job's commit against the shared repository mirror."""
+        return self.root / "index"
+
+
+def get_workspace_root() -> Path:
+    """
+    Return the directory under which job workspaces are created.
+
+    ``WORKSPACE_ROOT`` wins when configured, otherwise tmpfs (``/dev/shm``) is used when
+    available so that the intermediate files never touch the disk.
+    """
+    if WORKSPACE_ROOT:
+        return Path(WORKSPACE_ROOT)
+    if TMPFS_ROOT.is_dir() and os.access(TMPFS_ROOT, os.W_OK):
+        return TMPFS_ROOT
+    return Path(tempfile.gettempdir())
+
+
+@contextmanager
+def job_workspace(job_id: str | None = None) -> Iterator[JobWorkspace]:
+    """
+    Create an isolated workspace for one job and remove it when the job is done.
+
+    Args:
+        job_id: Optional identifier of the job, a random one is generated otherwise
+
+    Yields:
+        The job workspace, deleted on exit even if the job failed
+    """
+    job_id = job_id or uuid.uuid4().hex[:12]
+    root = get_workspace_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    workspace = JobWorkspace(job_id=job_id, root=Path(tempfile.mkdtemp(prefix=f"herbabot-{job_id}-", dir=root)))
+    workspace.entries_dir.mkdir()
+    logger.debug(f"Created workspace {workspace.root} for job {job_id}")
+
+    try:
+        yield workspace
+    finally:
+        remove_workspace(workspace)
+
+
+def open_job_workspace(job_id: str, root: Path) -> JobWorkspace:
+    """
+    Return the persistent workspace of a queued job, creating it on first use.
+
+    Unlike ``job_workspace`` the directory survives restarts, so a resumed job still finds
+    the files rendered by its completed stages. It must be removed with ``remove_workspace``.
+    """
+    workspace = JobWorkspace(job_id=job_id, root=root / f"herbabot-{job_id}")
+    workspace.entries_dir.mkdir(parents=True, exist_ok=True)
+    return workspace
+
+
+def remove_workspace(workspace: JobWorkspace) -> None:
+    try:
+        shutil.rmtree(workspace.root)
+        logger.debug(f"Workspace {workspace.root} cleaned up")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Failed to clean up workspace {workspace.root}: {e}")
@@ -0,0 +1,23 @@
+import os
+from pathlib import Path
+
+import pytest
+
+# herbabot.config validates the environment at import time, so provide dummy values for tests.
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-telegram-token")
+os.environ.setdefault("PLANTNET_API_KEY", "test-plantnet-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("GITHUB_TOKEN", "test-github-token")
+os.environ.setdefault("GITHUB_REPO_URL", "https://github.com/example/portfolio.git")
+os.environ.setdefault("GITHUB_REPO_OWNER", "example")
+os.environ.setdefault("GITHUB_REPO_NAME", "portfolio")
+
+
+@pytest.fixture(autouse=True)
+def template_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Keep the template bytecode of every test out of the checkout."""
+    from herbabot import templating
+
+    monkeypatch.setattr(templating, "TEMPLATE_CACHE_PATH", str(tmp_path / "templates"))
+    monkeypatch.setattr(templating, "_environment", None)
+    return tmp_path / "templates"
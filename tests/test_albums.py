@@ -0,0 +1,61 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from herbabot.albums import AlbumCollector, AlbumPhoto
+
+
+def _photo(message_id: int, organ: str | None = None) -> AlbumPhoto:
+    message: Any = SimpleNamespace(message_id=message_id)
+    return AlbumPhoto(Path(f"{message_id}.jpg"), organ, message)
+
+
+def test_album_waits_for_all_downloads_and_keeps_message_order() -> None:
+    albums: list[list[AlbumPhoto]] = []
+
+    async def on_complete(photos: list[AlbumPhoto]) -> None:
+        albums.append(photos)
+
+    async def download(photo: AlbumPhoto | None, delay: float) -> AlbumPhoto | None:
+        await asyncio.sleep(delay)
+        return photo
+
+    async def scenario() -> None:
+        collector = AlbumCollector(window_seconds=0.05)
+        await asyncio.gather(
+            # The first photo takes longer to download than the window
+            collector.add("1:album", download(_photo(1, "leaf"), 0.2), on_complete),
+            collector.add("1:album", download(_photo(2, "flower"), 0.01), on_complete),
+            collector.add("1:album", download(None, 0.01), on_complete),
+            collector.add("1:other", download(_photo(9), 0.01), on_complete),
+        )
+        assert albums == [[_photo(9)]]
+        await asyncio.sleep(0.1)
+        assert collector.pending_count == 0
+
+    asyncio.run(scenario())
+
+    assert [[(photo.message.message_id, photo.organ) for photo in album] for album in albums] == [
+        [(9, None)],
+        [(1, "leaf"), (2, "flower")],
+    ]
+
+
+def test_flush_completes_albums_without_waiting() -> None:
+    albums: list[list[AlbumPhoto]] = []
+
+    async def on_complete(photos: list[AlbumPhoto]) -> None:
+        albums.append(photos)
+
+    async def ready(photo: AlbumPhoto) -> AlbumPhoto:
+        return photo
+
+    async def scenario() -> None:
+        collector = AlbumCollector(window_seconds=60)
+        await collector.add("1:album", ready(_photo(1)), on_complete)
+        await collector.flush()
+
+    asyncio.run(scenario())
+
+    assert len(albums) == 1
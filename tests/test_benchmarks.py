@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from benchmarks.run import Latencies, format_report, percentile, run_benchmark
+
+
+def test_percentile_interpolates_between_samples() -> None:
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 95) == 4.8
+
+
+def test_benchmark_runs_jobs_through_the_fake_services(tmp_path: Path) -> None:
+    results = run_benchmark(
+        tmp_path,
+        jobs=2,
+        levels=[2],
+        latencies=Latencies(0, 0, 0, 0, 0),
+        image_size=(64, 48),
+        timeout=60,
+    )
+
+    [result] = results
+    assert (result.done, result.failed) == (2, 0)
+    assert len(result.job_latency) == 2
+    for stage in ("download", "ingest_exif", "plantnet_api", "openai_api", "git_push", "github_pr_api"):
+        assert len(result.stages[stage]) >= 1, stage
+    assert "jobs/s" in format_report(results)
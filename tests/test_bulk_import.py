@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+import piexif
+import pytest
+from PIL import Image
+
+from herbabot import bulk_import
+from herbabot.bulk_import import BulkImport, find_photos
+from herbabot.executor import shutdown_executor
+from herbabot.photo_hashes import PhotoHashIndex
+
+SPECIES = {
+    "daisy": {"latin_name": "Bellis perennis", "common_name": "Daisy", "family": "Asteraceae", "score": 0.9},
+    "ivy": {"latin_name": "Hedera helix", "common_name": "Ivy", "family": "Araliaceae", "score": 0.8},
+}
+
+
+def _photo(path: Path, date_taken: bytes = b"2024:05:12 10:30:00") -> Path:
+    exif = piexif.dump({"Exif": {piexif.ExifIFD.DateTimeOriginal: date_taken}})
+    output = BytesIO()
+    Image.new("RGB", (64, 48), (40, 120, 40)).save(output, format="JPEG", exif=exif)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(output.getvalue())
+    return path
+
+
+@pytest.fixture
+def photos(tmp_path: Path) -> Path:
+    directory = tmp_path / "photos"
+    _photo(directory / "daisy-1.jpg")
+    _photo(directory / "may" / "daisy-2.JPG")
+    _photo(directory / "ivy.jpg")
+    _photo(directory / ".thumbnails" / "daisy-3.jpg")
+    (directory / "notes.txt").write_text("not a photo")
+    return directory
+
+
+@pytest.fixture
+def pulls(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    pulls: list[dict[str, Any]] = []
+
+    def publish(workspace: Any, plant_infos: list[dict[str, Any]]) -> str:
+        pulls.append(
+            {
+                "files": sorted(path.name for path in workspace.entries_dir.iterdir()),
+                "plants": sorted(info["latin_name"] for info in plant_infos),
+            }
+        )
+        return f"https://github.com/example/portfolio/pull/{len(pulls)}"
+
+    monkeypatch.setattr(bulk_import, "JOB_WORKSPACE_ROOT", str(tmp_path / "jobs"))
+    monkeypatch.setattr(bulk_import, "find_existing_entries", lambda scientific_name, stem: [])
+    monkeypatch.setattr(bulk_import, "generate_plant_description", lambda result: "A plant.")
+    monkeypatch.setattr(bulk_import, "create_plant_pr", publish)
+    monkeypatch.setattr(bulk_import, "get_photo_hash_index", lambda: None)
+    return pulls
+
+
+def _import(directory: Path, batch_size: int = 20, policy: str = "variant") -> tuple[Any, list[str]]:
+    async def run() -> tuple[Any, list[str]]:
+        importer = BulkImport(directory, concurrency=4, policy=policy)
+        summary = await importer.run()
+        return summary, await importer.publish(batch_size)
+
+    try:
+        return asyncio.run(run())
+    finally:
+        shutdown_executor()
+
+
+def test_photos_are_found_recursively_without_hidden_directories(photos: Path) -> None:
+    assert [path.relative_to(photos).as_posix() for path in find_photos(photos)] == [
+        "daisy-1.jpg",
+        "ivy.jpg",
+        "may/daisy-2.JPG",
+    ]
+
+
+def test_import_renders_entries_and_resumes(
+    photos: Path, pulls: list[dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    outcomes: dict[str, Any] = {"ivy": RuntimeError("Pl@ntNet is down")}
+
+    def identify(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+        name = images[0].source_path.stem.split("-")[0]
+        outcome = outcomes.pop(name, SPECIES[name])
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(bulk_import, "identify_ingested_specimen", identify)
+
+    summary, pr_urls = _import(photos)
+
+    assert (summary.photos, summary.rendered, summary.failed) == (3, 2, 1)
+    # The second daisy of the import becomes a dated variant instead of overwriting the first one
+    assert pulls == [
+        {
+            "files": [
+                "bellis-perennis-2024-05-12.jpg",
+                "bellis-perennis-2024-05-12.md",
+                "bellis-perennis.jpg",
+                "bellis-perennis.md",
+            ],
+            "plants": ["Bellis perennis", "Bellis perennis"],
+        }
+    ]
+    assert pr_urls == ["https://github.com/example/portfolio/pull/1"]
+
+    # Only the failed photo is processed again
+    summary, pr_urls = _import(photos)
+
+    assert (summary.rendered, summary.failed, summary.already_done) == (1, 0, 2)
+    assert pulls[1] == {"files": ["hedera-helix.jpg", "hedera-helix.md"], "plants": ["Hedera helix"]}
+    records = [json.loads(line) for line in (photos / ".herbabot-import.jsonl").read_text().splitlines()]
+    assert {record["file"]: record["status"] for record in records} == {
+        "daisy-1.jpg": "published",
+        "may/daisy-2.JPG": "published",
+        "ivy.jpg": "published",
+    }
+
+
+def test_burst_shots_are_imported_once(
+    photos: Path, pulls: list[dict[str, Any]], tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index = PhotoHashIndex(tmp_path / "photos.sqlite3")
+    monkeypatch.setattr(bulk_import, "get_photo_hash_index", lambda: index)
+    monkeypatch.setattr(bulk_import, "identify_ingested_specimen", lambda images, organs: SPECIES["daisy"])
+
+    # The test photos are identical, as frames of a burst would nearly be
+    summary, _ = _import(photos)
+
+    assert (summary.photos, summary.rendered, summary.skipped) == (3, 1, 2)
+    records = [json.loads(line) for line in (photos / ".herbabot-import.jsonl").read_text().splitlines()]
+    rendered = {record["file"] for record in records if record["status"] == "rendered"}
+    assert len(rendered) == 1
+    assert {record["duplicate_of"] for record in records if record["status"] == "skipped"} == rendered
+
+
+def test_observations_appended_to_a_photo_processed_again_are_kept(
+    photos: Path, pulls: list[dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _photo(photos / "may" / "daisy-2.JPG", b"2024:06:01 09:00:00")
+    monkeypatch.setattr(
+        bulk_import,
+        "identify_ingested_specimen",
+        lambda images, organs: SPECIES[images[0].source_path.stem.split("-")[0]],
+    )
+    monkeypatch.setattr(bulk_import, "create_plant_pr", lambda workspace, plant_infos: None)
+
+    summary, _ = _import(photos, policy="append")
+
+    assert (summary.rendered, summary.appended) == (2, 1)
+    (appended,) = [record for record in BulkImport(photos).manifest.records.values() if record["status"] == "appended"]
+    # The photo holding the entry is edited, so the next run processes it again
+    owner = photos / appended["into"]
+    os.utime(owner, ns=(owner.stat().st_atime_ns, owner.stat().st_mtime_ns + 1))
+
+    summary, _ = _import(photos, policy="append")
+
+    assert (summary.rendered, summary.appended, summary.already_done) == (1, 1, 1)
+    importer = BulkImport(photos)
+    (holder,) = [
+        file
+        for file, record in importer.manifest.records.items()
+        if record["status"] == "rendered" and record["species"] == appended["species"]
+    ]
+    entry_text = (importer.workspace(holder).entries_dir / "bellis-perennis.md").read_text()
+    assert "2024-05-12" in entry_text and "2024-06-01" in entry_text
+
+
+def test_photos_are_geocoded_in_one_lookup(
+    photos: Path, pulls: list[dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    lookups: list[int] = []
+
+    def locate_many(gps_data: list[Any]) -> list[dict[str, str]]:
+        lookups.append(len(gps_data))
+        return [{"locality": "Espoo", "country": "Finland"}] * len(gps_data)
+
+    monkeypatch.setattr(bulk_import, "locate_many", locate_many)
+    monkeypatch.setattr(bulk_import, "identify_ingested_specimen", lambda images, organs: SPECIES["ivy"])
+    monkeypatch.setattr(bulk_import, "create_plant_pr", lambda workspace, plant_infos: None)
+
+    summary, _ = _import(photos)
+
+    assert summary.rendered == 3
+    assert lookups == [3]
+    importer = BulkImport(photos)
+    entry = importer.manifest.records["ivy.jpg"]["entry"]
+    assert 'locality: "Espoo"' in (importer.workspace("ivy.jpg").entries_dir / Path(entry).name).read_text()
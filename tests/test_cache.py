@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from herbabot.cache import SQLiteCache, TieredCache
+from herbabot.plant_description import description_cache_key
+
+
+def test_cache_round_trip_and_persistence(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.sqlite3", "plantnet", ttl_seconds=60, max_entries=10)
+    assert cache.get("abc:") is None
+    cache.set("abc:", {"latin_name": "Taraxacum officinale", "score": 0.93})
+    assert cache.get("abc:") == {"latin_name": "Taraxacum officinale", "score": 0.93}
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+    cache.close()
+
+    reopened = SQLiteCache(tmp_path / "cache.sqlite3", "plantnet", ttl_seconds=60, max_entries=10)
+    assert reopened.get("abc:") == {"latin_name": "Taraxacum officinale", "score": 0.93}
+    assert SQLiteCache(tmp_path / "cache.sqlite3", "other", ttl_seconds=60, max_entries=10).get("abc:") is None
+
+
+def test_cache_expires_entries(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.sqlite3", "plantnet", ttl_seconds=0.05, max_entries=10)
+    cache.set("abc:", {"score": 0.5})
+    time.sleep(0.1)
+    assert cache.get("abc:") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = SQLiteCache(tmp_path / "cache.sqlite3", "plantnet", ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    assert cache.get("a") == 1
+    time.sleep(0.01)
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_tiered_cache_shares_in_flight_computation(tmp_path: Path) -> None:
+    cache = TieredCache(SQLiteCache(tmp_path / "cache.sqlite3", "descriptions", 60, 10), max_memory_entries=10)
+    calls = 0
+    release = threading.Event()
+
+    def compute() -> str:
+        nonlocal calls
+        calls += 1
+        release.wait(1)
+        return "A perennial herb."
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(cache.get_or_compute, "taraxacum", compute) for _ in range(4)]
+        time.sleep(0.05)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["A perennial herb."] * 4
+    assert calls == 1
+    assert TieredCache(cache.disk, max_memory_entries=10).get("taraxacum") == "A perennial herb."
+
+
+def test_tiered_cache_bounds_memory_and_skips_none() -> None:
+    cache = TieredCache(None, max_memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+    assert cache.get_or_compute("d", lambda: None) is None
+    assert cache.get("d") is None
+
+
+def test_description_cache_key_normalizes_names() -> None:
+    first = description_cache_key({"latin_name": "Taraxacum  officinale", "family": "Asteraceae"})
+    second = description_cache_key({"latin_name": "taraxacum officinale ", "family": "asteraceae"})
+    assert first == second
+    assert first != description_cache_key({"latin_name": "Bellis perennis", "family": "Asteraceae"})
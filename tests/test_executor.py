@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from herbabot.executor import STAGE_LIMITS, run_blocking, shutdown_executor
+
+
+def test_run_blocking_keeps_event_loop_responsive() -> None:
+    async def scenario() -> float:
+        blocking = asyncio.create_task(run_blocking("pr", time.sleep, 0.3))
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await blocking
+        return elapsed
+
+    try:
+        assert asyncio.run(scenario()) < 0.2
+    finally:
+        shutdown_executor()
+
+
+def test_run_blocking_respects_stage_limit() -> None:
+    limit = STAGE_LIMITS["identify"]
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def work() -> None:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    async def scenario() -> None:
+        await asyncio.gather(*(run_blocking("identify", work) for _ in range(limit * 3)))
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        shutdown_executor()
+
+    assert peak == limit
+
+
+def test_run_blocking_rejects_unknown_stage() -> None:
+    with pytest.raises(ValueError):
+        asyncio.run(run_blocking("unknown", time.sleep, 0))
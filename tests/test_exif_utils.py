@@ -0,0 +1,38 @@
+from io import BytesIO
+
+from PIL import Image
+
+from herbabot.exif_utils import encode_identification_image
+
+
+def _jpeg(size: tuple[int, int], orientation: int | None = None) -> bytes:
+    image = Image.new("RGB", size, (40, 120, 40))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    output = BytesIO()
+    image.save(output, format="JPEG", exif=exif.tobytes(), quality=90)
+    return output.getvalue()
+
+
+def test_identification_image_is_downscaled_and_upright() -> None:
+    original = _jpeg((4032, 3024), orientation=6)
+
+    with Image.open(BytesIO(original)) as image:
+        derivative = encode_identification_image(image, max_edge=1280, quality=80)
+
+    with Image.open(BytesIO(derivative)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (960, 1280)
+    assert len(derivative) < len(original)
+
+
+def test_png_is_converted_to_jpeg() -> None:
+    output = BytesIO()
+    Image.new("RGBA", (2000, 1000), (0, 0, 0, 0)).save(output, format="PNG")
+
+    with Image.open(output) as image:
+        derivative = encode_identification_image(image, max_edge=500, quality=80)
+
+    with Image.open(BytesIO(derivative)) as image:
+        assert (image.format, image.mode, image.size) == ("JPEG", "RGB", (500, 250))
@@ -0,0 +1,120 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from herbabot import geocoding
+from herbabot.geocoding import Gazetteer, build_gazetteer, haversine_km, locate_many
+from herbabot.plant_entry import create_plant_entry
+
+PLACES = [
+    # name, latitude, longitude, feature class, country, admin1
+    ("Helsinki", 60.16952, 24.93545, "P", "FI", "01"),
+    ("Espoo", 60.2052, 24.6522, "P", "FI", "01"),
+    ("Rovaniemi", 66.5, 25.71667, "P", "FI", "10"),
+    ("Paris", 48.85341, 2.3488, "P", "FR", "11"),
+    ("Suva", -18.14161, 178.44149, "P", "FJ", "01"),
+    ("Mont Blanc", 45.83259, 6.86516, "T", "FR", "84"),
+]
+
+
+def _write_dump(path: Path, places: list[tuple[str, float, float, str, str, str]]) -> None:
+    lines = []
+    for geonameid, (name, latitude, longitude, feature_class, country, admin1) in enumerate(places):
+        fields = [
+            str(geonameid),
+            name,
+            name,
+            "",
+            str(latitude),
+            str(longitude),
+            feature_class,
+            "PPL",
+            country,
+            "",
+            admin1,
+        ]
+        lines.append("\t".join(fields + ["", "", "", "1000", "", "10", "Europe/Helsinki", "2024-01-01"]))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.fixture
+def gazetteer(tmp_path: Path) -> Gazetteer:
+    _write_dump(tmp_path / "cities.txt", PLACES)
+    (tmp_path / "admin1.txt").write_text(
+        "FI.01\tUusimaa\tUusimaa\t830709\nFR.11\tÎle-de-France\tIle-de-France\t3012874\n"
+    )
+    (tmp_path / "countries.txt").write_text(
+        "#ISO\tISO3\tISO-Numeric\tfips\tCountry\n"
+        "FI\tFIN\t246\tFI\tFinland\nFR\tFRA\t250\tFR\tFrance\nFJ\tFJI\t242\tFJ\tFiji\n"
+    )
+    build_gazetteer(
+        tmp_path / "cities.txt", tmp_path / "gazetteer", tmp_path / "admin1.txt", tmp_path / "countries.txt"
+    )
+    return Gazetteer(tmp_path / "gazetteer")
+
+
+def test_lookup_names_the_nearest_place(gazetteer: Gazetteer) -> None:
+    helsinki, paris, lapland, fiji, ocean = gazetteer.lookup(
+        [60.18, 48.86, 66.4, -18.2, 0.0], [24.95, 2.35, 25.8, -179.9, -30.0], max_distance_km=200
+    )
+
+    assert len(gazetteer) == 5  # Mont Blanc is not a populated place
+    assert helsinki and paris and lapland and fiji
+    assert (helsinki.locality, helsinki.region, helsinki.country) == ("Helsinki", "Uusimaa", "Finland")
+    assert helsinki.distance_km < 2
+    assert (paris.locality, paris.region, paris.country) == ("Paris", "Île-de-France", "France")
+    # Regions missing from admin1CodesASCII.txt keep their code
+    assert (lapland.locality, lapland.region) == ("Rovaniemi", "10")
+    # Across the antimeridian
+    assert fiji.locality == "Suva"
+    assert ocean is None
+
+
+def test_lookup_matches_brute_force(tmp_path: Path) -> None:
+    rng = np.random.default_rng(7)
+    latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, 3000)))
+    longitudes = rng.uniform(-180, 180, 3000)
+    places = [(f"P{i}", lat, lon, "P", "XX", "01") for i, (lat, lon) in enumerate(zip(latitudes, longitudes))]
+    _write_dump(tmp_path / "cities.txt", places)
+    build_gazetteer(tmp_path / "cities.txt", tmp_path / "gazetteer")
+    gazetteer = Gazetteer(tmp_path / "gazetteer")
+
+    query_latitudes = rng.uniform(-90, 90, 500)
+    query_longitudes = rng.uniform(-180, 180, 500)
+    _, distances = gazetteer.nearest(query_latitudes, query_longitudes)
+
+    stored_latitudes = np.asarray(gazetteer.latitude)
+    stored_longitudes = np.asarray(gazetteer.longitude)
+    expected = [
+        haversine_km(lat, lon, stored_latitudes, stored_longitudes).min()
+        for lat, lon in zip(query_latitudes, query_longitudes)
+    ]
+    np.testing.assert_allclose(distances, expected)
+
+
+def test_locate_many_without_gazetteer_or_coordinates(gazetteer: Gazetteer, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(geocoding, "_gazetteer", gazetteer)
+    monkeypatch.setattr(geocoding, "_gazetteer_loaded", True)
+    places = locate_many([None, {"latitude": 60.2, "longitude": 24.66, "accuracy": None}])
+    assert places == [None, {"locality": "Espoo", "region": "Uusimaa", "country": "Finland"}]
+
+    monkeypatch.setattr(geocoding, "_gazetteer", None)
+    assert locate_many([{"latitude": 60.2, "longitude": 24.66}]) == [None]
+
+
+def test_plant_entry_records_the_place(tmp_path: Path) -> None:
+    image_path = tmp_path / "photo.jpg"
+    image_path.write_bytes(b"jpeg")
+    entry_path = create_plant_entry(
+        {"latin_name": "Bellis perennis", "common_name": "Daisy", "family": "Asteraceae"},
+        image_path,
+        tmp_path / "entries",
+        {"latitude": 60.17, "longitude": 24.94},
+        templates=["plant_entry.md.j2"],
+        place={"locality": "Helsinki", "region": "Uusimaa", "country": "Finland"},
+    )
+
+    assert entry_path is not None
+    text = entry_path.read_text()
+    assert 'locality: "Helsinki"\nregion: "Uusimaa"\ncountry: "Finland"' in text
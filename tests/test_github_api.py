@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+
+import pytest
+
+from herbabot.github_pr import create_pr_from_plant_entries
+from herbabot.workspace import job_workspace
+
+
+class FakeGitHub:
+    """In-memory stand-in for the Git Data and pulls endpoints of the GitHub REST API."""
+
+    def __init__(self) -> None:
+        self.objects: dict[str, dict[str, Any]] = {"base-tree": {"type": "tree", "tree": []}}
+        self.objects["base-commit"] = {"type": "commit", "tree": {"sha": "base-tree"}, "parents": []}
+        self.refs: dict[str, str] = {"refs/heads/main": "base-commit"}
+        self.pulls: list[dict[str, Any]] = []
+        self.requests: list[str] = []
+
+    def store(self, kind: str, payload: dict[str, Any]) -> str:
+        sha = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        self.objects[sha] = {"type": kind, **payload}
+        return sha
+
+    def handle(self, method: str, path: str, body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        self.requests.append(f"{method} {path}")
+        prefix = "/repos/example/portfolio"
+        route = path.removeprefix(prefix)
+
+        if method == "GET" and route.startswith("/git/ref/"):
+            ref = "refs/" + route.removeprefix("/git/ref/")
+            return 200, {"ref": ref, "object": {"sha": self.refs[ref]}}
+        if method == "GET" and route.startswith("/git/commits/"):
+            sha = route.removeprefix("/git/commits/")
+            return 200, {"sha": sha, **self.objects[sha]}
+        if method == "POST" and route == "/git/blobs":
+            return 201, {"sha": self.store("blob", body)}
+        if method == "POST" and route == "/git/trees":
+            return 201, {"sha": self.store("tree", body)}
+        if method == "POST" and route == "/git/commits":
+            payload = {"message": body["message"], "tree": {"sha": body["tree"]}, "parents": body["parents"]}
+            return 201, {"sha": self.store("commit", payload)}
+        if method == "POST" and route == "/git/refs":
+            self.refs[body["ref"]] = body["sha"]
+            return 201, {"ref": body["ref"], "object": {"sha": body["sha"]}}
+        if method == "POST" and route == "/pulls":
+            self.pulls.append(body)
+            return 201, {"html_url": f"https://github.com/example/portfolio/pull/{len(self.pulls)}"}
+        return 404, {"message": "Not Found"}
+
+
+@pytest.fixture
+def fake_github() -> Iterator[tuple[FakeGitHub, str]]:
+    github = FakeGitHub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else {}
+            status, payload = github.handle(self.command, self.path, body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = _respond
+        do_POST = _respond
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield github, f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_api_backend_commits_and_opens_pull_request(fake_github: tuple[FakeGitHub, str]) -> None:
+    github, api_url = fake_github
+
+    with job_workspace() as workspace:
+        (workspace.entries_dir / "taraxacum-officinale.md").write_text("---\nname: Dandelion\n---\n")
+        (workspace.entries_dir / "taraxacum-officinale.jpg").write_bytes(b"\xff\xd8 fake jpeg")
+
+        pr_url = create_pr_from_plant_entries(
+            workspace,
+            "https://github.com/example/portfolio.git",
+            "token",
+            "example",
+            "portfolio",
+            {"latin_name": "Taraxacum officinale", "score": 0.93},
+            commit_backend="api",
+            api_url=api_url,
+        )
+
+    assert pr_url == "https://github.com/example/portfolio/pull/1"
+
+    pull = github.pulls[0]
+    commit = github.objects[github.refs[f"refs/heads/{pull['head']}"]]
+    assert commit["parents"] == ["base-commit"]
+
+    tree = github.objects[commit["tree"]["sha"]]
+    assert tree["base_tree"] == "base-tree"
+    paths = {item["path"]: github.objects[item["sha"]] for item in tree["tree"]}
+    assert set(paths) == {"src/data/plants/taraxacum-officinale.md", "public/plants/taraxacum-officinale.jpg"}
+    image_blob = paths["public/plants/taraxacum-officinale.jpg"]
+    assert base64.b64decode(image_blob["content"]) == b"\xff\xd8 fake jpeg"
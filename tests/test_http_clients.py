@@ -0,0 +1,69 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from herbabot.http_clients import connection_stats, create_session
+from herbabot.metrics import HTTP_RETRIES
+
+
+def _serve(statuses: list[int]) -> tuple[ThreadingHTTPServer, list[int]]:
+    """Server answering each request with the next status of ``statuses``."""
+    served: list[int] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            status = statuses[len(served)]
+            served.append(status)
+            body = b"ok" if status == 200 else b"busy"
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_POST = do_GET
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, served
+
+
+def test_session_retries_transient_errors_over_one_connection() -> None:
+    server, served = _serve([503, 429, 200])
+    session = create_session(pool_size=1, max_retries=3, backoff_seconds=0.01, timeout=(1, 1), service="test")
+    try:
+        response = session.get(f"http://127.0.0.1:{server.server_address[1]}/identify")
+
+        assert response.status_code == 200
+        assert response.text == "ok"
+        assert served == [503, 429, 200]
+
+        assert connection_stats(session) == {"requests": 3, "connections": 1, "reused": 2}
+        assert HTTP_RETRIES.value(service="test") == 2
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_post_is_only_retried_when_rejected() -> None:
+    server, served = _serve([429, 502, 200])
+    session = create_session(pool_size=1, max_retries=3, backoff_seconds=0.01, timeout=(1, 1), service="test-post")
+    try:
+        # The 502 may come after the pull request was opened, sending it again could open another one
+        response = session.post(f"http://127.0.0.1:{server.server_address[1]}/pulls", data=b"{}")
+
+        assert response.status_code == 502
+        assert served == [429, 502]
+        assert HTTP_RETRIES.value(service="test-post") == 1
+    finally:
+        session.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,63 @@
+import hashlib
+from io import BytesIO
+from pathlib import Path
+
+import piexif
+from PIL import Image
+
+from herbabot.image_ingest import ingest_image
+
+
+def _exif() -> bytes:
+    return piexif.dump(
+        {
+            "Exif": {piexif.ExifIFD.DateTimeOriginal: b"2024:05:12 10:30:00"},
+            "GPS": {
+                piexif.GPSIFD.GPSLatitudeRef: b"N",
+                piexif.GPSIFD.GPSLatitude: ((60, 1), (10, 1), (0, 1)),
+                piexif.GPSIFD.GPSLongitudeRef: b"E",
+                piexif.GPSIFD.GPSLongitude: ((24, 1), (56, 1), (0, 1)),
+            },
+        }
+    )
+
+
+def _photo(path: Path, format: str, size: tuple[int, int]) -> Path:
+    output = BytesIO()
+    Image.new("RGB", size, (40, 120, 40)).save(output, format=format, exif=_exif())
+    path.write_bytes(output.getvalue())
+    return path
+
+
+def test_ingest_jpeg_keeps_original_as_archival_image(tmp_path: Path) -> None:
+    source = _photo(tmp_path / "photo.jpg", "JPEG", (3000, 2000))
+
+    image = ingest_image(source, max_edge=1000, identification_quality=80)
+
+    assert image.archival_path == source
+    assert image.content_hash == hashlib.sha256(source.read_bytes()).hexdigest()
+    assert image.exif_metadata["date_taken"] == "2024-05-12T10:30:00"
+    lat, lon = image.exif_metadata["gps_coords"]
+    assert round(lat, 4) == 60.1667 and round(lon, 4) == 24.9333
+    with Image.open(BytesIO(image.identification_image)) as derivative:
+        assert derivative.size == (1000, 667)
+    assert set(image.timings) == {"read", "exif", "derivative", "hash"}
+
+
+def test_ingest_small_jpeg_is_uploaded_as_is(tmp_path: Path) -> None:
+    source = _photo(tmp_path / "photo.jpg", "JPEG", (800, 600))
+    assert ingest_image(source, max_edge=1280).identification_image == source.read_bytes()
+
+
+def test_ingest_heic_converts_once(tmp_path: Path) -> None:
+    source = _photo(tmp_path / "photo.heic", "HEIF", (1200, 800))
+
+    image = ingest_image(source, max_edge=600, identification_quality=80)
+
+    assert image.archival_path == tmp_path / "photo.jpg"
+    with Image.open(image.archival_path) as archival:
+        assert (archival.format, archival.size) == ("JPEG", (1200, 800))
+        assert piexif.load(archival.info["exif"])["GPS"]
+    with Image.open(BytesIO(image.identification_image)) as derivative:
+        assert derivative.size == (600, 400)
+    assert image.exif_metadata["date_taken"] == "2024-05-12T10:30:00"
@@ -0,0 +1,65 @@
+from io import BytesIO
+from pathlib import Path
+
+import piexif
+from PIL import Image
+
+from herbabot.image_output import ImageVariant, render_image_variants
+from herbabot.plant_entry import create_plant_entry
+
+
+def _photo(path: Path, size: tuple[int, int]) -> Path:
+    exif = piexif.dump({"GPS": {piexif.GPSIFD.GPSLatitudeRef: b"N"}})
+    output = BytesIO()
+    Image.new("RGB", size, (40, 120, 40)).save(output, format="JPEG", exif=exif)
+    path.write_bytes(output.getvalue())
+    return path
+
+
+def test_render_image_variants_bounds_master_and_writes_widths(tmp_path: Path) -> None:
+    source = _photo(tmp_path / "upload.jpg", (4000, 3000))
+    output_dir = tmp_path / "entries"
+
+    variants = render_image_variants(
+        source, output_dir, "bellis-perennis", 2000, [640, 1280, 4000], ["jpeg", "webp"], 80, False
+    )
+
+    assert [(v.file_name, v.width, v.height, v.is_master) for v in variants] == [
+        ("bellis-perennis.jpg", 2000, 1500, True),
+        ("bellis-perennis.webp", 2000, 1500, True),
+        ("bellis-perennis-1280w.jpg", 1280, 960, False),
+        ("bellis-perennis-1280w.webp", 1280, 960, False),
+        ("bellis-perennis-640w.jpg", 640, 480, False),
+        ("bellis-perennis-640w.webp", 640, 480, False),
+    ]
+    with Image.open(output_dir / "bellis-perennis.jpg") as master:
+        assert master.size == (2000, 1500)
+        assert "exif" not in master.info
+
+
+def test_small_jpeg_is_published_without_reencoding(tmp_path: Path) -> None:
+    source = _photo(tmp_path / "upload.jpg", (1200, 900))
+
+    variants = render_image_variants(source, tmp_path / "entries", "bellis-perennis", 2000, [1600], ["jpeg"], 80, True)
+
+    assert variants == [ImageVariant("bellis-perennis.jpg", 1200, 900, "jpeg", True)]
+    assert (tmp_path / "entries" / "bellis-perennis.jpg").read_bytes() == source.read_bytes()
+
+
+def test_entry_lists_image_variants(tmp_path: Path) -> None:
+    variants = [
+        ImageVariant("bellis-perennis.jpg", 2000, 1500, "jpeg", True),
+        ImageVariant("bellis-perennis-640w.jpg", 640, 480, "jpeg", False),
+    ]
+
+    entry = create_plant_entry(
+        {"latin_name": "Bellis perennis", "common_name": "Daisy", "family": "Asteraceae"},
+        tmp_path / "unused.jpg",
+        tmp_path,
+        image_variants=variants,
+    )
+
+    assert entry is not None
+    content = entry.read_text()
+    assert 'srcset: "/plants/bellis-perennis-640w.jpg 640w, /plants/bellis-perennis.jpg 2000w"' in content
+    assert '  - src: "/plants/bellis-perennis-640w.jpg"\n    width: 640\n    height: 480\n    format: jpeg' in content
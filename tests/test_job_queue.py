@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+from herbabot.job_queue import DONE, PENDING, RUNNING, WAITING, JobQueue, LeaseLostError
+
+
+def test_jobs_of_a_user_are_claimed_in_order(tmp_path: Path) -> None:
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    first = queue.enqueue(1, 10, 100, Path("media/a.jpg"))
+    second = queue.enqueue(1, 11, 100, Path("media/b.jpg"))
+    other_user = queue.enqueue(2, 12, 200, Path("media/c.jpg"))
+
+    claimed = queue.claim()
+    assert claimed is not None and claimed.id == first.id
+    assert claimed.next_stage == "identified"
+
+    # The second photo of user 100 waits for the first one, user 200 does not
+    also_claimed = queue.claim()
+    assert also_claimed is not None and also_claimed.id == other_user.id
+    assert queue.claim() is None
+
+    queue.finish(claimed)
+    next_job = queue.claim()
+    assert next_job is not None and next_job.id == second.id
+    assert queue.depth() == {DONE: 1, RUNNING: 2}
+
+
+def test_expired_lease_resumes_job_from_last_stage(tmp_path: Path) -> None:
+    crashed = JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=0, worker_id="crashed")
+    job = crashed.enqueue(1, 10, 100, Path("media/a.jpg"))
+
+    claimed = crashed.claim()
+    assert claimed is not None
+    crashed.complete_stage(claimed, "identified", {"result": {"latin_name": "Bellis perennis"}})
+
+    # Another worker takes over the job once its lease has expired
+    queue = JobQueue(tmp_path / "jobs.sqlite3", worker_id="survivor")
+    resumed = queue.claim()
+    assert resumed is not None and resumed.id == job.id
+    assert resumed.worker_id == "survivor"
+    assert resumed.next_stage == "described"
+    assert resumed.payload == {"result": {"latin_name": "Bellis perennis"}}
+    assert queue.renew_leases() == 1
+
+    with pytest.raises(LeaseLostError):
+        crashed.complete_stage(claimed, "described", {"description": "stale"})
+
+
+def test_retried_job_waits_for_its_backoff(tmp_path: Path) -> None:
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    job = queue.enqueue(1, 10, 100, Path("media/a.jpg"))
+
+    claimed = queue.claim()
+    assert claimed is not None
+    queue.retry(claimed, "timeout", delay=60)
+
+    assert queue.claim() is None
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.status, stored.attempts, stored.last_error) == (PENDING, 1, "timeout")
+
+    queue.retry(stored, "timeout", delay=0)
+    claimed = queue.claim()
+    assert claimed is not None and claimed.attempts == 2
+
+    queue.wait(claimed)
+    assert queue.depth() == {WAITING: 1}
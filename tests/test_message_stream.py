@@ -0,0 +1,32 @@
+import asyncio
+from typing import Any
+
+from herbabot.message_stream import MessageStreamer
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.edits: list[str] = []
+
+    async def edit_message_text(self, text: str, chat_id: int, message_id: int, **kwargs: Any) -> None:
+        self.edits.append(text)
+
+
+def test_edits_are_rate_limited_and_end_with_the_latest_text() -> None:
+    bot = FakeBot()
+
+    async def scenario() -> None:
+        streamer = MessageStreamer(bot, chat_id=1, message_id=2, min_interval=0.05)  # type: ignore[arg-type]
+        text = ""
+        for word in ["Bellis"] + ["perennis"] * 20:
+            text += f"{word} "
+            streamer.update(text)
+            await asyncio.sleep(0.005)
+        await streamer.close()
+
+    asyncio.run(scenario())
+
+    # About one edit per interval instead of one per update
+    assert 1 < len(bot.edits) < 10
+    assert bot.edits[0] == "Bellis"
+    assert bot.edits[-1] == ("Bellis " + "perennis " * 20).strip()
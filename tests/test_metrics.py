@@ -0,0 +1,84 @@
+import asyncio
+import urllib.request
+
+import pytest
+
+from herbabot.metrics import (
+    STAGE_DURATION,
+    STAGE_ERRORS,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsServer,
+    Registry,
+    time_stage,
+)
+
+
+def test_registry_renders_the_prometheus_text_format() -> None:
+    registry = Registry()
+    requests = Counter("test_requests_total", "Requests.", ("cache", "result"))
+    depth = Gauge("test_depth", "Depth.", ("status",))
+    latency = Histogram("test_latency_seconds", "Latency.", ("stage",), buckets=(0.1, 1))
+    for metric in (requests, depth, latency):
+        registry.register(metric)
+    registry.add_collector(lambda: depth.set(3, status="pending"))
+
+    requests.inc(cache="plantnet", result="hit")
+    requests.inc(2, cache="plantnet", result="miss")
+    latency.observe(0.05, stage="identify")
+    latency.observe(0.5, stage="identify")
+    latency.observe(5, stage="identify")
+
+    assert registry.render() == (
+        "# HELP test_requests_total Requests.\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{cache="plantnet",result="hit"} 1\n'
+        'test_requests_total{cache="plantnet",result="miss"} 2\n'
+        "# HELP test_depth Depth.\n"
+        "# TYPE test_depth gauge\n"
+        'test_depth{status="pending"} 3\n'
+        "# HELP test_latency_seconds Latency.\n"
+        "# TYPE test_latency_seconds histogram\n"
+        'test_latency_seconds_bucket{stage="identify",le="0.1"} 1\n'
+        'test_latency_seconds_bucket{stage="identify",le="1"} 2\n'
+        'test_latency_seconds_bucket{stage="identify",le="+Inf"} 3\n'
+        'test_latency_seconds_sum{stage="identify"} 5.55\n'
+        'test_latency_seconds_count{stage="identify"} 3\n'
+    )
+
+
+def test_time_stage_records_duration_and_errors() -> None:
+    before = STAGE_DURATION.count(stage="test_stage")
+
+    with time_stage("test_stage"):
+        pass
+    with pytest.raises(RuntimeError):
+        with time_stage("test_stage"):
+            raise RuntimeError("upstream down")
+
+    assert STAGE_DURATION.count(stage="test_stage") == before + 2
+    assert STAGE_ERRORS.value(stage="test_stage") == 1
+
+
+def test_metrics_server_serves_the_registry() -> None:
+    registry = Registry()
+    counter = Counter("test_jobs_total", "Jobs.")
+    registry.register(counter)
+    counter.inc()
+
+    async def scrape() -> tuple[int, str, str]:
+        server = MetricsServer("127.0.0.1", 0, registry)
+        await server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}/metrics"
+            with await asyncio.to_thread(urllib.request.urlopen, url, timeout=5) as response:
+                return response.status, response.headers["Content-Type"], response.read().decode()
+        finally:
+            await server.stop()
+
+    status, content_type, body = asyncio.run(scrape())
+
+    assert status == 200
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert "test_jobs_total 1\n" in body
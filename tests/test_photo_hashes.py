@@ -0,0 +1,82 @@
+import random
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageEnhance
+
+from herbabot.photo_hashes import MultiIndexHashTable, PhotoHashIndex, dhash, hamming_distance
+
+
+def _leaf(seed: int, size: tuple[int, int] = (640, 480)) -> Image.Image:
+    """Smooth random colors, a stand-in for a different plant per seed."""
+    rng = random.Random(seed)
+    colors = Image.new("RGB", (16, 12))
+    colors.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(16 * 12)])
+    return colors.resize(size, Image.Resampling.BICUBIC)
+
+
+def test_dhash_matches_burst_frames_only() -> None:
+    frame = _leaf(1)
+    # The next frame of a burst: slightly shifted and brighter
+    shifted = frame.transform(frame.size, Image.Transform.AFFINE, (1, 0, 4, 0, 1, 3))
+    next_frame = ImageEnhance.Brightness(shifted).enhance(1.1)
+
+    assert hamming_distance(dhash(frame), dhash(next_frame)) <= 10
+    assert hamming_distance(dhash(frame), dhash(_leaf(2))) > 20
+
+
+def test_dhash_follows_exif_orientation() -> None:
+    upright = _leaf(3)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Stored turned, to be rotated 90° clockwise for display
+    output = BytesIO()
+    upright.transpose(Image.Transpose.ROTATE_90).save(output, format="JPEG", exif=exif)
+
+    with Image.open(output) as photo:
+        assert hamming_distance(dhash(upright), dhash(photo)) <= 4
+
+
+def test_hash_table_search_matches_brute_force() -> None:
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    # Near-duplicates of the first hashes
+    hashes += [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in hashes[:200]]
+    table: MultiIndexHashTable[int] = MultiIndexHashTable()
+    for index, value in enumerate(hashes):
+        table.add(value, index)
+
+    for query in hashes[:50]:
+        expected = sorted(
+            (hamming_distance(query, value), index)
+            for index, value in enumerate(hashes)
+            if hamming_distance(query, value) <= 10
+        )
+        assert sorted(table.search(query, 10)) == expected
+    assert len(table) == len(hashes)
+
+
+def test_index_claims_first_photo_and_persists(tmp_path: Path) -> None:
+    index = PhotoHashIndex(tmp_path / "photos.sqlite3")
+
+    assert index.claim([0b1011], "job-1", 2, chat_id=1, message_id=10) is None
+    # A retry of the same job is not its own duplicate
+    assert index.claim([0b1011], "job-1", 2, chat_id=1, message_id=10) is None
+    duplicate = index.claim([0b1001], "job-2", 2)
+    assert duplicate is not None and duplicate.job_id == "job-1"
+    assert duplicate.message_id == 10
+
+    index.identify("job-1", "Bellis perennis")
+    index.close()
+
+    reopened = PhotoHashIndex(tmp_path / "photos.sqlite3")
+    assert len(reopened) == 1
+    duplicate = reopened.claim([0b1011], "job-3", 0)
+    assert duplicate is not None and duplicate.latin_name == "Bellis perennis"
+
+    # Albums are only duplicates when all of their photos are
+    assert reopened.claim([0b1011, 0xFFFF0000], "job-4", 2) is None
+    assert len(reopened) == 3
+
+    reopened.forget("job-1")
+    reopened.forget("job-4")
+    assert reopened.claim([0b1011], "job-5", 2) is None
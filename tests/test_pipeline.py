@@ -0,0 +1,342 @@
+import asyncio
+import time
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import pytest
+from PIL import Image
+
+from herbabot import pipeline
+from herbabot.executor import shutdown_executor
+from herbabot.job_queue import DONE, FAILED, PENDING, JobQueue
+from herbabot.metrics import JOBS_FINISHED
+from herbabot.photo_hashes import PhotoHashIndex
+from herbabot.pr_batcher import PRBatcher
+from herbabot.rate_limits import RateLimitedError
+from herbabot.species_index import SpeciesEntry
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.messages: list[str] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> SimpleNamespace:
+        self.messages.append(text)
+        return SimpleNamespace(message_id=len(self.messages))
+
+    async def edit_message_text(self, text: str, chat_id: int, message_id: int) -> None:
+        self.messages[message_id - 1] = text
+
+
+@pytest.fixture
+def queue(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> JobQueue:
+    monkeypatch.setattr(pipeline, "JOB_WORKSPACE_ROOT", str(tmp_path / "jobs"))
+    monkeypatch.setattr(pipeline, "JOB_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(pipeline, "prefetch_repository", lambda: None)
+    monkeypatch.setattr(pipeline, "find_existing_entries", lambda scientific_name, stem: [])
+    monkeypatch.setattr(pipeline, "get_photo_hash_index", lambda: None)
+    return JobQueue(tmp_path / "jobs.sqlite3")
+
+
+def _photo(path: Path) -> Path:
+    output = BytesIO()
+    Image.new("RGB", (64, 48), (40, 120, 40)).save(output, format="JPEG")
+    path.write_bytes(output.getvalue())
+    return path
+
+
+def _run_next(bot: FakeBot, queue: JobQueue) -> None:
+    job = queue.claim()
+    assert job is not None
+    try:
+        asyncio.run(pipeline.run_job(bot, queue, job))  # type: ignore[arg-type]
+    finally:
+        shutdown_executor()
+
+
+def test_failed_stage_is_retried_without_redoing_completed_stages(
+    tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[str] = []
+    descriptions: list[str | Exception] = [RuntimeError("OpenAI is down"), "A common daisy."]
+
+    def identify(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+        calls.append("identify")
+        return {"latin_name": "Bellis perennis", "common_name": None, "family": "Asteraceae", "score": 0.9}
+
+    def describe(result: dict[str, Any], on_text: Callable[[str], None]) -> str:
+        calls.append("describe")
+        outcome = descriptions.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        on_text(outcome[:8])
+        return outcome
+
+    def publish(workspace: Any, result: dict[str, Any]) -> str:
+        calls.append("publish")
+        assert sorted(path.name for path in workspace.entries_dir.glob("*.md")) == ["bellis-perennis.md"]
+        return "https://github.com/example/portfolio/pull/1"
+
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", identify)
+    monkeypatch.setattr(pipeline, "generate_plant_description", describe)
+    monkeypatch.setattr(pipeline, "create_plant_pr", publish)
+    monkeypatch.setattr(pipeline, "retry_delay", lambda attempts: 0)
+
+    bot = FakeBot()
+    job = queue.enqueue(1, 10, 100, _photo(tmp_path / "photo.jpg"))
+
+    _run_next(bot, queue)
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status, stored.attempts) == ("identified", PENDING, 1)
+
+    _run_next(bot, queue)
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("pushed", DONE)
+    assert stored.payload["pr_url"] == "https://github.com/example/portfolio/pull/1"
+    assert calls == ["identify", "describe", "describe", "publish"]
+    assert "Plant entry created successfully" in bot.messages[-1]
+    # The progress message of the successful attempt ends up showing the whole description
+    assert "🤖 A common daisy." in bot.messages
+    assert not (tmp_path / "jobs" / f"herbabot-{job.id}").exists()
+
+
+def test_job_fails_after_max_attempts(tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch) -> None:
+    def identify(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+        raise RuntimeError("Pl@ntNet is down")
+
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", identify)
+    monkeypatch.setattr(pipeline, "retry_delay", lambda attempts: 0)
+
+    bot = FakeBot()
+    job = queue.enqueue(1, 10, 100, _photo(tmp_path / "photo.jpg"))
+
+    _run_next(bot, queue)
+    _run_next(bot, queue)
+
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status, stored.last_error) == ("downloaded", FAILED, "Pl@ntNet is down")
+    assert "Could not identify the plant" in bot.messages[-1]
+
+
+def test_rate_limited_job_is_deferred_without_using_an_attempt(
+    tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def identify(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+        raise RateLimitedError("plantnet", 3600)
+
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", identify)
+
+    bot = FakeBot()
+    job = queue.enqueue(1, 10, 100, _photo(tmp_path / "photo.jpg"))
+    _run_next(bot, queue)
+
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status, stored.attempts) == ("downloaded", PENDING, 0)
+    assert stored.next_attempt_at >= time.time() + 3500
+    assert stored.last_error == "plantnet rate limit reached, next call possible in 3600s"
+    assert not any("Could not identify" in message for message in bot.messages)
+
+
+def test_job_published_by_a_full_batch_is_finished_once(
+    tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    published: list[list[dict[str, Any]]] = []
+
+    def publish(workspace: Any, plant_infos: list[dict[str, Any]]) -> str:
+        published.append(plant_infos)
+        return "https://example.com/pull/3"
+
+    # A batch of one entry is published inline, before add returns to the job
+    batcher = PRBatcher(window_seconds=60, max_entries=1, publish=publish)
+    monkeypatch.setattr(pipeline, "get_pr_batcher", lambda: batcher)
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", _identify_daisy)
+    monkeypatch.setattr(pipeline, "generate_plant_description", lambda result, on_text=None: "A daisy.")
+
+    bot = FakeBot()
+    job = queue.enqueue(1, 10, 100, _photo(tmp_path / "photo.jpg"))
+    finished = JOBS_FINISHED.value(outcome="done")
+    _run_next(bot, queue)
+
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("pushed", DONE)
+    assert len(published) == 1
+    assert JOBS_FINISHED.value(outcome="done") == finished + 1
+
+
+def test_flush_sent_through_the_queue_publishes_the_batch_of_a_worker(
+    tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class HeldBatch:
+        pending_count = 2
+
+        async def flush(self) -> int:
+            flushed, self.pending_count = self.pending_count, 0
+            return flushed
+
+    batch = HeldBatch()
+    monkeypatch.setattr(pipeline, "get_pr_batcher", lambda: batch)
+
+    async def run() -> None:
+        workers = pipeline.JobWorkers(FakeBot(), queue, count=1, poll_interval=0.01)  # type: ignore[arg-type]
+        workers.start()
+        try:
+            await asyncio.sleep(0.05)
+            assert batch.pending_count == 2
+            # /flush sent from the bot process, through its own connection to the queue
+            JobQueue(tmp_path / "jobs.sqlite3").request_flush()
+            for _ in range(100):
+                if not batch.pending_count:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await workers.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_executor()
+    assert batch.pending_count == 0
+
+
+def test_album_is_identified_in_one_request(tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch) -> None:
+    requests: list[tuple[list[str], list[str | None]]] = []
+
+    def identify(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+        requests.append(([image.source_path.name for image in images], organs))
+        return {"latin_name": "Hedera helix", "common_name": "Ivy", "family": "Araliaceae", "score": 0.8}
+
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", identify)
+    monkeypatch.setattr(pipeline, "generate_plant_description", lambda result, on_text=None: "Ivy.")
+    monkeypatch.setattr(pipeline, "create_plant_pr", lambda workspace, result: "https://example.com/pull/2")
+
+    leaf, bark = _photo(tmp_path / "leaf.jpg"), _photo(tmp_path / "bark.jpg")
+    photos = [{"path": str(leaf), "organ": "leaf"}, {"path": str(bark), "organ": None}]
+    job = queue.enqueue(1, 10, 100, leaf, {"photos": photos})
+
+    _run_next(FakeBot(), queue)
+
+    assert requests == [(["leaf.jpg", "bark.jpg"], ["leaf", None])]
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("pushed", DONE)
+
+
+def _identify_daisy(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+    return {"latin_name": "Bellis perennis", "common_name": "Daisy", "family": "Asteraceae", "score": 0.9}
+
+
+def _existing_daisy(scientific_name: str, stem: str) -> list[SpeciesEntry]:
+    return [SpeciesEntry("src/data/plants/bellis-perennis.md", "Bellis perennis", "Daisy", "2023-06-01", None, None)]
+
+
+def test_existing_species_is_skipped(tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch) -> None:
+    def publish(workspace: Any, result: dict[str, Any]) -> str:
+        raise AssertionError("nothing should be published")
+
+    monkeypatch.setattr(pipeline, "DUPLICATE_ENTRY_POLICY", "skip")
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", _identify_daisy)
+    monkeypatch.setattr(pipeline, "find_existing_entries", _existing_daisy)
+    monkeypatch.setattr(pipeline, "create_plant_pr", publish)
+
+    bot = FakeBot()
+    job = queue.enqueue(1, 10, 100, _photo(tmp_path / "photo.jpg"))
+    _run_next(bot, queue)
+
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("downloaded", DONE)
+    assert "already in the herbarium" in bot.messages[-1]
+
+
+def test_observation_is_appended_to_existing_entry(
+    tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    published: list[dict[str, str]] = []
+
+    def publish(workspace: Any, result: dict[str, Any]) -> str:
+        published.append({path.name: path.read_text() for path in workspace.entries_dir.iterdir()})
+        return "https://example.com/pull/3"
+
+    def describe(result: dict[str, Any], on_text: Callable[[str], None] | None = None) -> str:
+        raise AssertionError("the existing description is kept")
+
+    monkeypatch.setattr(pipeline, "DUPLICATE_ENTRY_POLICY", "append")
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", _identify_daisy)
+    monkeypatch.setattr(pipeline, "find_existing_entries", _existing_daisy)
+    monkeypatch.setattr(pipeline, "generate_plant_description", describe)
+    monkeypatch.setattr(
+        pipeline,
+        "read_repository_file",
+        lambda path: '---\nname: "Daisy"\nscientificName: "Bellis perennis"\ndate: 2023-06-01\n---\n\nA daisy.',
+    )
+    monkeypatch.setattr(pipeline, "create_plant_pr", publish)
+
+    async def located(notifier: Any, exif_metadata: dict[str, Any]) -> None:
+        pass
+
+    def ingest(path: Path) -> Any:
+        return SimpleNamespace(
+            source_path=path,
+            archival_path=path,
+            exif_metadata={"date_taken": "2024-05-12T10:30:00", "gps_coords": (60.17, 24.94)},
+            timings={},
+        )
+
+    monkeypatch.setattr(pipeline, "handle_exif_metadata", located)
+    monkeypatch.setattr(pipeline, "ingest_image", ingest)
+
+    job = queue.enqueue(1, 10, 100, _photo(tmp_path / "photo.jpg"))
+    _run_next(FakeBot(), queue)
+
+    stored = queue.get(job.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("pushed", DONE)
+    assert published == [
+        {
+            "bellis-perennis.md": '---\nname: "Daisy"\nscientificName: "Bellis perennis"\ndate: 2023-06-01\n'
+            "observations:\n  - date: 2024-05-12\n    latitude: 60.17\n    longitude: 24.94\n---\n\nA daisy."
+        }
+    ]
+
+
+def test_burst_shot_is_not_processed_again(tmp_path: Path, queue: JobQueue, monkeypatch: pytest.MonkeyPatch) -> None:
+    identified: list[int] = []
+
+    def identify(images: list[Any], organs: list[str | None]) -> dict[str, Any]:
+        identified.append(len(images))
+        return _identify_daisy(images, organs)
+
+    index = PhotoHashIndex(tmp_path / "photos.sqlite3")
+    monkeypatch.setattr(pipeline, "get_photo_hash_index", lambda: index)
+    monkeypatch.setattr(pipeline, "identify_ingested_specimen", identify)
+    monkeypatch.setattr(pipeline, "generate_plant_description", lambda result, on_text=None: "A daisy.")
+    monkeypatch.setattr(pipeline, "create_plant_pr", lambda workspace, result: "https://example.com/pull/4")
+
+    bot = FakeBot()
+    queue.enqueue(1, 10, 100, _photo(tmp_path / "frame-1.jpg"))
+    _run_next(bot, queue)
+    burst = queue.enqueue(1, 11, 100, _photo(tmp_path / "frame-2.jpg"))
+    _run_next(bot, queue)
+
+    stored = queue.get(burst.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("downloaded", DONE)
+    assert "Same as the photo sent on" in bot.messages[-1]
+    assert "*Bellis perennis*" in bot.messages[-1]
+    assert identified == [1]
+
+    # The "new" caption processes it anyway
+    forced = queue.enqueue(1, 12, 100, _photo(tmp_path / "frame-3.jpg"), {"force": True})
+    _run_next(bot, queue)
+
+    stored = queue.get(forced.id)
+    assert stored is not None
+    assert (stored.stage, stored.status) == ("pushed", DONE)
+    assert identified == [1, 1]
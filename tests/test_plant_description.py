@@ -0,0 +1,74 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+
+import pytest
+from openai import OpenAI
+
+from herbabot import plant_description
+from herbabot.cache import TieredCache
+
+TOKENS = ["Bellis perennis", " is a", " small", " daisy."]
+
+
+def _chunk(content: str | None, finish_reason: str | None = None) -> dict[str, Any]:
+    delta = {"content": content} if content is not None else {}
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 1715509800,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+@pytest.fixture
+def fake_openai() -> Iterator[tuple[str, list[dict[str, Any]]]]:
+    """Local OpenAI-compatible server streaming a chat completion as server-sent events."""
+    requests: list[dict[str, Any]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            requests.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for event in [_chunk(token) for token in TOKENS] + [_chunk(None, "stop")]:
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_streamed_description_reports_progress_and_is_cached(
+    fake_openai: tuple[str, list[dict[str, Any]]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    base_url, requests = fake_openai
+    client = OpenAI(api_key="test-key", base_url=base_url, max_retries=0)
+    monkeypatch.setattr(plant_description, "get_openai_client", lambda: client)
+    cache = TieredCache(None, 8)
+    monkeypatch.setattr(plant_description, "get_description_cache", lambda: cache)
+
+    progress: list[str] = []
+    plant = {"latin_name": "Bellis perennis", "family": "Asteraceae"}
+
+    description = plant_description.generate_plant_description(plant, progress.append)
+
+    assert description == "Bellis perennis is a small daisy."
+    assert progress == ["Bellis perennis", "Bellis perennis is a", "Bellis perennis is a small", description]
+    assert requests[0]["stream"] is True
+
+    # The second request for the species is served from the cache without streaming
+    progress.clear()
+    assert plant_description.generate_plant_description(plant, progress.append) == description
+    assert progress == []
+    assert len(requests) == 1
@@ -0,0 +1,50 @@
+from herbabot.plant_entry import append_observation, parse_front_matter, plan_plant_entry
+
+DAISY = {"latin_name": "Bellis perennis", "common_name": "Daisy", "family": "Asteraceae", "score": 0.9}
+ENTRY = '---\nname: "Daisy"\nscientificName: "Bellis perennis"\nlatitude: 60.17\nlongitude: 24.94\ndate: 2023-06-01\n---\n\nA daisy.'
+
+
+def test_new_species_is_created() -> None:
+    assert plan_plant_entry(DAISY, [], "skip") == {"action": "create", "stem": "bellis-perennis", "existing": None}
+
+
+def test_existing_species_follows_policy() -> None:
+    existing = ["src/data/plants/bellis-perennis-2023-06-01.md", "src/data/plants/bellis-perennis.md"]
+
+    assert plan_plant_entry(DAISY, existing, "overwrite")["action"] == "overwrite"
+    assert plan_plant_entry(DAISY, existing, "skip") == {
+        "action": "skip",
+        "stem": "bellis-perennis",
+        "existing": "src/data/plants/bellis-perennis.md",
+    }
+    assert plan_plant_entry(DAISY, existing, "append", "2024-05-12")["stem"] == "bellis-perennis"
+    # Nothing to append without a date or a location
+    assert plan_plant_entry(DAISY, existing, "append")["action"] == "skip"
+    assert plan_plant_entry(DAISY, existing, "variant", "2024-05-12")["stem"] == "bellis-perennis-2024-05-12"
+    # Dated variants do not collide with earlier ones of the same day
+    assert plan_plant_entry(DAISY, existing, "variant", "2023-06-01")["stem"] == "bellis-perennis-2023-06-01-2"
+
+
+def test_front_matter_fields_are_read() -> None:
+    assert parse_front_matter(ENTRY) == {
+        "name": "Daisy",
+        "scientificName": "Bellis perennis",
+        "latitude": "60.17",
+        "longitude": "24.94",
+        "date": "2023-06-01",
+    }
+    assert parse_front_matter("No front matter") == {}
+
+
+def test_observations_are_appended_once() -> None:
+    appended = append_observation(ENTRY, "2024-05-12", {"latitude": 60.2, "longitude": 24.9})
+    again = append_observation(appended, "2024-06-01", None)
+
+    assert again == (
+        '---\nname: "Daisy"\nscientificName: "Bellis perennis"\nlatitude: 60.17\nlongitude: 24.94\ndate: 2023-06-01\n'
+        "observations:\n  - date: 2024-05-12\n    latitude: 60.2\n    longitude: 24.9\n  - date: 2024-06-01\n"
+        "---\n\nA daisy."
+    )
+    assert append_observation(again, "2024-06-01", None) == again
+    # The entry's own observation is not repeated
+    assert append_observation(ENTRY, "2023-06-01", {"latitude": 60.17, "longitude": 24.94}) == ENTRY
@@ -0,0 +1,88 @@
+import json
+import threading
+from email import message_from_bytes, policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from herbabot import plant_id
+from herbabot.image_ingest import IngestedImage
+
+RESPONSE = {
+    "results": [
+        {
+            "score": 0.87,
+            "species": {
+                "scientificNameWithoutAuthor": "Hedera helix",
+                "commonNames": ["Common ivy"],
+                "family": {"scientificNameWithoutAuthor": "Araliaceae"},
+            },
+        }
+    ]
+}
+
+
+@pytest.fixture
+def plantnet(monkeypatch: pytest.MonkeyPatch) -> Iterator[list[dict[str, Any]]]:
+    """Local Pl@ntNet identify endpoint recording the organs and image names of each request."""
+    requests: list[dict[str, Any]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            form = message_from_bytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body, policy=policy.HTTP
+            )
+            images = [
+                part for part in form.iter_parts() if part.get_param("name", header="content-disposition") == "images"
+            ]
+            query = parse_qs(urlparse(self.path).query)
+            requests.append({"organs": query.get("organs"), "images": [image.get_filename() for image in images]})
+
+            response = json.dumps(RESPONSE).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(plant_id, "PLANTNET_API_URL", f"http://127.0.0.1:{server.server_address[1]}/v2/identify/all")
+    monkeypatch.setattr(plant_id, "get_identification_cache", lambda: None)
+    yield requests
+    server.shutdown()
+    server.server_close()
+
+
+def _image(name: str) -> IngestedImage:
+    path = Path(f"{name}.jpg")
+    return IngestedImage(
+        path,
+        path,
+        content_hash=name,
+        exif_metadata={},
+        identification_image=b"jpeg " + name.encode(),
+        perceptual_hash=0,
+    )
+
+
+def test_specimen_photos_are_sent_in_one_request(plantnet: list[dict[str, Any]]) -> None:
+    result = plant_id.identify_ingested_specimen([_image("leaf"), _image("bark")], ["leaf", None])
+
+    assert result["latin_name"] == "Hedera helix"
+    assert plantnet == [{"organs": ["leaf", "auto"], "images": ["leaf.jpg", "bark.jpg"]}]
+
+
+def test_untagged_specimen_photos_are_sent_without_organs(plantnet: list[dict[str, Any]]) -> None:
+    images = [_image(f"photo{index}") for index in range(plant_id.MAX_IMAGES + 2)]
+
+    plant_id.identify_ingested_specimen(images)
+
+    assert plantnet == [{"organs": None, "images": [f"photo{index}.jpg" for index in range(plant_id.MAX_IMAGES)]}]
@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any
+
+from herbabot.executor import shutdown_executor
+from herbabot.pr_batcher import PRBatcher
+from herbabot.workspace import JobWorkspace, job_workspace
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.batches: list[tuple[list[str], list[str]]] = []
+        self.notified: list[str | None] = []
+
+    def publish(self, workspace: JobWorkspace, plant_infos: list[dict[str, Any]]) -> str | None:
+        files = sorted(path.name for path in workspace.entries_dir.iterdir())
+        self.batches.append((files, [info["latin_name"] for info in plant_infos]))
+        return f"https://github.com/example/portfolio/pull/{len(self.batches)}"
+
+    async def notify(self, pr_url: str | None) -> None:
+        self.notified.append(pr_url)
+
+
+async def _add(batcher: PRBatcher, recorder: Recorder, stem: str) -> int:
+    with job_workspace() as workspace:
+        (workspace.entries_dir / f"{stem}.md").write_text(stem)
+        (workspace.entries_dir / f"{stem}.jpg").write_bytes(b"jpeg")
+        return await batcher.add(workspace, {"latin_name": stem}, recorder.notify)
+
+
+def test_batch_is_published_when_full() -> None:
+    recorder = Recorder()
+
+    async def scenario() -> list[int]:
+        batcher = PRBatcher(window_seconds=60, max_entries=2, publish=recorder.publish)
+        return [await _add(batcher, recorder, stem) for stem in ("bellis", "taraxacum", "urtica")]
+
+    try:
+        assert asyncio.run(scenario()) == [1, 0, 1]
+    finally:
+        shutdown_executor()
+
+    assert recorder.batches == [
+        (["bellis.jpg", "bellis.md", "taraxacum.jpg", "taraxacum.md"], ["bellis", "taraxacum"])
+    ]
+    assert recorder.notified == ["https://github.com/example/portfolio/pull/1"] * 2
+
+
+def test_batch_is_published_after_window_and_on_flush() -> None:
+    recorder = Recorder()
+
+    async def scenario() -> int:
+        batcher = PRBatcher(window_seconds=0.05, max_entries=10, publish=recorder.publish)
+        await _add(batcher, recorder, "bellis")
+        await asyncio.sleep(0.2)
+        await _add(batcher, recorder, "taraxacum")
+        return await batcher.flush()
+
+    try:
+        assert asyncio.run(scenario()) == 1
+    finally:
+        shutdown_executor()
+
+    assert [names for _, names in recorder.batches] == [["bellis"], ["taraxacum"]]
+
+
+def test_same_species_starts_a_new_batch() -> None:
+    recorder = Recorder()
+
+    async def scenario() -> None:
+        batcher = PRBatcher(window_seconds=60, max_entries=10, publish=recorder.publish)
+        await _add(batcher, recorder, "bellis")
+        await _add(batcher, recorder, "bellis")
+        await batcher.flush()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        shutdown_executor()
+
+    assert [names for _, names in recorder.batches] == [["bellis"], ["bellis"]]
@@ -0,0 +1,109 @@
+import pytest
+
+from herbabot.metrics import RATE_LIMIT_BUDGET, RATE_LIMIT_WAIT
+from herbabot.rate_limits import (
+    RateLimitedError,
+    RateLimiter,
+    _collect_budget,
+    parse_duration,
+    update_from_github_headers,
+    update_from_openai_headers,
+    update_from_plantnet_response,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+
+
+def _limiter(clock: FakeClock, limits: list[tuple[str, int, float]], max_wait_seconds: float = 60) -> RateLimiter:
+    return RateLimiter("test", limits, max_wait_seconds, clock=clock, sleep=clock.sleep)
+
+
+def test_burst_is_queued_within_the_budget() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, [("requests", 2, 60)])
+
+    # Two calls go through, the next ones wait for the refill one after the other
+    assert [limiter.acquire(requests=1) for _ in range(4)] == [0, 0, 30, 60]
+    assert clock.sleeps == [30, 60]
+    assert limiter.budget() == {"requests": -2}
+
+    clock.now += 90
+    assert limiter.budget() == {"requests": pytest.approx(1)}
+    assert limiter.wait_time() == 0
+
+
+def test_call_waiting_too_long_is_deferred_without_taking_tokens() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, [("requests", 10, 60), ("tokens", 1000, 60)], max_wait_seconds=5)
+    limiter.acquire(requests=1, tokens=900)
+
+    with pytest.raises(RateLimitedError) as error:
+        limiter.acquire(requests=1, tokens=200)
+
+    assert error.value.upstream == "test"
+    assert error.value.retry_after == pytest.approx(6)
+    assert limiter.budget() == {"requests": 9, "tokens": 100}
+    # Buckets without a limit cost nothing
+    assert limiter.acquire(requests=1, pushes=1) == 0
+
+
+def test_exhausted_upstream_budget_pauses_until_its_reset() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, [("identifications", 500, 86400)], max_wait_seconds=3600)
+
+    limiter.update("identifications", 0, reset_after=1800)
+    assert limiter.wait_time() == 1800
+    assert limiter.acquire(identifications=1) == 1800
+
+    # The whole quota is available again after the reset, minus the call queued meanwhile
+    clock.now += 1800
+    assert limiter.budget() == {"identifications": 499}
+    limiter.update("identifications", 420)
+    assert limiter.budget() == {"identifications": 420}
+
+
+def test_upstream_reports_update_the_budgets() -> None:
+    clock = FakeClock()
+    github = _limiter(clock, [("requests", 5000, 3600)])
+    update_from_github_headers(github, {"x-ratelimit-remaining": "12", "x-ratelimit-reset": "0"})
+    assert github.budget() == {"requests": 12}
+
+    openai = _limiter(clock, [("requests", 500, 60), ("tokens", 200000, 60)])
+    update_from_openai_headers(
+        openai,
+        {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "1m30s",
+            "x-ratelimit-remaining-tokens": "1500",
+            "x-ratelimit-reset-tokens": "250ms",
+        },
+    )
+    assert openai.budget() == {"requests": 0, "tokens": 1500}
+    assert openai.wait_time(requests=1) == 90
+
+    plantnet = _limiter(clock, [("identifications", 500, 86400)])
+    update_from_plantnet_response(plantnet, {"results": [], "remainingIdentificationRequests": 37})
+    update_from_plantnet_response(plantnet, {"results": []})
+    assert plantnet.budget() == {"identifications": 37}
+
+    _collect_budget(openai)
+    assert RATE_LIMIT_BUDGET.value(upstream="test", bucket="tokens") == 1500
+    assert RATE_LIMIT_WAIT.value(upstream="test", bucket="requests") == 90
+
+
+def test_parse_duration() -> None:
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1h2m3.5s") == 3723.5
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("soon") is None
+    assert parse_duration("") is None
@@ -0,0 +1,93 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from herbabot.repo_mirror import read_objects, sync_mirror
+from herbabot.species_index import SpeciesIndex
+
+
+def _git(*args: str, cwd: Path) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch: pytest.MonkeyPatch) -> None:
+    for prefix in ("GIT_AUTHOR", "GIT_COMMITTER"):
+        monkeypatch.setenv(f"{prefix}_NAME", "Herbarium Bot")
+        monkeypatch.setenv(f"{prefix}_EMAIL", "bot@example.com")
+
+
+def _entry(name: str, scientific_name: str, date: str) -> str:
+    return (
+        f'---\nname: "{name}"\nscientificName: "{scientific_name}"\nimage: "/plants/x.jpg"\n'
+        f'images:\n  - src: "/plants/x.jpg"\n    width: 640\nlatitude: 60.17\nlongitude: 24.94\ndate: {date}\n---\n'
+    )
+
+
+@pytest.fixture
+def seed(tmp_path: Path) -> Path:
+    """Working copy of a bare repository standing in for the portfolio on GitHub."""
+    origin = tmp_path / "origin.git"
+    _git("init", "--bare", "--initial-branch=main", str(origin), cwd=tmp_path)
+    seed = tmp_path / "seed"
+    _git("clone", str(origin), str(seed), cwd=tmp_path)
+    plants = seed / "src" / "data" / "plants"
+    plants.mkdir(parents=True)
+    (plants / "bellis-perennis.md").write_text(_entry("Daisy", "Bellis perennis", "2023-06-01"))
+    (plants / "hedera-helix.md").write_text(_entry("Ivy", "Hedera helix", "2023-07-02"))
+    (plants / "README.txt").write_text("not an entry")
+    _git("add", ".", cwd=seed)
+    _git("commit", "-m", "Initial commit", cwd=seed)
+    _git("push", "origin", "HEAD:main", cwd=seed)
+    return seed
+
+
+def test_index_is_built_and_refreshed_incrementally(seed: Path, tmp_path: Path) -> None:
+    mirror = tmp_path / "mirror.git"
+    sync_mirror(mirror, str(tmp_path / "origin.git"), "token")
+    index = SpeciesIndex(tmp_path / "species.sqlite3")
+
+    assert index.refresh(mirror, "main") == 2
+    assert index.refresh(mirror, "main") == 0
+    [daisy] = index.find("bellis  PERENNIS")
+    assert (daisy.path, daisy.name, daisy.date, daisy.latitude, daisy.longitude) == (
+        "src/data/plants/bellis-perennis.md",
+        "Daisy",
+        "2023-06-01",
+        60.17,
+        24.94,
+    )
+
+    plants = seed / "src" / "data" / "plants"
+    (plants / "bellis-perennis-2024-05-12.md").write_text(_entry("Daisy", "Bellis perennis", "2024-05-12"))
+    (plants / "hedera-helix.md").unlink()
+    _git("add", "-A", ".", cwd=seed)
+    _git("commit", "-m", "Second daisy", cwd=seed)
+    _git("push", "origin", "HEAD:main", cwd=seed)
+    sync_mirror(mirror, str(tmp_path / "origin.git"), "token")
+
+    # Only the new entry is read, the removed one is dropped
+    assert index.refresh(mirror, "main") == 2
+    assert [entry.path for entry in index.find("Bellis perennis")] == [
+        "src/data/plants/bellis-perennis-2024-05-12.md",
+        "src/data/plants/bellis-perennis.md",
+    ]
+    assert index.find("Hedera helix") == []
+    # An entry is also found by the path a new entry would overwrite
+    assert [entry.path for entry in index.find("Unknown", "src/data/plants/bellis-perennis.md")] == [
+        "src/data/plants/bellis-perennis.md"
+    ]
+    assert len(index) == 2
+    index.close()
+
+
+def test_read_objects_reads_files_and_skips_missing_ones(seed: Path, tmp_path: Path) -> None:
+    mirror = tmp_path / "mirror.git"
+    sync_mirror(mirror, str(tmp_path / "origin.git"), "token")
+
+    contents = read_objects(
+        mirror, ["refs/heads/main:src/data/plants/README.txt", "refs/heads/main:src/data/plants/missing.md"]
+    )
+
+    assert contents == {"refs/heads/main:src/data/plants/README.txt": b"not an entry"}
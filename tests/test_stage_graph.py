@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pytest
+
+from herbabot.stage_graph import StageFailedError, StageNode, run_stage_graph
+
+
+def _sleep(seconds: float, log: list[str], name: str) -> Callable[[], Awaitable[Any]]:
+    async def run() -> str:
+        await asyncio.sleep(seconds)
+        log.append(name)
+        return name
+
+    return run
+
+
+def test_independent_steps_run_concurrently() -> None:
+    log: list[str] = []
+    nodes = [
+        StageNode("prefetch", _sleep(0.05, log, "prefetch")),
+        StageNode("identify", _sleep(0.05, log, "identify")),
+        StageNode("describe", _sleep(0.2, log, "describe"), after=("identify",)),
+        StageNode("encode", _sleep(0.1, log, "encode"), after=("identify",)),
+        StageNode("render", _sleep(0.01, log, "render"), after=("describe", "encode")),
+        StageNode("push", _sleep(0.01, log, "push"), after=("render", "prefetch")),
+    ]
+
+    result = asyncio.run(run_stage_graph(nodes))
+
+    assert log[-2:] == ["render", "push"]
+    assert result.results["push"] == "push"
+    # identify + describe + render + push, not the sum of every step
+    assert 0.25 <= result.total < 0.4
+    assert result.critical_path(nodes) == ["identify", "describe", "render", "push"]
+    assert "in parallel: prefetch" in result.describe(nodes)
+
+
+def test_failure_skips_dependent_steps_only() -> None:
+    log: list[str] = []
+
+    async def fail() -> None:
+        raise RuntimeError("OpenAI is down")
+
+    nodes = [
+        StageNode("identify", _sleep(0.01, log, "identify")),
+        StageNode("describe", fail, after=("identify",)),
+        StageNode("encode", _sleep(0.05, log, "encode"), after=("identify",)),
+        StageNode("render", _sleep(0.01, log, "render"), after=("describe", "encode")),
+    ]
+
+    with pytest.raises(StageFailedError) as excinfo:
+        asyncio.run(run_stage_graph(nodes))
+
+    assert excinfo.value.stage == "describe"
+    assert str(excinfo.value.error) == "OpenAI is down"
+    assert log == ["identify", "encode"]
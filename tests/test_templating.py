@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+
+from herbabot import templating
+from herbabot.image_output import ImageVariant
+from herbabot.plant_entry import create_plant_entry
+
+
+def test_templates_are_compiled_once_and_cached_on_disk(template_cache: Path) -> None:
+    environment = templating.get_template_environment()
+
+    template = environment.get_template("plant_entry.md.j2")
+
+    assert templating.get_template_environment() is environment
+    assert environment.get_template("plant_entry.md.j2") is template
+    assert len(list(template_cache.iterdir())) == 1
+
+
+def test_entry_is_rendered_with_json_sidecar(tmp_path: Path) -> None:
+    entries = tmp_path / "entries"
+    (entries / "bellis-perennis.jpg").parent.mkdir()
+    (entries / "bellis-perennis.jpg").write_bytes(b"jpeg")
+
+    entry = create_plant_entry(
+        {"latin_name": "Bellis perennis", "common_name": 'Daisy "common"', "family": "Asteraceae"},
+        tmp_path / "unused.jpg",
+        entries,
+        {"latitude": 60.17, "longitude": 24.94},
+        "2024-05-12",
+        "A small daisy.",
+        [ImageVariant("bellis-perennis.jpg", 1200, 900, "jpeg", True)],
+        templates=["plant_entry.md.j2", "plant_entry.json.j2"],
+        place={"locality": "Helsinki", "country": "Finland"},
+    )
+
+    assert entry == entries / "bellis-perennis.md"
+    assert json.loads((entries / "bellis-perennis.json").read_text()) == {
+        "name": 'Daisy "common"',
+        "family": "Asteraceae",
+        "scientificName": "Bellis perennis",
+        "image": "/plants/bellis-perennis.jpg",
+        "images": [
+            {"file_name": "bellis-perennis.jpg", "width": 1200, "height": 900, "format": "jpeg", "is_master": True}
+        ],
+        "latitude": 60.17,
+        "longitude": 24.94,
+        "accuracy": None,
+        "locality": "Helsinki",
+        "region": None,
+        "country": "Finland",
+        "date": "2024-05-12",
+        "description": "A small daisy.",
+    }
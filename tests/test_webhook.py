@@ -0,0 +1,69 @@
+import asyncio
+import json
+import urllib.error
+import urllib.request
+from typing import Any
+
+import pytest
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+from herbabot.webhook import WebhookServer, update_queue_feeder
+
+UPDATE = {
+    "update_id": 42,
+    "message": {
+        "message_id": 7,
+        "date": 1715509800,
+        "chat": {"id": 1234, "type": "private"},
+        "from": {"id": 1234, "is_bot": False, "first_name": "Ada"},
+        "text": "/start",
+    },
+}
+
+
+def _post(url: str, payload: Any, secret: str) -> int:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": secret},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_posted_updates_reach_the_update_queue() -> None:
+    app = ApplicationBuilder().token("123456:test-token").build()
+
+    async def scenario() -> tuple[list[int], object]:
+        server = WebhookServer("127.0.0.1", 0, "/telegram", "s3cret", update_queue_feeder(app))
+        await server.start()
+        try:
+            url = f"http://127.0.0.1:{server.port}"
+            statuses = [
+                await asyncio.to_thread(_post, f"{url}/telegram", UPDATE, "wrong"),
+                await asyncio.to_thread(_post, f"{url}/other", UPDATE, "s3cret"),
+                await asyncio.to_thread(_post, f"{url}/telegram", {"update_id": 43, "message": "hi"}, "s3cret"),
+                await asyncio.to_thread(_post, f"{url}/telegram", UPDATE, "s3cret"),
+            ]
+        finally:
+            await server.stop()
+        return statuses, await asyncio.wait_for(app.update_queue.get(), 1)
+
+    statuses, update = asyncio.run(scenario())
+
+    assert statuses == [403, 404, 400, 200]
+    assert isinstance(update, Update)
+    assert update.update_id == 42
+    assert update.message is not None and update.message.text == "/start"
+    assert app.update_queue.empty()
+
+
+def test_webhook_server_requires_a_secret_token() -> None:
+    app = ApplicationBuilder().token("123456:test-token").build()
+    with pytest.raises(ValueError):
+        WebhookServer("127.0.0.1", 0, "/telegram", "", update_queue_feeder(app))
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+
+from herbabot.workspace import job_workspace
+
+
+def test_job_workspaces_are_isolated_and_cleaned_up() -> None:
+    with job_workspace() as first, job_workspace() as second:
+        assert first.root != second.root
+        (first.entries_dir / "taraxacum-officinale.md").write_text("first")
+        assert list(second.entries_dir.iterdir()) == []
+
+        first_root = first.root
+
+    assert not first_root.exists()
+    assert not second.root.exists()
+
+
+def test_job_workspace_is_removed_on_failure() -> None:
+    root: Path | None = None
+    with pytest.raises(RuntimeError):
+        with job_workspace("failing") as workspace:
+            root = workspace.root
+            (workspace.entries_dir / "entry.md").write_text("partial")
+            raise RuntimeError("boom")
+
+    assert root is not None
+    assert "failing" in root.name
+    assert not root.exists()